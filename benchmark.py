@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""Benchmarks for the ynca package.
+
+The initialize benchmark runs against the debug server, so no real device is needed.
+"""
+
+import argparse
+from collections.abc import Iterator
+import contextlib
+import io
+from pathlib import Path
+import re
+import threading
+import time
+import timeit
+from types import MappingProxyType
+from unittest import mock
+
+from ynca import YncaApi
+from ynca.codec import parse_line, parse_line_bytes
+from ynca.connection import YncaConnection, YncaProtocolStatus
+from ynca.debug_server import YncaServer
+from ynca.function import FunctionMixinBase
+from ynca.helpers import all_subclasses
+from ynca.initializer import InitializationPlan
+from ynca.protocol import CommandPacing, CommandPriority
+from ynca.subunit import SubunitBase, YncaFunctionHandler
+
+DEFAULT_LOGFILE = "logs/RX-A810.txt"
+
+
+@contextlib.contextmanager
+def debug_server(initfile: str) -> Iterator[str]:
+    """Run the debug server on a free local port, yields the serial_url to use."""
+    server = YncaServer(("127.0.0.1", 0), initfile)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"socket://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def initialize_per_subunit(serial_url: str) -> tuple[float, int]:
+    """Initialize like before the planner was introduced; one sync marker per subunit."""
+    api = YncaApi(serial_url)
+    original_execute = InitializationPlan.execute
+
+    def execute_per_subunit(
+        self: InitializationPlan, *, reconcile: bool = False
+    ) -> None:
+        for subunit in self._subunits:
+            plan = InitializationPlan(self._connection, [subunit])
+            original_execute(plan, reconcile=reconcile)
+
+    InitializationPlan.execute = execute_per_subunit  # type: ignore[method-assign]
+    try:
+        start = time.perf_counter()
+        api.initialize()
+        duration = time.perf_counter() - start
+        num_commands_sent = api.get_raw_connection().num_commands_sent
+    finally:
+        InitializationPlan.execute = original_execute  # type: ignore[method-assign]
+        api.close()
+    return duration, num_commands_sent
+
+
+def initialize_planned(serial_url: str) -> tuple[float, int]:
+    api = YncaApi(serial_url)
+    try:
+        start = time.perf_counter()
+        api.initialize()
+        duration = time.perf_counter() - start
+        num_commands_sent = api.get_raw_connection().num_commands_sent
+    finally:
+        api.close()
+    return duration, num_commands_sent
+
+
+def benchmark_initialize(args: argparse.Namespace) -> None:
+    print(f"Initialize benchmark with debug server data from {args.logfile}")
+    results = []
+    # The debug server prints every line it handles, keep the output readable
+    with (
+        contextlib.redirect_stdout(io.StringIO()),
+        debug_server(args.logfile) as serial_url,
+    ):
+        for name, initialize in [
+            ("per subunit", initialize_per_subunit),
+            ("planned", initialize_planned),
+        ]:
+            durations = []
+            for _ in range(args.repeat):
+                duration, num_commands_sent = initialize(serial_url)
+                durations.append(duration)
+            results.append((name, min(durations), num_commands_sent))
+
+    for name, duration, num_commands_sent in results:
+        print(
+            f"  {name:<12} {duration:6.2f}s (best of {args.repeat}), {num_commands_sent} commands"
+        )
+
+
+class NullConnection:
+    """Connection that does nothing, enough to construct subunits."""
+
+    num_commands_sent = 0
+
+    def register_message_callback(self, *_args: object, **_kwargs: object) -> None:
+        pass
+
+
+def function_handlers_with_dir_scan(subunit_class: type[SubunitBase]) -> dict:
+    """How function handlers were created before the per class function table."""
+    function_handlers = {}
+    for attribute_name in sorted(dir(subunit_class)):
+        attribute = getattr(subunit_class, attribute_name, None)
+        if isinstance(attribute, FunctionMixinBase):
+            function_handlers[attribute.name] = YncaFunctionHandler(attribute)
+    return function_handlers
+
+
+@contextlib.contextmanager
+def without_function_tables(subunit_classes: list[type[SubunitBase]]) -> Iterator[None]:
+    """Empty the function tables, so constructing a subunit creates no function handlers."""
+    with contextlib.ExitStack() as stack:
+        for subunit_class in subunit_classes:
+            stack.enter_context(
+                mock.patch.object(
+                    subunit_class, "_function_table", MappingProxyType({})
+                )
+            )
+        yield
+
+
+def benchmark_subunits(args: argparse.Namespace) -> None:
+    subunit_classes = [
+        subunit_class
+        for subunit_class in all_subclasses(SubunitBase)
+        if hasattr(subunit_class, "id")
+    ]
+    connection = NullConnection()
+
+    def create_all_with_dir_scan() -> None:
+        for subunit_class in subunit_classes:
+            subunit = subunit_class(connection)
+            subunit.function_handlers = function_handlers_with_dir_scan(subunit_class)
+
+    def create_all() -> None:
+        for subunit_class in subunit_classes:
+            subunit_class(connection)
+
+    # Both construct the subunits, only the way the function handlers are created differs
+    print(f"Create all {len(subunit_classes)} subunit classes {args.number} times")
+    with without_function_tables(subunit_classes):
+        dir_scan = min(
+            timeit.repeat(create_all_with_dir_scan, number=args.number, repeat=5)
+        )
+    table = min(timeit.repeat(create_all, number=args.number, repeat=5))
+    for name, duration in [("dir() scan", dir_scan), ("table", table)]:
+        print(
+            f"  {name:<12} {duration * 1000 / args.number:8.3f} ms per set of subunits"
+        )
+
+
+def received_messages(logfile: str) -> list[tuple[str, str, str]]:
+    """Received messages from a logfile, these are what the receiver sends in practice."""
+    pattern = r'"Received: @(?P<subunit>.+?):(?P<function>.+?)=(?P<value>.*)"'
+    with Path(logfile).open(encoding="utf-8") as f:
+        return [
+            (match["subunit"], match["function"], match["value"])
+            for line in f
+            if (match := re.search(pattern, line))
+        ]
+
+
+def benchmark_dispatch(args: argparse.Namespace) -> None:
+    subunit_classes = [
+        subunit_class
+        for subunit_class in all_subclasses(SubunitBase)
+        if hasattr(subunit_class, "id")
+    ]
+    messages = received_messages(args.logfile)
+
+    # Subunits register for their own subunit on the connection
+    subunit_connection = YncaConnection("dummy")
+    for subunit_class in subunit_classes:
+        subunit_class(subunit_connection)
+
+    # Before, all subunits got all messages and had to filter themselves
+    wildcard_connection = YncaConnection("dummy")
+    for subunit_class in subunit_classes:
+        subunit = subunit_class(NullConnection())  # type: ignore[arg-type]
+
+        def filtered(
+            status, subunit_id, function_name, value, subunit=subunit  # noqa: ANN001
+        ) -> None:
+            if subunit.id == subunit_id:
+                subunit._protocol_message_received(
+                    status, subunit_id, function_name, value
+                )
+
+        wildcard_connection.register_message_callback(filtered)
+
+    print(
+        f"Dispatch {len(messages)} messages from {args.logfile} to {len(subunit_classes)} subunits"
+    )
+    for name, connection in [
+        ("wildcard", wildcard_connection),
+        ("per subunit", subunit_connection),
+    ]:
+
+        def dispatch(connection: YncaConnection = connection) -> None:
+            for subunit_id, function_name, value in messages:
+                connection._call_registered_message_callbacks(
+                    YncaProtocolStatus.OK, subunit_id, function_name, value
+                )
+
+        duration = min(timeit.repeat(dispatch, number=args.number, repeat=5))
+        print(
+            f"  {name:<12} {len(messages) * args.number / duration:12,.0f} messages/s"
+        )
+
+
+def send_gets(serial_url: str, pacing: CommandPacing | None, gets: list) -> tuple:
+    connection = YncaConnection(serial_url)
+    connection.connect(pacing=pacing)
+    try:
+        start = time.perf_counter()
+        for subunit, function in gets:
+            connection.get(subunit, function)
+        # Receiver handles commands in order, so this is answered last
+        connection.get_value(
+            "SYS", "VERSION", timeout=len(gets), priority=CommandPriority.REFRESH
+        )
+        duration = time.perf_counter() - start
+        stats = connection.get_pacing_stats()
+    finally:
+        connection.close()
+    return duration, stats
+
+
+def benchmark_pacing(args: argparse.Namespace) -> None:
+    print(f"Pacing benchmark with debug server data from {args.logfile}")
+    # SYS:VERSION is used as end marker
+    gets = sorted(
+        {
+            (subunit, function)
+            for subunit, function, _ in received_messages(args.logfile)
+            if (subunit, function) != ("SYS", "VERSION")
+        }
+    )
+    results = []
+    with (
+        contextlib.redirect_stdout(io.StringIO()),
+        debug_server(args.logfile) as serial_url,
+    ):
+        for name, pacing in [
+            ("fixed", None),
+            ("adaptive", CommandPacing(min_spacing=args.min_spacing)),
+        ]:
+            results.append((name, *send_gets(serial_url, pacing, gets)))
+
+    for name, duration, stats in results:
+        print(
+            f"  {name:<12} {duration:6.2f}s for {len(gets)} GETs, {stats.command_rate:5.1f} commands/s, "
+            f"final spacing {stats.spacing * 1000:.0f}ms, {stats.num_backoffs} backoffs"
+        )
+
+
+def log_lines(logdir: str) -> list[str]:
+    """All sent and received lines from the logfiles in logdir."""
+    lines: list[str] = []
+    for logfile in sorted(Path(logdir).glob("*.txt")):
+        with logfile.open(encoding="utf-8") as f:
+            lines.extend(
+                match[1]
+                for line in f
+                if (match := re.search(r'"(?:Send|Received): (@.*)"', line))
+            )
+    return lines
+
+
+def regex_parse_line(line: str) -> tuple[str, str, str] | None:
+    """How lines used to be parsed."""
+    match = re.match(r"@(?P<subunit>.+?):(?P<function>.+?)=(?P<value>.*)", line)
+    if match is None:
+        return None
+    return (match.group("subunit"), match.group("function"), match.group("value"))
+
+
+def benchmark_parse(args: argparse.Namespace) -> None:
+    lines = log_lines(args.logdir)
+    bytes_lines = [line.encode("utf-8") for line in lines]
+    if [regex_parse_line(line) for line in lines] != [
+        parse_line(line) for line in lines
+    ]:
+        msg = "Codec and regex parse lines differently"
+        raise RuntimeError(msg)
+
+    print(f"Parse {len(lines)} lines from {args.logdir}/*.txt")
+    for name, parse in [
+        ("regex", lambda: [regex_parse_line(line) for line in lines]),
+        ("codec", lambda: [parse_line(line) for line in lines]),
+        (
+            "regex bytes",
+            lambda: [regex_parse_line(line.decode("utf-8")) for line in bytes_lines],
+        ),
+        ("codec bytes", lambda: [parse_line_bytes(line) for line in bytes_lines]),
+    ]:
+        duration = min(timeit.repeat(parse, number=args.number, repeat=5))
+        print(f"  {name:<12} {len(lines) * args.number / duration:12,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the ynca package.")
+    subparsers = parser.add_subparsers(required=True)
+
+    initialize_parser = subparsers.add_parser(
+        "initialize",
+        help="Compare per subunit initialization with the planned initialization.",
+    )
+    initialize_parser.add_argument(
+        "--logfile",
+        default=DEFAULT_LOGFILE,
+        help=f"Logfile to fill the debug server with, default is {DEFAULT_LOGFILE}",
+    )
+    initialize_parser.add_argument(
+        "--repeat", default=1, type=int, help="Amount of runs, best is reported."
+    )
+    initialize_parser.set_defaults(func=benchmark_initialize)
+
+    subunits_parser = subparsers.add_parser(
+        "subunits",
+        help="Measure construction of all subunit classes.",
+    )
+    subunits_parser.add_argument(
+        "--number", default=100, type=int, help="Amount of iterations per run."
+    )
+    subunits_parser.set_defaults(func=benchmark_subunits)
+
+    dispatch_parser = subparsers.add_parser(
+        "dispatch",
+        help="Measure dispatching of received messages to the subunits.",
+    )
+    dispatch_parser.add_argument(
+        "--logfile",
+        default=DEFAULT_LOGFILE,
+        help=f"Logfile to take the received messages from, default is {DEFAULT_LOGFILE}",
+    )
+    dispatch_parser.add_argument(
+        "--number", default=20, type=int, help="Amount of iterations per run."
+    )
+    dispatch_parser.set_defaults(func=benchmark_dispatch)
+
+    pacing_parser = subparsers.add_parser(
+        "pacing",
+        help="Compare fixed command spacing with adaptive pacing.",
+    )
+    pacing_parser.add_argument(
+        "--logfile",
+        default=DEFAULT_LOGFILE,
+        help=f"Logfile to fill the debug server with, default is {DEFAULT_LOGFILE}",
+    )
+    pacing_parser.add_argument(
+        "--min-spacing",
+        default=0.02,
+        type=float,
+        help="Minimum spacing in seconds for adaptive pacing.",
+    )
+    pacing_parser.set_defaults(func=benchmark_pacing)
+
+    parse_parser = subparsers.add_parser(
+        "parse",
+        help="Compare regex based parsing of lines with the line codec.",
+    )
+    parse_parser.add_argument(
+        "--logdir",
+        default="logs",
+        help="Directory with logfiles to take the lines from, default is logs",
+    )
+    parse_parser.add_argument(
+        "--number", default=20, type=int, help="Amount of iterations per run."
+    )
+    parse_parser.set_defaults(func=benchmark_parse)
+
+    args = parser.parse_args()
+    args.func(args)
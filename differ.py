@@ -4,6 +4,8 @@ import argparse
 import logging
 import re
 
+from ynca.codec import parse_line
+
 
 def get_commands_from_file(filename):
     commands = {}
@@ -12,13 +14,10 @@ def get_commands_from_file(filename):
             line = re.sub(r"#.*", "", line)
             line = line.strip()
 
-            match = re.match(
-                r".*@(?P<subunit>.+?):(?P<function>.+?)=(?P<value>.*)", line
-            )
-            if match is not None:
-                subunit = match.group("subunit")
-                function = match.group("function")
-                value = match.group("value")
+            start = line.find("@")
+            parsed = parse_line(line[start:]) if start >= 0 else None
+            if parsed is not None:
+                subunit, function, _ = parsed
 
                 if subunit not in commands:
                     commands[subunit] = set()
@@ -9,6 +9,7 @@ import threading
 import time
 
 from ynca import YncaConnection, YncaProtocolStatus
+from ynca.codec import parse_line
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Execute YNCA commands from a file.")
@@ -72,11 +73,9 @@ if __name__ == "__main__":
             line = re.sub(r"#.*", "", line)  # noqa: PLW2901
             line = line.strip()  # noqa: PLW2901
 
-            match = re.match(r"@(?P<subunit>.+?):(?P<function>.+?)=(?P<value>.*)", line)
-            if match is not None:
-                subunit = match.group("subunit")
-                function = match.group("function")
-                value = match.group("value")
+            parsed = parse_line(line)
+            if parsed is not None:
+                subunit, function, value = parsed
 
                 if function == "VERSION":
                     logging.info("Skipping VERSION command as it is used as end marker")
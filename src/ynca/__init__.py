@@ -1,8 +1,20 @@
 import logging
 
 # Import intended API so it is easily accessible through `from ynca import Something`
-from .api import YncaApi, YncaConnectionCheckResult
-from .connection import YncaConnection, YncaProtocolStatus
+from .api import Reconnect, YncaApi, YncaConnectionCheckResult
+from .async_api import AsyncYncaApi
+from .async_connection import AsyncYncaConnection
+from .capabilities import YncaCapabilityCache
+from .connection import (
+    CommandPacing,
+    CommandPriority,
+    KeepAlive,
+    PacingStats,
+    RelativeCommandMode,
+    YncaConnection,
+    YncaProtocolStatus,
+)
+from .dispatcher import CallbackDispatcher
 from .enums import (
     AdaptiveDrc,
     Avail,
@@ -50,8 +62,13 @@ from .errors import (
     YncaConnectionFailed,
     YncaException,
     YncaInitializationFailedException,
+    YncaRequestFailed,
+    YncaRequestTimeout,
 )
+from .fleet import YncaFleet, YncaFleetStats, YncaReceiverStats
+from .metrics import Histogram, YncaMetrics
 from .modelinfo import YncaModelInfo
+from .snapshot import YncaChangeTracker, YncaSnapshot
 from .subunit import SubunitBase
 from .subunits.airplay import Airplay
 from .subunits.bt import Bt
@@ -74,14 +91,20 @@ from .subunits.tun import Tun
 from .subunits.uaw import Uaw
 from .subunits.usb import Usb
 from .subunits.zone import Main, Zone2, Zone3, Zone4, ZoneBase
+from .update_policy import UpdatePolicy
 
 __all__ = [
     "AdaptiveDrc",
     "Airplay",
+    "AsyncYncaApi",
+    "AsyncYncaConnection",
     "Avail",
     "BandDab",
     "BandTun",
     "Bt",
+    "CallbackDispatcher",
+    "CommandPacing",
+    "CommandPriority",
     "Dab",
     "DabFmSearchMode",
     "DabPreset",
@@ -92,16 +115,19 @@ __all__ = [
     "FmPreset",
     "HdmiOut",
     "HdmiOutOnOff",
+    "Histogram",
     "InitVolLvl",
     "InitVolMode",
     "Input",
     "Ipod",
     "IpodUsb",
+    "KeepAlive",
     "Main",
     "McLink",
     "Mute",
     "Napster",
     "NetRadio",
+    "PacingStats",
     "Pandora",
     "Party",
     "PartyMute",
@@ -112,6 +138,8 @@ __all__ = [
     "PureDirMode",
     "Pwr",
     "PwrB",
+    "Reconnect",
+    "RelativeCommandMode",
     "Repeat",
     "Rhap",
     "Server",
@@ -137,16 +165,26 @@ __all__ = [
     "TunSearchMode",
     "TwoChDecoder",
     "Uaw",
+    "UpdatePolicy",
     "Usb",
     "YncaApi",
+    "YncaCapabilityCache",
+    "YncaChangeTracker",
     "YncaConnection",
     "YncaConnectionCheckResult",
     "YncaConnectionError",
     "YncaConnectionFailed",
     "YncaException",
+    "YncaFleet",
+    "YncaFleetStats",
     "YncaInitializationFailedException",
+    "YncaMetrics",
     "YncaModelInfo",
     "YncaProtocolStatus",
+    "YncaReceiverStats",
+    "YncaRequestFailed",
+    "YncaRequestTimeout",
+    "YncaSnapshot",
     "Zone2",
     "Zone3",
     "Zone4",
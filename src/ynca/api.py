@@ -1,11 +1,22 @@
 from __future__ import annotations
 
+from contextlib import AbstractContextManager, nullcontext
 from dataclasses import dataclass, field
 import logging
 import threading
 from typing import TYPE_CHECKING, cast
 
-from .connection import YncaConnection, YncaProtocol, YncaProtocolStatus
+from .capabilities import YncaCapabilityCache, collect_errors
+from .connection import (
+    CommandPacing,
+    CommandPriority,
+    KeepAlive,
+    RelativeCommandMode,
+    YncaConnection,
+    YncaConnectionBase,
+    YncaProtocol,
+    YncaProtocolStatus,
+)
 from .constants import Subunit
 from .errors import (
     YncaConnectionError,
@@ -13,6 +24,16 @@ from .errors import (
     YncaInitializationFailedException,
 )
 from .helpers import all_subclasses
+from .initializer import (
+    EAGER_SUBUNITS,
+    InitializationPlan,
+    LazyInitialization,
+    SubunitSelection,
+)
+from .modelinfo import YncaModelInfo
+from .multiresponse import protocol_version
+from .snapshot import YncaChangeTracker
+from .state import YncaState
 from .subunit import SubunitBase
 from .subunits.airplay import Airplay
 from .subunits.bt import Bt
@@ -37,7 +58,12 @@ from .subunits.usb import Usb
 from .subunits.zone import Main, Zone2, Zone3, Zone4
 
 if TYPE_CHECKING:  # pragma: no cover
-    from collections.abc import Callable
+    from collections.abc import Callable, Iterable, Iterator
+    from pathlib import Path
+
+    from .dispatcher import CallbackDispatcher
+    from .metrics import YncaMetrics
+    from .snapshot import YncaSnapshot
 
 logger = logging.getLogger(__name__)
 
@@ -50,12 +76,285 @@ class YncaConnectionCheckResult:
     zones: list[str] = field(default_factory=list)
 
 
-class YncaApi:
-    def __init__(
+@dataclass(frozen=True)
+class Reconnect:
+    """Settings for reconnecting after the connection was lost.
+
+    The existing subunits are kept. After reconnecting only the functions
+    that have a value get refreshed and update callbacks are only called for
+    values that changed while the connection was down.
+
+    initial_delay:
+        Seconds to wait before the first attempt.
+
+    max_delay:
+        Maximum seconds to wait in between attempts.
+
+    backoff_factor:
+        Factor to increase the delay with after each failed attempt.
+
+    max_attempts:
+        Amount of attempts before giving up, None keeps trying until closed.
+    """
+
+    initial_delay: float = 0.5
+    max_delay: float = 30.0
+    backoff_factor: float = 2.0
+    max_attempts: int | None = None
+
+    def delays(self) -> Iterator[float]:
+        """Seconds to wait before each attempt."""
+        delay = self.initial_delay
+        attempt = 0
+        while self.max_attempts is None or attempt < self.max_attempts:
+            yield delay
+            delay = min(delay * self.backoff_factor, self.max_delay)
+            attempt += 1
+
+
+class YncaApiBase:
+    """Baseclass for the APIs, manages the subunits and provides access to them."""
+
+    def __init__(self) -> None:
+        # This is the list of instantiated Subunit classes
+        self._subunits: dict[Subunit, SubunitBase] = {}
+        self._lazy_initialization: LazyInitialization | None = None
+        self._selection = SubunitSelection()
+        self._callback_dispatcher: CallbackDispatcher | None = None
+        self._change_tracker = YncaChangeTracker()
+        # Selects the multi response commands to use during initialization
+        self._protocol_version = ""
+
+    def _get_subunit_class(self, subunit_id: str) -> type[SubunitBase] | None:
+        subunit_classes: set[type[SubunitBase]] = all_subclasses(SubunitBase)
+        for subunit_class in subunit_classes:
+            if hasattr(subunit_class, "id") and subunit_class.id == subunit_id:
+                return subunit_class
+
+        return None  # pragma: no cover
+
+    @staticmethod
+    def _known_functions() -> dict[str, frozenset[str]]:
+        """Get the function names per subunit id, to check include and exclude entries."""
+        return {
+            subunit_class.id: frozenset(subunit_class._function_table)  # noqa: SLF001
+            for subunit_class in all_subclasses(SubunitBase)
+            if hasattr(subunit_class, "id")
+        }
+
+    def _create_subunits(
+        self, connection: YncaConnectionBase, subunit_ids: list[str]
+    ) -> list[SubunitBase]:
+        # Every receiver has a System subunit
+        # It also does not respond to AVAIL=? so it will not end up in _available_subunits
+        subunits: list[SubunitBase] = [System(connection)]
+        subunits.extend(
+            subunit_class(connection)
+            for subunit_id in sorted(subunit_ids)
+            if self._selection.includes_subunit(subunit_id)
+            and (subunit_class := self._get_subunit_class(subunit_id))
+        )
+
+        for subunit in subunits:
+            excluded_functions = self._selection.excluded_functions(subunit)
+            subunit._excluded_functions = excluded_functions  # noqa: SLF001
+            subunit._callback_dispatcher = self._callback_dispatcher  # noqa: SLF001
+            subunit._change_tracker = self._change_tracker  # noqa: SLF001
+            self._subunits[subunit.id] = subunit
+
+        return subunits
+
+    def snapshot(self) -> YncaSnapshot:
+        """Get the values of all subunits at one point in time.
+
+        Reading attributes one by one can mix values from before and after an update,
+        e.g. PWR of the new state with INP of the old state.
+        """
+        return self._change_tracker.snapshot()
+
+    def changes_since(self, sequence: int) -> YncaSnapshot:
+        """Get the values that changed after the sequence number of an earlier snapshot.
+
+        Pass the sequence number of the result to the next call to get each change once.
+        """
+        return self._change_tracker.changes_since(sequence)
+
+    def _model_pacing(self) -> CommandPacing | None:
+        """Get the pacing profile of the model, the modelname is known once SYS is initialized."""
+        if (
+            self.sys is not None
+            and self.sys.modelname is not None
+            and (modelinfo := YncaModelInfo.get(self.sys.modelname))
+        ):
+            return modelinfo.pacing
+        return None
+
+    def _resync_subunits(self) -> list[SubunitBase]:
+        """Get the subunits to resync after a reconnect.
+
+        Subunits that are not initialized, e.g. lazy ones that were not used yet,
+        are left out so they still get initialized on demand.
+        """
+        return [
+            subunit
+            for subunit in self._subunits.values()
+            if subunit._initialized  # noqa: SLF001
+        ]
+
+    def _split_lazy_subunits(
+        self, subunits: list[SubunitBase], *, lazy: bool
+    ) -> tuple[list[SubunitBase], list[SubunitBase]]:
+        """Split subunits in the ones to initialize right away and the ones to initialize on demand."""
+        if not lazy:
+            return subunits, []
+        return (
+            [subunit for subunit in subunits if subunit.id in EAGER_SUBUNITS],
+            [subunit for subunit in subunits if subunit.id not in EAGER_SUBUNITS],
+        )
+
+    def _request_selected_inputs(self) -> None:
+        """Request initialization of the subunits that provide the inputs currently selected on the zones."""
+        assert self._lazy_initialization is not None  # noqa: S101
+        for subunit_id in EAGER_SUBUNITS:
+            subunit = self._subunits.get(subunit_id)
+            if (
+                subunit is not None
+                and (handler := subunit.function_handlers.get("INP"))
+                and handler.value_str is not None
+            ):
+                self._lazy_initialization.request_input(handler.value_str)
+
+    def _close_subunits(self) -> None:
+        if self._lazy_initialization is not None:
+            self._lazy_initialization.close()
+            self._lazy_initialization = None
+        # Convert to list to avoid issues when deleting while iterating
+        for key in list(self._subunits.keys()):
+            subunit = self._subunits.pop(key)
+            subunit.close()
+
+    # Add properties for all known subunits
+    # The amount is limited as defined by the spec and it is easy to access as a user of the library
+    # Also helps with typing compared to using generic SubunitBase types
+
+    @property
+    def airplay(self) -> Airplay | None:
+        return cast(Airplay, self._subunits.get(Subunit.AIRPLAY, None))
+
+    @property
+    def bt(self) -> Bt | None:
+        return cast(Bt, self._subunits.get(Subunit.BT, None))
+
+    @property
+    def dab(self) -> Dab | None:
+        return cast(Dab, self._subunits.get(Subunit.DAB, None))
+
+    @property
+    def deezer(self) -> Deezer | None:
+        return cast(Deezer, self._subunits.get(Subunit.DEEZER, None))
+
+    @property
+    def ipod(self) -> Ipod | None:
+        return cast(Ipod, self._subunits.get(Subunit.IPOD, None))
+
+    @property
+    def ipodusb(self) -> IpodUsb | None:
+        return cast(IpodUsb, self._subunits.get(Subunit.IPODUSB, None))
+
+    @property
+    def main(self) -> Main | None:
+        return cast(Main, self._subunits.get(Subunit.MAIN, None))
+
+    @property
+    def mclink(self) -> McLink | None:
+        return cast(McLink, self._subunits.get(Subunit.MCLINK, None))
+
+    @property
+    def napster(self) -> Napster | None:
+        return cast(Napster, self._subunits.get(Subunit.NAPSTER, None))
+
+    @property
+    def netradio(self) -> NetRadio | None:
+        return cast(NetRadio, self._subunits.get(Subunit.NETRADIO, None))
+
+    @property
+    def pandora(self) -> Pandora | None:
+        return cast(Pandora, self._subunits.get(Subunit.PANDORA, None))
+
+    @property
+    def pc(self) -> Pc | None:
+        return cast(Pc, self._subunits.get(Subunit.PC, None))
+
+    @property
+    def rhap(self) -> Rhap | None:
+        return cast(Rhap, self._subunits.get(Subunit.RHAP, None))
+
+    @property
+    def server(self) -> Server | None:
+        return cast(Server, self._subunits.get(Subunit.SERVER, None))
+
+    @property
+    def sirius(self) -> Sirius | None:
+        return cast(Sirius, self._subunits.get(Subunit.SIRIUS, None))
+
+    @property
+    def siriusir(self) -> SiriusIr | None:
+        return cast(SiriusIr, self._subunits.get(Subunit.SIRIUSIR, None))
+
+    @property
+    def siriusxm(self) -> SiriusXm | None:
+        return cast(SiriusXm, self._subunits.get(Subunit.SIRIUSXM, None))
+
+    @property
+    def spotify(self) -> Spotify | None:
+        return cast(Spotify, self._subunits.get(Subunit.SPOTIFY, None))
+
+    @property
+    def sys(self) -> System | None:
+        return cast(System, self._subunits.get(Subunit.SYS, None))
+
+    @property
+    def tidal(self) -> Tidal | None:
+        return cast(Tidal, self._subunits.get(Subunit.TIDAL, None))
+
+    @property
+    def tun(self) -> Tun | None:
+        return cast(Tun, self._subunits.get(Subunit.TUN, None))
+
+    @property
+    def uaw(self) -> Uaw | None:
+        return cast(Uaw, self._subunits.get(Subunit.UAW, None))
+
+    @property
+    def usb(self) -> Usb | None:
+        return cast(Usb, self._subunits.get(Subunit.USB, None))
+
+    @property
+    def zone2(self) -> Zone2 | None:
+        return cast(Zone2, self._subunits.get(Subunit.ZONE2, None))
+
+    @property
+    def zone3(self) -> Zone3 | None:
+        return cast(Zone3, self._subunits.get(Subunit.ZONE3, None))
+
+    @property
+    def zone4(self) -> Zone4 | None:
+        return cast(Zone4, self._subunits.get(Subunit.ZONE4, None))
+
+
+class YncaApi(YncaApiBase):
+    def __init__(  # noqa: PLR0913
         self,
         serial_url: str,
         disconnect_callback: Callable[[], None] | None = None,
         communication_log_size: int = 0,
+        *,
+        coalesce_puts: bool = False,
+        relative_command_mode: RelativeCommandMode = RelativeCommandMode.PRESERVE,
+        pacing: CommandPacing | None = None,
+        keep_alive: KeepAlive | None = None,
+        reconnect: Reconnect | None = None,
+        callback_dispatcher: CallbackDispatcher | None = None,
     ) -> None:
         """Create a YNCA API instance.
 
@@ -73,18 +372,111 @@ class YncaApi:
         communication_log_size:
             Amount of communication items to log. Useful for debugging.
             Get the logged items with the `get_communication_log_items` method
+
+        coalesce_puts:
+            Replace values of PUTs that are still waiting to be sent instead of
+            sending all of them. See `YncaConnection.connect` for details.
+
+        relative_command_mode:
+            How coalescing handles relative values like Up and Down, see `RelativeCommandMode`.
+
+        pacing:
+            Adapt the spacing between commands to the receiver, see `CommandPacing`.
+            When None the pacing profile of the model is used after initialization, if there is one.
+
+        keep_alive:
+            When to send keep-alives and how to wake up the receiver, see `KeepAlive`.
+
+        reconnect:
+            Reconnect automatically when the connection is lost, see `Reconnect`.
+            The disconnect_callback is then only called when reconnecting gave up.
+            When None the connection is not restored.
+
+        callback_dispatcher:
+            Run update callbacks on worker threads instead of the thread receiving the data,
+            see `CallbackDispatcher`. Also used for message callbacks registered with dispatch=True
+            on the raw connection. The dispatcher is not closed when the API is closed.
         """
+        super().__init__()
+        self._callback_dispatcher = callback_dispatcher
         self._serial_url = serial_url
         self._connection: YncaConnection | None = None
         self._available_subunits: set[str] = set()
         self._initialized_event = threading.Event()
         self._disconnect_callback = disconnect_callback
         self._communication_log_size = communication_log_size
+        self._coalesce_puts = coalesce_puts
+        self._relative_command_mode = relative_command_mode
+        self._pacing = pacing
+        self._keep_alive = keep_alive
+        self._refresh_thread: threading.Thread | None = None
+        self._lazy_initialization_thread: threading.Thread | None = None
+        self._reconnect = reconnect
+        self._reconnect_thread: threading.Thread | None = None
+        # Makes sure a reconnect does not connect again when the API got closed meanwhile
+        self._reconnect_lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def _connect(self, connection: YncaConnection) -> None:
+        connection.callback_dispatcher = self._callback_dispatcher
+        connection.connect(
+            self._on_disconnect if self._reconnect else self._disconnect_callback,
+            self._communication_log_size,
+            coalesce_puts=self._coalesce_puts,
+            relative_command_mode=self._relative_command_mode,
+            # Keep the pacing profile of the model when reconnecting
+            pacing=self._pacing or self._model_pacing(),
+            keep_alive=self._keep_alive,
+        )
 
-        # This is the list of instantiated Subunit classes
-        self._subunits: dict[Subunit, SubunitBase] = {}
+    def _on_disconnect(self) -> None:
+        # Called on the reader thread of the lost connection, so reconnect on another thread.
+        # A disconnect while reconnecting is handled by the running reconnect.
+        if self._reconnect_thread is not None and self._reconnect_thread.is_alive():
+            return
+        logger.info("Connection lost, reconnecting")
+        self._reconnect_thread = threading.Thread(
+            target=self._reconnect_and_resync, name="YncaReconnect", daemon=True
+        )
+        self._reconnect_thread.start()
+
+    def _reconnect_and_resync(self) -> None:
+        assert self._reconnect is not None  # noqa: S101
+        for attempt, delay in enumerate(self._reconnect.delays(), start=1):
+            if self._closed.wait(delay):
+                return
+            with self._reconnect_lock:
+                if (connection := self._connection) is None:
+                    return  # pragma: no cover
+                try:
+                    self._connect(connection)
+                except YncaConnectionError:
+                    logger.info("Reconnect attempt %d failed", attempt)
+                    continue
+            try:
+                InitializationPlan(
+                    connection,
+                    self._resync_subunits(),
+                    resync=True,
+                    protocol_version=self._protocol_version,
+                ).execute(reconcile=True)
+            except YncaInitializationFailedException:
+                logger.info("Resync after reconnect attempt %d failed", attempt)
+                connection.close()
+                continue
+            logger.info("Reconnected after %d attempt(s)", attempt)
+            return
 
-    def _detect_available_subunits(self, connection: YncaConnection) -> None:
+        logger.warning("Reconnecting failed, giving up")
+        if self._disconnect_callback:
+            self._disconnect_callback()
+
+    def _detect_available_subunits(
+        self,
+        connection: YncaConnection,
+        capability_cache: YncaCapabilityCache | None = None,
+        modelname: str = "",
+    ) -> None:
         logger.info("Subunit availability check begin")
         self._initialized_event.clear()
         connection.register_message_callback(self._protocol_message_received)
@@ -92,45 +484,190 @@ class YncaApi:
         # Figure out what subunits are available
         num_commands_sent_start = connection.num_commands_sent
         self._available_subunits = set()
-        for subunit in Subunit:
-            connection.get(subunit, "AVAIL")
-
-        # Use @SYS:VERSION=? as end marker (even though this is not the SYS subunit)
-        connection.get(Subunit.SYS, "VERSION")
+        probed = [
+            (subunit, "AVAIL")
+            for subunit in Subunit
+            if self._selection.includes_subunit(subunit)
+            and (
+                capability_cache is None
+                or not capability_cache.is_unsupported(modelname, subunit, "AVAIL")
+            )
+        ]
+
+        errors_context: AbstractContextManager[
+            dict[tuple[str, str], YncaProtocolStatus]
+        ] = (
+            collect_errors(connection)
+            if capability_cache is not None
+            else nullcontext({})
+        )
+        with errors_context as errors:
+            for subunit, function_ in probed:
+                connection.get(subunit, function_, CommandPriority.INITIALIZATION)
+
+            # Use @SYS:VERSION=? as end marker (even though this is not the SYS subunit)
+            connection.get(Subunit.SYS, "VERSION", CommandPriority.INITIALIZATION)
+
+            # Take command spacing into account and apply large margin
+            # Large margin is needed in practice on slower/busier systems
+            num_commands_sent = connection.num_commands_sent - num_commands_sent_start
+            if not self._initialized_event.wait(
+                2 + (num_commands_sent * (YncaProtocol.COMMAND_SPACING * 5))
+            ):
+                msg = "Subunit availability check failed"
+                raise YncaInitializationFailedException(msg)
 
-        # Take command spacing into account and apply large margin
-        # Large margin is needed in practice on slower/busier systems
-        num_commands_sent = connection.num_commands_sent - num_commands_sent_start
-        if not self._initialized_event.wait(
-            2 + (num_commands_sent * (YncaProtocol.COMMAND_SPACING * 5))
-        ):
-            msg = "Subunit availability check failed"
-            raise YncaInitializationFailedException(msg)
+        if capability_cache is not None:
+            capability_cache.update(modelname, probed, errors)
 
         connection.unregister_message_callback(self._protocol_message_received)
         logger.info("Subunit availability check end")
 
-    def _get_subunit_class(self, subunit_id: str) -> type[SubunitBase] | None:
-        subunit_classes: set[type[SubunitBase]] = all_subclasses(SubunitBase)
-        for subunit_class in subunit_classes:
-            if hasattr(subunit_class, "id") and subunit_class.id == subunit_id:
-                return subunit_class
+    def _initialize_available_subunits(
+        self,
+        connection: YncaConnection,
+        capability_cache: YncaCapabilityCache | None = None,
+        modelname: str = "",
+        *,
+        lazy: bool = False,
+    ) -> None:
+        subunits = self._create_subunits(connection, list(self._available_subunits))
+        subunits, lazy_subunits = self._split_lazy_subunits(subunits, lazy=lazy)
+
+        # Initialize all subunits in one go to avoid idle time in between subunits
+        InitializationPlan(
+            connection,
+            subunits,
+            capability_cache,
+            modelname,
+            protocol_version=self._protocol_version,
+        ).execute()
+
+        if lazy_subunits:
+            self._lazy_initialization = LazyInitialization(
+                connection,
+                lazy_subunits,
+                self._start_lazy_initialization,
+                capability_cache,
+                modelname,
+                protocol_version=self._protocol_version,
+            )
+            self._request_selected_inputs()
+
+    def _start_lazy_initialization(
+        self, lazy_initialization: LazyInitialization
+    ) -> None:
+        # Requests can come from the reader thread, so initialize on another thread
+        self._lazy_initialization_thread = threading.Thread(
+            target=lazy_initialization.run,
+            name="YncaLazyInitialization",
+            daemon=True,
+        )
+        self._lazy_initialization_thread.start()
 
-        return None  # pragma: no cover
+    def _get_modelname_and_version(self, connection: YncaConnection) -> tuple[str, str]:
+        values: dict[str, str] = {}
+        received_event = threading.Event()
 
-    def _initialize_available_subunits(self, connection: YncaConnection) -> None:
-        # Every receiver has a System subunit
-        # It also does not respond to AVAIL=? so it will not end up in _available_subunits
-        system = System(connection)
-        system.initialize()
-        self._subunits[system.id] = system
+        def _message_received(
+            _status: YncaProtocolStatus,
+            subunit: str | None,
+            function_: str | None,
+            value: str | None,
+        ) -> None:
+            if (
+                subunit == Subunit.SYS
+                and function_ in ("MODELNAME", "VERSION")
+                and value is not None
+            ):
+                values[function_] = value
+                if function_ == "VERSION":
+                    received_event.set()
 
-        # Initialize detected subunits
-        for subunit_id in sorted(self._available_subunits):
-            if subunit_class := self._get_subunit_class(subunit_id):
-                subunit_instance = subunit_class(connection)
-                subunit_instance.initialize()
-                self._subunits[subunit_instance.id] = subunit_instance
+        connection.register_message_callback(_message_received)
+        try:
+            connection.get(Subunit.SYS, "MODELNAME", CommandPriority.INITIALIZATION)
+            connection.get(Subunit.SYS, "VERSION", CommandPriority.INITIALIZATION)
+            if not received_event.wait(CONNECTION_CHECK_TIMEOUT):
+                msg = "No modelname and version received in time from device"
+                raise YncaInitializationFailedException(msg)
+        finally:
+            connection.unregister_message_callback(_message_received)
+
+        return values.get("MODELNAME", ""), values["VERSION"]
+
+    def _warm_start(
+        self,
+        connection: YncaConnection,
+        state: YncaState,
+        capability_cache: YncaCapabilityCache | None,
+        modelname: str,
+        version: str,
+    ) -> bool:
+        if not state.matches(modelname, version):
+            logger.info(
+                "State snapshot is for %s/%s, but device is %s/%s, ignoring snapshot",
+                state.modelname,
+                state.version,
+                modelname,
+                version,
+            )
+            return False
+
+        logger.info("Restoring state snapshot for %s/%s", modelname, version)
+        self._protocol_version = protocol_version(version)
+        self._available_subunits = {
+            subunit_id for subunit_id in state.subunits if subunit_id != Subunit.SYS
+        }
+        subunits = self._create_subunits(connection, list(self._available_subunits))
+        for subunit in subunits:
+            subunit._restore_values(state.subunits.get(subunit.id, {}))  # noqa: SLF001
+
+        # Reconcile with the actual values of the device
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_restored_state,
+            args=(connection, subunits, capability_cache, modelname),
+            daemon=True,
+        )
+        self._refresh_thread.start()
+        return True
+
+    def _refresh_restored_state(
+        self,
+        connection: YncaConnection,
+        subunits: list[SubunitBase],
+        capability_cache: YncaCapabilityCache | None,
+        modelname: str,
+    ) -> None:
+        try:
+            InitializationPlan(
+                connection,
+                subunits,
+                capability_cache,
+                modelname,
+                protocol_version=self._protocol_version,
+            ).execute(reconcile=True)
+            if capability_cache is not None:
+                capability_cache.save()
+        except YncaInitializationFailedException:
+            logger.warning("Refreshing restored state snapshot failed")
+
+    def save_state(self, filename: str | Path) -> None:
+        """Save the current state to a file which can be used to speed up a next `initialize()`.
+
+        Raises exception if not initialized.
+        """
+        if self.sys is None:
+            msg = "Not initialized, no state available"
+            raise YncaException(msg)
+
+        state = YncaState(
+            self.sys.function_handlers["MODELNAME"].value_str or "",
+            self.sys.function_handlers["VERSION"].value_str or "",
+        )
+        for subunit_id, subunit in self._subunits.items():
+            state.subunits[subunit_id] = subunit._get_values()  # noqa: SLF001
+        state.save(filename)
 
     def connection_check(self) -> YncaConnectionCheckResult:
         """Perform a quick connection check by setting up a connection and requesting some basic info. Connection gets closed again automatically.
@@ -143,7 +680,7 @@ class YncaApi:
         connection_check_event = threading.Event()
 
         def _connection_check_message_received(
-            _status: YncaProtocolStatus,
+            status: YncaProtocolStatus,
             subunit: str | None,
             function_: str | None,
             value: str | None,
@@ -155,7 +692,11 @@ class YncaApi:
             ):
                 result.modelname = value
                 connection_check_event.set()
-            if function_ == "AVAIL" and subunit is not None:
+            if (
+                status is YncaProtocolStatus.OK
+                and function_ == "AVAIL"
+                and subunit is not None
+            ):
                 result.zones.append(subunit)
 
         try:
@@ -181,11 +722,46 @@ class YncaApi:
 
         return result
 
-    def initialize(self) -> None:
+    def initialize(
+        self,
+        state_file: str | Path | None = None,
+        capability_cache: YncaCapabilityCache | None = None,
+        *,
+        lazy: bool = False,
+        include: Iterable[str] | None = None,
+        exclude: Iterable[str] | None = None,
+    ) -> None:
         """Set up a connection to the device and initializes the Ynca API.
 
         This call takes quite a while (~10 seconds on a simple 2 zone receiver).
 
+        state_file:
+            Optional file with a state snapshot stored with `save_state()`.
+            When the snapshot matches the MODELNAME and VERSION of the device
+            the values are restored from the snapshot which is a lot faster.
+            The values are refreshed from the device in the background,
+            update callbacks are only called for values that differ.
+
+        capability_cache:
+            Optional cache of functions that are not supported by the device.
+            Initialization skips the functions that are known to be unsupported
+            and stores newly found unsupported functions in the cache.
+
+        lazy:
+            Only initialize SYS and the zones, this speeds up initialization on receivers with many inputs.
+            Other subunits get initialized in the background when one of their values is read
+            or when a zone selects their input. Their values are None until then.
+            Update callbacks get called with all values once a subunit is initialized.
+            Ignored when the values are restored from the state_file, all subunits are restored then.
+
+        include, exclude:
+            Subunit ids (e.g. `SPOTIFY`), function names for all subunits (e.g. `ELAPSEDTIME`)
+            or functions of one subunit (e.g. `MAIN:SOUNDPRG`) to initialize or skip, see `SubunitSelection`.
+            Subunits that are not included are not available.
+            Values of functions that are not included are None,
+            they can be requested with `refresh()` on the subunit.
+            Entries that match no subunit or function raise a ValueError.
+
         If initialize was successful the client should call the `close()`
         method when done with the Ynca API object to cleanup.
         """
@@ -193,15 +769,30 @@ class YncaApi:
             msg = "Can only initialize once!"
             raise YncaInitializationFailedException(msg)
 
+        self._selection = SubunitSelection(include, exclude, self._known_functions())
         is_initialized = False
+        self._closed.clear()
 
         connection = YncaConnection.create_from_serial_url(self._serial_url)
-        connection.connect(self._disconnect_callback, self._communication_log_size)
+        self._connect(connection)
         self._connection = connection
 
         try:
-            self._detect_available_subunits(connection)
-            self._initialize_available_subunits(connection)
+            state = YncaState.load(state_file) if state_file is not None else None
+            modelname = version = ""
+            if state is not None or capability_cache is not None:
+                modelname, version = self._get_modelname_and_version(connection)
+            if state is None or not self._warm_start(
+                connection, state, capability_cache, modelname, version
+            ):
+                self._detect_available_subunits(connection, capability_cache, modelname)
+                self._initialize_available_subunits(
+                    connection, capability_cache, modelname, lazy=lazy
+                )
+                if capability_cache is not None:
+                    capability_cache.save()
+            if self._pacing is None and (pacing := self._model_pacing()):
+                connection.set_pacing(pacing)
             is_initialized = True
         finally:
             if not is_initialized:
@@ -209,15 +800,19 @@ class YncaApi:
 
     def _protocol_message_received(
         self,
-        _status: YncaProtocolStatus,
+        status: YncaProtocolStatus,
         subunit: str | None,
         function_: str | None,
-        _value: str | None,
+        value: str | None,
     ) -> None:
+        if status is not YncaProtocolStatus.OK:
+            return
+
         if subunit and function_ == "AVAIL":
             self._available_subunits.add(subunit)
 
         if subunit == Subunit.SYS and function_ == "VERSION":
+            self._protocol_version = protocol_version(value or "")
             self._initialized_event.set()
 
     def get_communication_log_items(self) -> list[str]:
@@ -226,11 +821,26 @@ class YncaApi:
             self._connection.get_communication_log_items() if self._connection else []
         )
 
+    def save_communication_log(self, filename: str | Path) -> None:
+        """Save the logged communication items as JSON lines for offline analysis.
+
+        Raises exception if not connected.
+        """
+        if self._connection is None:
+            msg = "Not connected, no communication log available"
+            raise YncaException(msg)
+        self._connection.save_communication_log(filename)
+
     def send_raw(self, raw_ynca_data: str) -> None:
         """Send raw YNCA data. Intended for debugging only."""
         if self._connection:
             self._connection.raw(raw_ynca_data)
 
+    @property
+    def metrics(self) -> YncaMetrics | None:
+        """Metrics of the connection, like response times and error counts. None when not initialized."""
+        return self._connection.metrics if self._connection else None
+
     def get_raw_connection(self) -> YncaConnection:
         """Get the raw underlying connection object.
 
@@ -246,118 +856,17 @@ class YncaApi:
 
     def close(self) -> None:
         """Close connection and cleanup the internal resources. Safe to be called at any time. YncaApi object should _not_ be reused after being closed."""
-        # Convert to list to avoid issues when deleting while iterating
-        for key in list(self._subunits.keys()):
-            subunit = self._subunits.pop(key)
-            subunit.close()
-        if self._connection:
-            self._connection.close()
-            self._connection = None
-
-    # Add properties for all known subunits
-    # The amount is limited as defined by the spec and it is easy to access as a user of the library
-    # Also helps with typing compared to using generic SubunitBase types
-
-    @property
-    def airplay(self) -> Airplay | None:
-        return cast(Airplay, self._subunits.get(Subunit.AIRPLAY, None))
-
-    @property
-    def bt(self) -> Bt | None:
-        return cast(Bt, self._subunits.get(Subunit.BT, None))
-
-    @property
-    def dab(self) -> Dab | None:
-        return cast(Dab, self._subunits.get(Subunit.DAB, None))
-
-    @property
-    def deezer(self) -> Deezer | None:
-        return cast(Deezer, self._subunits.get(Subunit.DEEZER, None))
-
-    @property
-    def ipod(self) -> Ipod | None:
-        return cast(Ipod, self._subunits.get(Subunit.IPOD, None))
-
-    @property
-    def ipodusb(self) -> IpodUsb | None:
-        return cast(IpodUsb, self._subunits.get(Subunit.IPODUSB, None))
-
-    @property
-    def main(self) -> Main | None:
-        return cast(Main, self._subunits.get(Subunit.MAIN, None))
-
-    @property
-    def mclink(self) -> McLink | None:
-        return cast(McLink, self._subunits.get(Subunit.MCLINK, None))
-
-    @property
-    def napster(self) -> Napster | None:
-        return cast(Napster, self._subunits.get(Subunit.NAPSTER, None))
-
-    @property
-    def netradio(self) -> NetRadio | None:
-        return cast(NetRadio, self._subunits.get(Subunit.NETRADIO, None))
-
-    @property
-    def pandora(self) -> Pandora | None:
-        return cast(Pandora, self._subunits.get(Subunit.PANDORA, None))
-
-    @property
-    def pc(self) -> Pc | None:
-        return cast(Pc, self._subunits.get(Subunit.PC, None))
-
-    @property
-    def rhap(self) -> Rhap | None:
-        return cast(Rhap, self._subunits.get(Subunit.RHAP, None))
-
-    @property
-    def server(self) -> Server | None:
-        return cast(Server, self._subunits.get(Subunit.SERVER, None))
-
-    @property
-    def sirius(self) -> Sirius | None:
-        return cast(Sirius, self._subunits.get(Subunit.SIRIUS, None))
-
-    @property
-    def siriusir(self) -> SiriusIr | None:
-        return cast(SiriusIr, self._subunits.get(Subunit.SIRIUSIR, None))
-
-    @property
-    def siriusxm(self) -> SiriusXm | None:
-        return cast(SiriusXm, self._subunits.get(Subunit.SIRIUSXM, None))
-
-    @property
-    def spotify(self) -> Spotify | None:
-        return cast(Spotify, self._subunits.get(Subunit.SPOTIFY, None))
-
-    @property
-    def sys(self) -> System | None:
-        return cast(System, self._subunits.get(Subunit.SYS, None))
-
-    @property
-    def tidal(self) -> Tidal | None:
-        return cast(Tidal, self._subunits.get(Subunit.TIDAL, None))
-
-    @property
-    def tun(self) -> Tun | None:
-        return cast(Tun, self._subunits.get(Subunit.TUN, None))
-
-    @property
-    def uaw(self) -> Uaw | None:
-        return cast(Uaw, self._subunits.get(Subunit.UAW, None))
-
-    @property
-    def usb(self) -> Usb | None:
-        return cast(Usb, self._subunits.get(Subunit.USB, None))
-
-    @property
-    def zone2(self) -> Zone2 | None:
-        return cast(Zone2, self._subunits.get(Subunit.ZONE2, None))
-
-    @property
-    def zone3(self) -> Zone3 | None:
-        return cast(Zone3, self._subunits.get(Subunit.ZONE3, None))
-
-    @property
-    def zone4(self) -> Zone4 | None:
-        return cast(Zone4, self._subunits.get(Subunit.ZONE4, None))
+        self._closed.set()
+        with self._reconnect_lock:
+            # Stops the lazy initialization thread as well
+            self._close_subunits()
+            if self._connection:
+                self._connection.close()
+                self._connection = None
+            thread, self._lazy_initialization_thread = (
+                self._lazy_initialization_thread,
+                None,
+            )
+        # Can be closed from an update callback on the lazy initialization thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
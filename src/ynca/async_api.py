@@ -0,0 +1,308 @@
+"""API running on an asyncio event loop, without additional threads."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from typing import TYPE_CHECKING
+
+from .api import Reconnect, YncaApiBase
+from .async_connection import AsyncYncaConnection
+from .connection import (
+    CommandPacing,
+    CommandPriority,
+    KeepAlive,
+    YncaProtocol,
+    YncaProtocolStatus,
+)
+from .constants import Subunit
+from .errors import (
+    YncaConnectionError,
+    YncaException,
+    YncaInitializationFailedException,
+)
+from .initializer import InitializationPlan, LazyInitialization, SubunitSelection
+from .multiresponse import protocol_version
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable, Iterable
+    from pathlib import Path
+
+    from .metrics import YncaMetrics
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncYncaApi(YncaApiBase):
+    """YNCA API for use with asyncio.
+
+    Subunits are the same as for `YncaApi`. Setting attributes does not block,
+    the commands are queued and sent by the event loop.
+    Update callbacks are called on the event loop.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        serial_url: str,
+        disconnect_callback: Callable[[], None] | None = None,
+        communication_log_size: int = 0,
+        *,
+        pacing: CommandPacing | None = None,
+        keep_alive: KeepAlive | None = None,
+        reconnect: Reconnect | None = None,
+    ) -> None:
+        """Create an async YNCA API instance.
+
+        serial_url:
+            Either a socket://host:port URL for IP connections
+            or a serial port that can be watched by the event loop, e.g. /dev/ttyUSB0.
+
+        disconnect_callback:
+            Callable that gets called when the connection gets disconnected.
+
+        communication_log_size:
+            Amount of communication items to log. Useful for debugging.
+            Get the logged items with the `get_communication_log_items` method
+
+        pacing:
+            Adapt the spacing between commands to the receiver, see `CommandPacing`.
+            When None the pacing profile of the model is used after initialization, if there is one.
+
+        keep_alive:
+            When to send keep-alives and how to wake up the receiver, see `KeepAlive`.
+
+        reconnect:
+            Reconnect automatically when the connection is lost, see `Reconnect`.
+            The disconnect_callback is then only called when reconnecting gave up.
+            When None the connection is not restored.
+        """
+        super().__init__()
+        self._serial_url = serial_url
+        self._connection: AsyncYncaConnection | None = None
+        self._disconnect_callback = disconnect_callback
+        self._communication_log_size = communication_log_size
+        self._pacing = pacing
+        self._keep_alive = keep_alive
+        self._reconnect = reconnect
+        self._reconnect_task: asyncio.Task[None] | None = None
+        self._lazy_initialization_task: asyncio.Task[None] | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+
+    async def _connect(self, connection: AsyncYncaConnection) -> None:
+        await connection.connect(
+            self._on_disconnect if self._reconnect else self._disconnect_callback,
+            self._communication_log_size,
+            # Keep the pacing profile of the model when reconnecting
+            self._pacing or self._model_pacing(),
+            self._keep_alive,
+        )
+
+    def _on_disconnect(self) -> None:
+        # A disconnect while reconnecting is handled by the running reconnect
+        if self._reconnect_task is not None and not self._reconnect_task.done():
+            return
+        logger.info("Connection lost, reconnecting")
+        self._reconnect_task = asyncio.get_running_loop().create_task(
+            self._reconnect_and_resync()
+        )
+
+    async def _reconnect_and_resync(self) -> None:
+        assert self._reconnect is not None  # noqa: S101
+        for attempt, delay in enumerate(self._reconnect.delays(), start=1):
+            await asyncio.sleep(delay)
+            if (connection := self._connection) is None:
+                return  # pragma: no cover
+            try:
+                await self._connect(connection)
+            except YncaConnectionError:
+                logger.info("Reconnect attempt %d failed", attempt)
+                continue
+            try:
+                await InitializationPlan(
+                    connection,
+                    self._resync_subunits(),
+                    resync=True,
+                    protocol_version=self._protocol_version,
+                ).async_execute(reconcile=True)
+            except YncaInitializationFailedException:
+                logger.info("Resync after reconnect attempt %d failed", attempt)
+                connection.close()
+                continue
+            logger.info("Reconnected after %d attempt(s)", attempt)
+            return
+
+        logger.warning("Reconnecting failed, giving up")
+        if self._disconnect_callback:
+            self._disconnect_callback()
+
+    async def _detect_available_subunits(
+        self, connection: AsyncYncaConnection
+    ) -> list[str]:
+        logger.info("Subunit availability check begin")
+        available_subunits: list[str] = []
+        synced = asyncio.Event()
+
+        def _message_received(
+            status: YncaProtocolStatus,
+            subunit: str | None,
+            function_: str | None,
+            value: str | None,
+        ) -> None:
+            if status is not YncaProtocolStatus.OK:
+                return
+            if subunit and function_ == "AVAIL":
+                available_subunits.append(subunit)
+            if subunit == Subunit.SYS and function_ == "VERSION":
+                self._protocol_version = protocol_version(value or "")
+                synced.set()
+
+        connection.register_message_callback(_message_received)
+        try:
+            for subunit in Subunit:
+                if self._selection.includes_subunit(subunit):
+                    connection.get(subunit, "AVAIL", CommandPriority.INITIALIZATION)
+
+            # Use @SYS:VERSION=? as end marker (even though this is not the SYS subunit)
+            connection.get(Subunit.SYS, "VERSION", CommandPriority.INITIALIZATION)
+
+            # Take command spacing into account and apply large margin
+            # Large margin is needed in practice on slower/busier systems
+            try:
+                await asyncio.wait_for(
+                    synced.wait(),
+                    2 + (len(Subunit) + 1) * (YncaProtocol.COMMAND_SPACING * 5),
+                )
+            except TimeoutError:
+                msg = "Subunit availability check failed"
+                raise YncaInitializationFailedException(msg) from None
+        finally:
+            connection.unregister_message_callback(_message_received)
+
+        logger.info("Subunit availability check end")
+        return available_subunits
+
+    async def initialize(
+        self,
+        *,
+        lazy: bool = False,
+        include: Iterable[str] | None = None,
+        exclude: Iterable[str] | None = None,
+    ) -> None:
+        """Set up a connection to the device and initialize the API.
+
+        This takes quite a while (~10 seconds on a simple 2 zone receiver), but does not block the event loop.
+
+        lazy:
+            Only initialize SYS and the zones, see `YncaApi.initialize`.
+
+        include, exclude:
+            Subunits and functions to initialize or skip, see `YncaApi.initialize`.
+
+        If initialize was successful the client should call the `close()`
+        method when done with the API object to cleanup.
+        """
+        if self._connection is not None:
+            msg = "Can only initialize once!"
+            raise YncaInitializationFailedException(msg)
+
+        self._selection = SubunitSelection(include, exclude, self._known_functions())
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        connection = AsyncYncaConnection.create_from_serial_url(self._serial_url)
+        await self._connect(connection)
+        self._connection = connection
+
+        try:
+            available_subunits = await self._detect_available_subunits(connection)
+            subunits = self._create_subunits(connection, available_subunits)
+            subunits, lazy_subunits = self._split_lazy_subunits(subunits, lazy=lazy)
+            await InitializationPlan(
+                connection, subunits, protocol_version=self._protocol_version
+            ).async_execute()
+            if lazy_subunits:
+                self._lazy_initialization = LazyInitialization(
+                    connection,
+                    lazy_subunits,
+                    self._start_lazy_initialization,
+                    protocol_version=self._protocol_version,
+                )
+                self._request_selected_inputs()
+            if self._pacing is None and (pacing := self._model_pacing()):
+                connection.set_pacing(pacing)
+        except BaseException:
+            self.close()
+            raise
+
+    def _start_lazy_initialization(
+        self, lazy_initialization: LazyInitialization
+    ) -> None:
+        assert self._loop is not None  # noqa: S101
+        if threading.get_ident() == self._loop_thread_id:
+            self._create_lazy_initialization_task(lazy_initialization)
+        else:
+            # Values can be read from other threads, e.g. when used with YncaFleet
+            self._loop.call_soon_threadsafe(
+                self._create_lazy_initialization_task, lazy_initialization
+            )
+
+    def _create_lazy_initialization_task(
+        self, lazy_initialization: LazyInitialization
+    ) -> None:
+        assert self._loop is not None  # noqa: S101
+        self._lazy_initialization_task = self._loop.create_task(
+            lazy_initialization.async_run()
+        )
+
+    def get_communication_log_items(self) -> list[str]:
+        """Get a list of logged communication items."""
+        return (
+            self._connection.get_communication_log_items() if self._connection else []
+        )
+
+    def save_communication_log(self, filename: str | Path) -> None:
+        """Save the logged communication items as JSON lines for offline analysis.
+
+        Raises exception if not connected.
+        """
+        if self._connection is None:
+            msg = "Not connected, no communication log available"
+            raise YncaException(msg)
+        self._connection.save_communication_log(filename)
+
+    def send_raw(self, raw_ynca_data: str) -> None:
+        """Send raw YNCA data. Intended for debugging only."""
+        if self._connection:
+            self._connection.raw(raw_ynca_data)
+
+    @property
+    def metrics(self) -> YncaMetrics | None:
+        """Metrics of the connection, like response times and error counts. None when not initialized."""
+        return self._connection.metrics if self._connection else None
+
+    def get_raw_connection(self) -> AsyncYncaConnection:
+        """Get the raw underlying connection object.
+
+        Note that this is intended for exceptional cases!
+        Do _not_ close the connection; it is still managed by the AsyncYncaApi.
+        Raises exception if not initialized.
+        """
+        if not self._connection:
+            msg = "Not initialized, no connection available"
+            raise YncaException(msg)
+
+        return self._connection
+
+    def close(self) -> None:
+        """Close connection and cleanup the internal resources. Safe to be called at any time. AsyncYncaApi object should _not_ be reused after being closed."""
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._lazy_initialization_task is not None:
+            self._lazy_initialization_task.cancel()
+            self._lazy_initialization_task = None
+        self._close_subunits()
+        if self._connection:
+            self._connection.close()
+            self._connection = None
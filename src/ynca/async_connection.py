@@ -0,0 +1,507 @@
+"""Connection running on an asyncio event loop, without additional threads."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, cast
+from urllib.parse import urlsplit
+
+import serial  # type: ignore[import-untyped]
+
+from .connection import YncaConnectionBase
+from .errors import YncaConnectionError, YncaRequestFailed, YncaRequestTimeout
+from .protocol import (
+    KEEP_ALIVE_COMMAND,
+    SYNC_COMMAND,
+    CommandPacing,
+    CommandPriority,
+    CommunicationLog,
+    KeepAlive,
+    PacingStats,
+    YncaProtocolStatus,
+    _KeepAliveMonitor,
+    _Pacer,
+    _parse_command,
+    _parse_received_line,
+    _SendQueue,
+    _Sync,
+    _SyncTracker,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable
+    from pathlib import Path
+
+    from .connection import TimerHandle
+
+logger = logging.getLogger(__name__)
+
+TERMINATOR = b"\r\n"
+
+
+class _SocketProtocol(asyncio.Protocol):
+    def __init__(self, connection: AsyncYncaConnection) -> None:
+        self._connection = connection
+
+    def data_received(self, data: bytes) -> None:
+        self._connection._data_received(data)  # noqa: SLF001
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self._connection._connection_lost(exc)  # noqa: SLF001
+
+
+class AsyncYncaConnection(YncaConnectionBase):
+    """Connection to a receiver driven by the running asyncio event loop.
+
+    Sending is scheduled with timers on the event loop to maintain the command spacing,
+    so one event loop can drive many receivers without extra threads.
+    Message callbacks are called on the event loop.
+    """
+
+    @classmethod
+    def create_from_serial_url(cls, serial_url: str) -> AsyncYncaConnection:
+        """Create an AsyncYncaConnection instance.
+
+        serial_url:
+            Either a socket://host:port URL for IP connections
+            or a serial port that can be watched by the event loop, e.g. /dev/ttyUSB0.
+        """
+        return cls(serial_url)
+
+    def __init__(self, serial_url: str) -> None:
+        """Instantiate an AsyncYncaConnection, see `create_from_serial_url` for supported serial_urls."""
+        super().__init__()
+        self._port = serial_url
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._transport: asyncio.Transport | None = None
+        self._serial: serial.Serial | None = None
+        self._connected = False
+        self._is_closing = False
+        self._disconnect_callback: Callable[[], None] | None = None
+
+        self._receive_buffer = b""
+        self._communication_log = CommunicationLog(0)
+        self._keep_alive = _KeepAliveMonitor(KeepAlive(), self.metrics)
+        # Probe sent and waiting for a response before sending the next command
+        self._probing = False
+        # A probe was sent since the last command, a queued keep-alive is not needed anymore
+        self._probed = False
+        self._last_sent: tuple[str | None, str | None] = (None, None)
+        self._last_sent_is_get = False
+        self._syncs = _SyncTracker()
+
+        self._send_queue = _SendQueue(self.metrics.queue_wait)
+        self.metrics.queue_depths = self._send_queue.depths
+        self._send_handle: asyncio.TimerHandle | None = None
+        self._keep_alive_handle: asyncio.TimerHandle | None = None
+        self._next_send_time = 0.0
+        self._num_commands_sent = 0
+        self._pacer = _Pacer(metrics=self.metrics)
+        self._command_done_handle: asyncio.TimerHandle | None = None
+        self._spacing = 0.0
+        self._loop_thread_id: int | None = None
+
+        self._pending_gets: dict[
+            tuple[str, str], asyncio.Future[tuple[YncaProtocolStatus, str | None]]
+        ] = {}
+
+    async def connect(
+        self,
+        disconnect_callback: Callable[[], None] | None = None,
+        communication_log_size: int = 0,
+        pacing: CommandPacing | None = None,
+        keep_alive: KeepAlive | None = None,
+    ) -> None:
+        """Connect to the receiver.
+
+        disconnect_callback:
+            Will be called when the connection is lost. It will _not_ be called when `close()` is called explicitly.
+
+        communication_log_size:
+            Amount of communication items to log. Useful for debugging.
+            Get the logged items with the `get_communication_log_items` method
+
+        pacing:
+            Adapt the spacing between commands to the response times of the receiver, see `CommandPacing`.
+
+        keep_alive:
+            When to send keep-alives and how to wake up the receiver, see `KeepAlive`.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._pacer.set_pacing(pacing)
+        self._keep_alive = _KeepAliveMonitor(keep_alive or KeepAlive(), self.metrics)
+        self._loop_thread_id = threading.get_ident()
+        # The connection can be connected again after being closed
+        self._is_closing = False
+        self._receive_buffer = b""
+        self._disconnect_callback = disconnect_callback
+        self._communication_log = CommunicationLog(communication_log_size)
+
+        try:
+            if self._port.startswith("socket://"):
+                hostname, port = self._socket_address()
+                transport, _ = await self._loop.create_connection(
+                    lambda: _SocketProtocol(self), hostname, port
+                )
+                self._transport = transport  # type: ignore[assignment]
+            else:
+                self._serial = serial.serial_for_url(self._port, timeout=0)
+                self._loop.add_reader(self._serial.fileno(), self._serial_readable)
+        except (AttributeError, OSError, serial.SerialException, ValueError) as e:
+            # AttributeError for URL handlers that do not have a fileno() at all
+            if self._serial is not None:
+                self._serial.close()
+                self._serial = None
+            raise YncaConnectionError from e
+
+        logger.debug("Connected")
+        self._connected = True
+        self.metrics.num_connects += 1
+
+        self._probing = False
+        self._probed = False
+        self._keep_alive.connected(self._loop.time())
+        self._schedule_keep_alive()
+
+        # Check the connection right away, the receiver gets woken up first if needed
+        self._send_keepalive(CommandPriority.INTERACTIVE)
+
+    def _socket_address(self) -> tuple[str, int]:
+        url = urlsplit(self._port)
+        if url.hostname is None or url.port is None:
+            msg = f"Invalid socket URL {self._port}, expected socket://host:port"
+            raise ValueError(msg)
+        return url.hostname, url.port
+
+    def close(self) -> None:
+        """Close the connection."""
+        self._is_closing = True
+        self._shutdown()
+
+    def _shutdown(self) -> None:
+        self._connected = False
+        self._send_queue.clear()
+        self._syncs.clear()
+        for handle in (
+            self._send_handle,
+            self._keep_alive_handle,
+            self._command_done_handle,
+        ):
+            if handle is not None:
+                handle.cancel()
+        self._send_handle = None
+        self._keep_alive_handle = None
+        self._command_done_handle = None
+
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        if self._serial is not None:
+            # Serial is only opened when there is a loop
+            cast(asyncio.AbstractEventLoop, self._loop).remove_reader(
+                self._serial.fileno()
+            )
+            self._serial.close()
+            self._serial = None
+
+    def _connection_lost(self, exc: Exception | None) -> None:
+        logger.debug("Connection closed/lost %s", exc)
+        was_connected = self._connected
+        self._transport = None
+        self._shutdown()
+
+        # Disconnect callback is for unexpected disconnects
+        if was_connected and not self._is_closing and self._disconnect_callback:
+            self._disconnect_callback()
+
+    def _serial_readable(self) -> None:
+        assert self._serial is not None  # noqa: S101
+        try:
+            data = self._serial.read(self._serial.in_waiting or 1)
+        except (OSError, serial.SerialException) as e:
+            self._connection_lost(e)
+            return
+        self._data_received(data)
+
+    def _data_received(self, data: bytes) -> None:
+        self._receive_buffer += data
+        while TERMINATOR in self._receive_buffer:
+            packet, self._receive_buffer = self._receive_buffer.split(TERMINATOR, 1)
+            self._handle_line(packet.decode("utf-8", "replace"))
+
+    def _handle_line(self, line: str) -> None:
+        logger.debug("Recv - %s", line)
+        if self._communication_log.enabled:
+            self._communication_log.add(
+                time.perf_counter(), CommunicationLog.RECEIVED, line
+            )
+
+        status, subunit, function, value = _parse_received_line(line, self._last_sent)
+        self.metrics.num_lines_received += 1
+        self.metrics.num_received[status] += 1
+
+        # Lines are only received when connected, so there is a loop
+        now = cast(asyncio.AbstractEventLoop, self._loop).time()
+        self._pacer.response_received(status, subunit, now)
+
+        ignore = self._keep_alive.is_keep_alive_response(subunit, function, value)
+        self._keep_alive.line_received(now)
+
+        # Receiver is awake, no need to wait for the probe timeout
+        if self._probing:
+            self._probing = False
+            if self._send_handle is not None:
+                self._send_handle.cancel()
+                self._send_handle = None
+            self._schedule_send()
+
+        if not ignore:
+            self._call_registered_message_callbacks(status, subunit, function, value)
+
+        if (
+            status is YncaProtocolStatus.OK
+            and subunit == "SYS"
+            and function == "VERSION"
+            and (callback := self._syncs.received(now)) is not None
+        ):
+            callback()
+
+    def _call_registered_message_callbacks(
+        self,
+        status: YncaProtocolStatus,
+        subunit: str | None,
+        function_: str | None,
+        value: str | None,
+    ) -> None:
+        # Errors are attributed to the last command sent, only a failed GET resolves a pending GET
+        if (
+            self._pending_gets
+            and subunit is not None
+            and function_ is not None
+            and (status is YncaProtocolStatus.OK or self._last_sent_is_get)
+        ):
+            future = self._pending_gets.pop((subunit, function_), None)
+            if future is not None and not future.done():
+                future.set_result((status, value))
+
+        super()._call_registered_message_callbacks(status, subunit, function_, value)
+
+    def _enqueue(self, message: str | _Sync, priority: CommandPriority) -> None:
+        if self._connected:
+            self._send_queue.put(message, priority)
+            # Commands can be queued from other threads, e.g. when used by a YncaFleet
+            if threading.get_ident() == self._loop_thread_id:
+                self._schedule_send()
+            elif self._loop is not None:
+                self._loop.call_soon_threadsafe(self._schedule_send)
+
+    def _schedule_send(self) -> None:
+        if self._send_handle is None and self._loop is not None:
+            delay = max(0.0, self._next_send_time - self._loop.time())
+            self._send_handle = self._loop.call_later(delay, self._send_next)
+
+    def _send_next(self) -> None:
+        assert self._loop is not None  # noqa: S101
+        self._send_handle = None
+        self._probing = False
+        if self._send_queue.empty():
+            return
+
+        # Timers due at the same time can run in any order,
+        # make sure the previous command is done before sending the next
+        if self._command_done_handle is not None:
+            self._command_done_handle.cancel()
+            self._command_done()
+
+        now = self._loop.time()
+        if self._keep_alive.needs_probe(now):
+            # Queued commands wait for the response or the probe timeout, see `_handle_line`
+            self._keep_alive.probe_sent(now)
+            self._write_message(KEEP_ALIVE_COMMAND, now)
+            self._probing = True
+            self._probed = True
+            self._send_handle = self._loop.call_later(
+                self._spacing + self._keep_alive.keep_alive.probe_timeout,
+                self._send_next,
+            )
+            return
+
+        message = self._send_queue.get(0)
+        probed, self._probed = self._probed, False
+        if message == "_KEEP_ALIVE":
+            # A probe is a keep-alive as well
+            if not probed:
+                self._keep_alive.keep_alive_sent(now)
+                self._write_message(KEEP_ALIVE_COMMAND, now)
+        elif isinstance(message, _Sync):
+            self._write_message(SYNC_COMMAND, now, message.callback)
+        else:
+            if message == KEEP_ALIVE_COMMAND:
+                self._keep_alive.requested()
+            self._write_message(message, now)
+        self._schedule_send()
+
+    def _write_message(
+        self,
+        message: str,
+        now: float,
+        sync_callback: Callable[[], None] | None = None,
+    ) -> None:
+        logger.debug("Send - %s", message)
+        if self._communication_log.enabled:
+            self._communication_log.add(
+                time.perf_counter(), CommunicationLog.SEND, message
+            )
+        if message == SYNC_COMMAND:
+            self._syncs.written(now, sync_callback)
+        self._last_sent = _parse_command(message)
+        self._last_sent_is_get = message.endswith("=?")
+        self._pacer.command_sent(self._last_sent, now, is_get=self._last_sent_is_get)
+        data = message.encode("utf-8") + TERMINATOR
+        if self._transport is not None:
+            self._transport.write(data)
+        elif self._serial is not None:
+            self._serial.write(data)
+        self.metrics.num_commands_written += 1
+        self._keep_alive.command_sent(now)
+
+        # Maintain required command spacing without blocking the loop
+        self._spacing = self._pacer.spacing
+        self._command_done_handle = cast(
+            asyncio.AbstractEventLoop, self._loop
+        ).call_later(self._spacing, self._command_done)
+        self._next_send_time = now + self._spacing
+
+    def _schedule_keep_alive(self) -> None:
+        assert self._loop is not None  # noqa: S101
+        # To avoid random message being eaten because device goes to sleep, keep it alive
+        delay = self._keep_alive.time_until_keep_alive(self._loop.time())
+        if delay == 0:
+            self._send_keepalive()
+            delay = self._keep_alive.interval
+        self._keep_alive_handle = self._loop.call_later(
+            delay, self._schedule_keep_alive
+        )
+
+    def _command_done(self) -> None:
+        self._command_done_handle = None
+        self._pacer.command_done(self._spacing)
+
+    def _send_keepalive(
+        self, priority: CommandPriority = CommandPriority.KEEPALIVE
+    ) -> None:
+        self._enqueue("_KEEP_ALIVE", priority)
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> TimerHandle:
+        """Call the callback after delay seconds, on the event loop."""
+        assert self._loop is not None  # noqa: S101
+        return self._loop.call_later(delay, callback)
+
+    def raw(self, raw_data: str) -> None:
+        """Send raw data to the receiver."""
+        if self._connected:
+            self._enqueue(raw_data, CommandPriority.INTERACTIVE)
+            self._num_commands_sent += 1
+
+    def put(
+        self,
+        subunit: str,
+        funcname: str,
+        parameter: str,
+        priority: CommandPriority = CommandPriority.INTERACTIVE,
+    ) -> None:
+        """Queue a PUT request to set a value of a function on a subunit of the receiver. Does not block."""
+        if self._connected:
+            self._enqueue(f"@{subunit}:{funcname}={parameter}", priority)
+            self._num_commands_sent += 1
+
+    def get(
+        self,
+        subunit: str,
+        funcname: str,
+        priority: CommandPriority = CommandPriority.REFRESH,
+    ) -> None:
+        """Queue a GET request to get a value of a function on a subunit of the receiver. Does not block, use `get_value` to wait for the response."""
+        self.put(subunit, funcname, "?", priority)
+
+    def sync(
+        self,
+        callback: Callable[[], None],
+        priority: CommandPriority = CommandPriority.REFRESH,
+    ) -> None:
+        """Queue a `@SYS:VERSION=?` sync, the callback gets called on the event loop when the response to this request is received."""
+        if self._connected:
+            self._enqueue(_Sync(callback), priority)
+            self._num_commands_sent += 1
+
+    async def get_value(
+        self,
+        subunit: str,
+        funcname: str,
+        # Same as YncaConnection.get_value, a timeout raises YncaRequestTimeout
+        timeout: float = 2.0,  # noqa: ASYNC109
+        priority: CommandPriority = CommandPriority.INTERACTIVE,
+    ) -> str:
+        """Send a GET request and wait for the value in the response.
+
+        The next received value for the function is returned, this can also be a change reported by the receiver.
+        Concurrent calls for the same function share a single GET request.
+
+        Raises YncaRequestFailed when the receiver responds with @UNDEFINED or @RESTRICTED
+        and YncaRequestTimeout when no response is received within timeout seconds.
+        """
+        key = (subunit, funcname)
+        future = self._pending_gets.get(key)
+        if future is None:
+            future = self._pending_gets[key] = (
+                asyncio.get_running_loop().create_future()
+            )
+            self.get(subunit, funcname, priority)
+
+        try:
+            # Shield so a timeout of one caller does not cancel the others
+            status, value = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except TimeoutError:
+            if self._pending_gets.get(key) is future:
+                del self._pending_gets[key]
+            msg = f"No response for @{subunit}:{funcname} within {timeout} seconds"
+            raise YncaRequestTimeout(msg) from None
+
+        if status is not YncaProtocolStatus.OK:
+            msg = f"Receiver responded @{status.name} for @{subunit}:{funcname}"
+            raise YncaRequestFailed(msg)
+
+        return cast(str, value)
+
+    @property
+    def connected(self) -> bool:
+        """Indicates if connection is connected or not."""
+        return self._connected
+
+    @property
+    def num_commands_sent(self) -> int:
+        """Get the amount of commands sent."""
+        return self._num_commands_sent
+
+    def get_send_queue_depths(self) -> dict[CommandPriority, int]:
+        """Get the amount of commands waiting to be sent per priority."""
+        return self._send_queue.depths()
+
+    def set_pacing(self, pacing: CommandPacing | None) -> None:
+        """Change the pacing of commands, see `connect`."""
+        self._pacer.set_pacing(pacing)
+
+    def get_pacing_stats(self) -> PacingStats:
+        """Get statistics of the spacing between commands, like the effective command rate."""
+        return self._pacer.stats()
+
+    def get_communication_log_items(self) -> list[str]:
+        """Get a list of logged communication items."""
+        return self._communication_log.get_items()
+
+    def save_communication_log(self, filename: str | Path) -> None:
+        """Save the logged communication items as JSON lines for offline analysis."""
+        self._communication_log.save(filename)
@@ -0,0 +1,135 @@
+"""Learned per model cache of unsupported functions."""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+import json
+import logging
+from pathlib import Path
+import time
+from typing import TYPE_CHECKING
+
+from .protocol import YncaProtocolStatus
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Iterable, Iterator
+
+    from .connection import YncaConnectionBase
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def collect_errors(
+    connection: YncaConnectionBase,
+) -> Iterator[dict[tuple[str, str], YncaProtocolStatus]]:
+    """Collect the @UNDEFINED and @RESTRICTED responses per (subunit, function) while active."""
+    errors: dict[tuple[str, str], YncaProtocolStatus] = {}
+
+    def _message_received(
+        status: YncaProtocolStatus,
+        subunit: str | None,
+        function_: str | None,
+        _value: str | None,
+    ) -> None:
+        if (
+            status is not YncaProtocolStatus.OK
+            and subunit is not None
+            and function_ is not None
+        ):
+            errors[(subunit, function_)] = status
+
+    connection.register_message_callback(_message_received)
+    try:
+        yield errors
+    finally:
+        connection.unregister_message_callback(_message_received)
+
+
+class YncaCapabilityCache:
+    """Cache of functions that responded with @UNDEFINED per model.
+
+    Initialization skips GET requests for functions that are known to be unsupported
+    which saves the command spacing for each of them.
+    Functions that responded with @RESTRICTED are not cached, that usually depends
+    on the state of the device, e.g. the zone being off.
+    """
+
+    def __init__(
+        self,
+        filename: str | Path | None = None,
+        revalidate_after: float | None = None,
+    ) -> None:
+        """Create a capability cache.
+
+        filename:
+            Optional file to load the cache from and save it to.
+
+        revalidate_after:
+            Seconds after which unsupported functions are probed again.
+            When None unsupported functions are never probed again.
+        """
+        self._filename = Path(filename) if filename is not None else None
+        self._revalidate_after = revalidate_after
+
+        # modelname -> "SUBUNIT:FUNCTION" -> (status name, timestamp)
+        self._models: dict[str, dict[str, tuple[str, float]]] = {}
+
+        if self._filename is not None:
+            self._load(self._filename)
+
+    def _load(self, filename: Path) -> None:
+        try:
+            data = json.loads(filename.read_text(encoding="utf-8"))
+            self._models = {
+                modelname: {
+                    key: (status, timestamp)
+                    for key, (status, timestamp) in entries.items()
+                }
+                for modelname, entries in data.items()
+            }
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(
+                "Ignoring capability cache %s, could not load it: %s", filename, e
+            )
+
+    def save(self) -> None:
+        """Save the cache to the file it was created with, if any."""
+        if self._filename is not None:
+            self._filename.write_text(
+                json.dumps(self._models, separators=(",", ":")), encoding="utf-8"
+            )
+
+    def is_unsupported(self, modelname: str, subunit: str, function: str) -> bool:
+        """Check if the function is known to be unsupported and is not due for revalidation."""
+        entry = self._models.get(modelname, {}).get(f"{subunit}:{function}")
+        # Older caches also stored @RESTRICTED
+        if entry is None or entry[0] != YncaProtocolStatus.UNDEFINED.name:
+            return False
+        return (
+            self._revalidate_after is None
+            or time.time() - entry[1] < self._revalidate_after
+        )
+
+    def update(
+        self,
+        modelname: str,
+        probed: Iterable[tuple[str, str]],
+        errors: dict[tuple[str, str], YncaProtocolStatus],
+    ) -> None:
+        """Update the cache with the results of probed functions.
+
+        Probed functions that responded with @UNDEFINED are stored as unsupported,
+        the other probed functions are removed from the cache.
+        """
+        entries = self._models.setdefault(modelname, {})
+        now = time.time()
+        for subunit, function in probed:
+            key = f"{subunit}:{function}"
+            status = errors.get((subunit, function))
+            if status is YncaProtocolStatus.UNDEFINED:
+                entries[key] = (status.name, now)
+            else:
+                entries.pop(key, None)
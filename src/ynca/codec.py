@@ -0,0 +1,38 @@
+"""Parsing of YNCA lines like `@SUBUNIT:FUNCTION=VALUE`."""
+
+from __future__ import annotations
+
+import sys
+
+_intern = sys.intern
+
+
+def parse_line(line: str) -> tuple[str, str, str] | None:
+    """Parse a line into subunit, function and value, None if the line is not a YNCA command.
+
+    Subunit and function names are interned since there are only a few of them
+    and they are used for lookups. The value is taken as is, including any `:` and `=`.
+    """
+    if not line.startswith("@"):
+        return None
+    head, separator, value = line.partition("=")
+    if not separator:
+        return None
+    subunit, separator, function = head.partition(":")
+    if not separator or subunit == "@" or not function:
+        return None
+    return (_intern(subunit[1:]), _intern(function), value)
+
+
+def parse_line_bytes(
+    line: bytes, encoding: str = "utf-8"
+) -> tuple[str, str, str] | None:
+    """Parse a line that was not decoded yet, see `parse_line`.
+
+    Lines that can not be a YNCA command are not decoded at all.
+    Undecodable characters are replaced.
+    """
+    if not line.startswith(b"@"):
+        return None
+    # Decoding the whole line at once is faster than decoding the parts
+    return parse_line(line.decode(encoding, "replace"))
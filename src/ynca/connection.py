@@ -1,17 +1,40 @@
 from __future__ import annotations
 
+from abc import ABC, abstractmethod
 import logging
 import threading
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING, Protocol, cast
 
 import serial  # type: ignore[import-untyped]
 import serial.threaded  # type: ignore[import-untyped]
 
-from .errors import YncaConnectionError, YncaConnectionFailed
-from .protocol import YncaProtocol, YncaProtocolStatus
+from .errors import (
+    YncaConnectionError,
+    YncaConnectionFailed,
+    YncaRequestFailed,
+    YncaRequestTimeout,
+)
+from .metrics import YncaMetrics
+from .protocol import (
+    CommandPacing,
+    CommandPriority,
+    CommunicationLog,
+    KeepAlive,
+    PacingStats,
+    RelativeCommandMode,
+    YncaProtocol,
+    YncaProtocolStatus,
+)
 
 if TYPE_CHECKING:  # pragma: no cover
     from collections.abc import Callable
+    from pathlib import Path
+
+    from .dispatcher import CallbackDispatcher
+
+    MessageCallback = Callable[
+        [YncaProtocolStatus, str | None, str | None, str | None], None
+    ]
 
 logger = logging.getLogger(__name__)
 
@@ -38,7 +61,168 @@ class _ReaderThread(serial.threaded.ReaderThread):
                 self.protocol = None
 
 
-class YncaConnection:
+class TimerHandle(Protocol):  # pragma: no cover
+    """Handle of a scheduled call, like `threading.Timer` or `asyncio.TimerHandle`."""
+
+    def cancel(self) -> None: ...
+
+
+class _PendingGet:
+    """GET waiting for its response, shared by all callers waiting for the same function."""
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.status = YncaProtocolStatus.OK
+        self.value: str | None = None
+
+
+class YncaConnectionBase(ABC):
+    """Baseclass for connections, handles the message callbacks."""
+
+    def __init__(self) -> None:
+        # Callbacks are stored in immutable containers that get replaced on (un)registering
+        # so messages can be dispatched without locking or copying
+        self._message_callbacks: frozenset[MessageCallback] = frozenset()
+        self._subunit_message_callbacks: dict[str, frozenset[MessageCallback]] = {}
+        self._callbacks_lock = threading.Lock()
+
+        # Runs the callbacks registered with dispatch=True, when None they run inline
+        self.callback_dispatcher: CallbackDispatcher | None = None
+        self._dispatching_callbacks: dict[
+            tuple[MessageCallback, str | None], MessageCallback
+        ] = {}
+
+        # Kept over reconnects
+        self.metrics = YncaMetrics()
+
+    def register_message_callback(
+        self,
+        callback: MessageCallback,
+        subunit: str | None = None,
+        *,
+        dispatch: bool = False,
+    ) -> None:
+        """Register a callback to be called when a message is received.
+
+        subunit:
+            Only call the callback for messages of this subunit.
+            When None the callback is called for all messages.
+
+        dispatch:
+            Call the callback through the `callback_dispatcher` instead of
+            on the thread receiving the data, e.g. for slow callbacks.
+            Messages of the same subunit are still handled in order.
+
+        For @UNDEFINED and @RESTRICTED responses the subunit and function
+        are the ones of the command that caused the response.
+        """
+        with self._callbacks_lock:
+            if dispatch:
+                callback = self._dispatching_callbacks.setdefault(
+                    (callback, subunit), self._dispatching(callback)
+                )
+            if subunit is None:
+                self._message_callbacks = self._message_callbacks | {callback}
+            else:
+                self._subunit_message_callbacks[subunit] = (
+                    self._subunit_message_callbacks.get(subunit, frozenset())
+                    | {callback}
+                )
+
+    def unregister_message_callback(
+        self,
+        callback: MessageCallback,
+        subunit: str | None = None,
+    ) -> None:
+        """Unregister a previously registered callback. Provide the same subunit as used for registering."""
+        with self._callbacks_lock:
+            callback = self._dispatching_callbacks.pop((callback, subunit), callback)
+            if subunit is None:
+                self._message_callbacks = self._message_callbacks - {callback}
+            elif subunit in self._subunit_message_callbacks:
+                self._subunit_message_callbacks[subunit] = (
+                    self._subunit_message_callbacks[subunit] - {callback}
+                )
+
+    def _dispatching(self, callback: MessageCallback) -> MessageCallback:
+        def _dispatch(
+            status: YncaProtocolStatus,
+            subunit: str | None,
+            function_: str | None,
+            value: str | None,
+        ) -> None:
+            if (dispatcher := self.callback_dispatcher) is not None:
+                dispatcher.submit(subunit, callback, status, subunit, function_, value)
+            else:
+                callback(status, subunit, function_, value)
+
+        return _dispatch
+
+    def _call_registered_message_callbacks(
+        self,
+        status: YncaProtocolStatus,
+        subunit: str | None,
+        function_: str | None,
+        value: str | None,
+    ) -> None:
+        for callback in self._message_callbacks:
+            callback(status, subunit, function_, value)
+
+        if subunit is not None and (
+            callbacks := self._subunit_message_callbacks.get(subunit)
+        ):
+            for callback in callbacks:
+                callback(status, subunit, function_, value)
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> TimerHandle:
+        """Call the callback after delay seconds, on a timer thread."""
+        timer = threading.Timer(delay, callback)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    @abstractmethod
+    def raw(self, raw_data: str) -> None:
+        """Send raw data to the receiver."""
+
+    @abstractmethod
+    def put(
+        self,
+        subunit: str,
+        funcname: str,
+        parameter: str,
+        priority: CommandPriority = CommandPriority.INTERACTIVE,
+    ) -> None:
+        """Send a PUT request to set a value of a function on a subunit of the receiver."""
+
+    @abstractmethod
+    def get(
+        self,
+        subunit: str,
+        funcname: str,
+        priority: CommandPriority = CommandPriority.REFRESH,
+    ) -> None:
+        """Send a GET request to get a value of a function on a subunit of the receiver. Note that only a request is sent, no response is awaited."""
+
+    @abstractmethod
+    def sync(
+        self,
+        callback: Callable[[], None],
+        priority: CommandPriority = CommandPriority.REFRESH,
+    ) -> None:
+        """Send a `@SYS:VERSION=?` sync, the callback gets called when the response to this request is received.
+
+        The receiver handles commands in order, so the commands sent before the sync are handled by then.
+        Responses to other `@SYS:VERSION=?` requests do not call the callback.
+        """
+
+    @property
+    @abstractmethod
+    def num_commands_sent(self) -> int:
+        """Get the amount of commands sent."""
+
+
+class YncaConnection(YncaConnectionBase):
     @classmethod
     def create_from_serial_url(cls, serial_url: str) -> YncaConnection:
         """Create a YncaConnection instance.
@@ -64,6 +248,7 @@ class YncaConnection:
             or select a specific usb-2-serial with hwgrep:// which is
             useful when the links to ttyUSB# change randomly.
         """
+        super().__init__()
         self._port = serial_url
         self._serial = None
         self._readerthread: _ReaderThread | None = None
@@ -72,37 +257,43 @@ class YncaConnection:
         self._is_closing = threading.Event()
         self._disconnect_callback: Callable[[], None] | None = None
 
-        self._message_callbacks: set[
-            Callable[[YncaProtocolStatus, str | None, str | None, str | None], None]
-        ] = set()
+        self._pending_gets: dict[tuple[str, str], _PendingGet] = {}
+        self._pending_gets_lock = threading.Lock()
 
-    def register_message_callback(
+    def _call_registered_message_callbacks(
         self,
-        callback: Callable[
-            [YncaProtocolStatus, str | None, str | None, str | None], None
-        ],
+        status: YncaProtocolStatus,
+        subunit: str | None,
+        function_: str | None,
+        value: str | None,
     ) -> None:
-        """Register a callback to be called when a message is received."""
-        self._message_callbacks.add(callback)
+        # Errors are attributed to the last command sent, only a failed GET resolves a pending GET
+        if (
+            self._pending_gets
+            and subunit is not None
+            and function_ is not None
+            and (
+                status is YncaProtocolStatus.OK
+                or (self._protocol is not None and self._protocol.last_sent_is_get)
+            )
+        ):
+            self._resolve_pending_get(status, subunit, function_, value)
 
-    def unregister_message_callback(
-        self,
-        callback: Callable[
-            [YncaProtocolStatus, str | None, str | None, str | None], None
-        ],
-    ) -> None:
-        """Unregister a previously registered callback."""
-        self._message_callbacks.discard(callback)
+        super()._call_registered_message_callbacks(status, subunit, function_, value)
 
-    def _call_registered_message_callbacks(
+    def _resolve_pending_get(
         self,
         status: YncaProtocolStatus,
-        subunit: str | None,
-        function_: str | None,
+        subunit: str,
+        function_: str,
         value: str | None,
     ) -> None:
-        for callback in self._message_callbacks:
-            callback(status, subunit, function_, value)
+        with self._pending_gets_lock:
+            pending_get = self._pending_gets.pop((subunit, function_), None)
+        if pending_get is not None:
+            pending_get.status = status
+            pending_get.value = value
+            pending_get.event.set()
 
     def _on_disconnect(self) -> None:
         # Disconnect callback is for unexpected disconnects
@@ -110,10 +301,15 @@ class YncaConnection:
         if self._disconnect_callback and not self._is_closing.is_set():
             self._disconnect_callback()
 
-    def connect(
+    def connect(  # noqa: PLR0913
         self,
         disconnect_callback: Callable[[], None] | None = None,
         communication_log_size: int = 0,
+        *,
+        coalesce_puts: bool = False,
+        relative_command_mode: RelativeCommandMode = RelativeCommandMode.PRESERVE,
+        pacing: CommandPacing | None = None,
+        keep_alive: KeepAlive | None = None,
     ) -> None:
         """Connect to the receiver.
 
@@ -123,8 +319,26 @@ class YncaConnection:
         communication_log_size:
             Amount of communication items to log. Useful for debugging.
             Get the logged items with the `get_communication_log_items` method
+
+        coalesce_puts:
+            When enabled a PUT for a function that still has a PUT waiting in the send queue
+            replaces the value of the waiting PUT instead of being queued.
+            Useful to avoid lagging behind when values change rapidly, e.g. dragging a volume slider.
+
+        relative_command_mode:
+            How coalescing handles relative values like Up and Down, see `RelativeCommandMode`.
+
+        pacing:
+            Adapt the spacing between commands to the response times of the receiver, see `CommandPacing`.
+            When None the fixed `YncaProtocol.COMMAND_SPACING` is used.
+
+        keep_alive:
+            When to send keep-alives and how to wake up the receiver, see `KeepAlive`.
+            When None the defaults of `KeepAlive` are used.
         """
         try:
+            # The connection can be connected again after being closed
+            self._is_closing.clear()
             self._disconnect_callback = disconnect_callback
 
             self._serial = serial.serial_for_url(self._port)
@@ -134,11 +348,17 @@ class YncaConnection:
                     self._call_registered_message_callbacks,
                     self._on_disconnect,
                     communication_log_size,
+                    coalesce_puts=coalesce_puts,
+                    relative_command_mode=relative_command_mode,
+                    pacing=pacing,
+                    metrics=self.metrics,
+                    keep_alive=keep_alive,
                 ),
             )
             self._readerthread.start()
             _, protocol = self._readerthread.connect()
             self._protocol = cast(YncaProtocol, protocol)
+            self.metrics.num_connects += 1
         except serial.SerialException as e:
             raise YncaConnectionError from e
         except RuntimeError as e:
@@ -156,15 +376,91 @@ class YncaConnection:
         if self._protocol:
             self._protocol.raw(raw_data)
 
-    def put(self, subunit: str, funcname: str, parameter: str) -> None:
-        """Send a PUT request to set a value of a function on a subunit of the receiver."""
+    def put(
+        self,
+        subunit: str,
+        funcname: str,
+        parameter: str,
+        priority: CommandPriority = CommandPriority.INTERACTIVE,
+    ) -> None:
+        """Send a PUT request to set a value of a function on a subunit of the receiver.
+
+        Commands with a higher priority are sent before queued commands with a lower priority.
+        """
         if self._protocol:
-            self._protocol.put(subunit, funcname, parameter)
+            self._protocol.put(subunit, funcname, parameter, priority)
 
-    def get(self, subunit: str, funcname: str) -> None:
-        """Send a GET request to get a value of a function on a subunit of the receiver. Note that only a request is sent, no response is awaited."""
+    def get(
+        self,
+        subunit: str,
+        funcname: str,
+        priority: CommandPriority = CommandPriority.REFRESH,
+    ) -> None:
+        """Send a GET request to get a value of a function on a subunit of the receiver. Note that only a request is sent, no response is awaited.
+
+        Use `get_value` to wait for the response.
+
+        Commands with a higher priority are sent before queued commands with a lower priority.
+        """
         if self._protocol:
-            self._protocol.get(subunit, funcname)
+            self._protocol.get(subunit, funcname, priority)
+
+    def sync(
+        self,
+        callback: Callable[[], None],
+        priority: CommandPriority = CommandPriority.REFRESH,
+    ) -> None:
+        """Send a `@SYS:VERSION=?` sync, the callback gets called on the reader thread when the response to this request is received."""
+        if self._protocol:
+            self._protocol.sync(callback, priority)
+
+    def get_value(
+        self,
+        subunit: str,
+        funcname: str,
+        timeout: float = 2.0,
+        priority: CommandPriority = CommandPriority.INTERACTIVE,
+    ) -> str:
+        """Send a GET request and wait for the value in the response.
+
+        The next received value for the function is returned, this can also be a change reported by the receiver.
+        Concurrent calls for the same function share a single GET request.
+
+        Raises YncaRequestFailed when the receiver responds with @UNDEFINED or @RESTRICTED
+        and YncaRequestTimeout when no response is received within timeout seconds.
+
+        Do not call this from a message callback, those are called on the reader thread
+        which is the thread that would receive the response. Doing so raises a RuntimeError.
+        """
+        if (
+            self._readerthread is not None
+            and threading.get_ident() == self._readerthread.ident
+        ):
+            msg = "get_value can not be called on the reader thread, e.g. from a message callback"
+            raise RuntimeError(msg)
+
+        key = (subunit, funcname)
+        with self._pending_gets_lock:
+            pending_get = self._pending_gets.get(key)
+            send = pending_get is None
+            if pending_get is None:
+                pending_get = self._pending_gets[key] = _PendingGet()
+
+        if send:
+            self.get(subunit, funcname, priority)
+
+        if not pending_get.event.wait(timeout):
+            with self._pending_gets_lock:
+                if self._pending_gets.get(key) is pending_get:
+                    del self._pending_gets[key]
+            msg = f"No response for @{subunit}:{funcname} within {timeout} seconds"
+            raise YncaRequestTimeout(msg)
+
+        if pending_get.status is not YncaProtocolStatus.OK:
+            msg = f"Receiver responded @{pending_get.status.name} for @{subunit}:{funcname}"
+            raise YncaRequestFailed(msg)
+
+        return cast(str, pending_get.value)
 
     @property
     def connected(self) -> bool:
@@ -176,6 +472,35 @@ class YncaConnection:
         """Get the amount of commands sent."""
         return self._protocol.num_commands_sent if self._protocol else 0
 
+    @property
+    def num_commands_elided(self) -> int:
+        """Get the amount of commands that were not sent because they were coalesced."""
+        return self._protocol.num_commands_elided if self._protocol else 0
+
+    def get_send_queue_depths(self) -> dict[CommandPriority, int]:
+        """Get the amount of commands waiting to be sent per priority."""
+        return self._protocol.get_send_queue_depths() if self._protocol else {}
+
+    def get_send_queue_max_depths(self) -> dict[CommandPriority, int]:
+        """Get the maximum amount of commands that were waiting to be sent per priority."""
+        return self._protocol.get_send_queue_max_depths() if self._protocol else {}
+
+    def set_pacing(self, pacing: CommandPacing | None) -> None:
+        """Change the pacing of commands, see `connect`."""
+        if self._protocol:
+            self._protocol.set_pacing(pacing)
+
+    def get_pacing_stats(self) -> PacingStats | None:
+        """Get statistics of the spacing between commands, like the effective command rate."""
+        return self._protocol.get_pacing_stats() if self._protocol else None
+
     def get_communication_log_items(self) -> list[str]:
         """Get a list of logged communication items."""
         return self._protocol.get_communication_log_items() if self._protocol else []
+
+    def save_communication_log(self, filename: str | Path) -> None:
+        """Save the logged communication items as JSON lines for offline analysis."""
+        if self._protocol:
+            self._protocol.save_communication_log(filename)
+        else:
+            CommunicationLog(0).save(filename)
@@ -4,12 +4,12 @@ from __future__ import annotations
 import argparse
 import logging
 from pathlib import Path
-import re
 import socketserver
 import threading
 import time
 from typing import NamedTuple
 
+from .codec import parse_line
 from .enums import Input
 from .subunits.system import REMOTE_CODE_LENGTH
 
@@ -36,13 +36,10 @@ ZONES = ["MAIN", "ZONE2", "ZONE3", "ZONE4"]
 
 
 def line_to_command(line: str) -> YncaCommand | None:
-    match = re.search(r"@(?P<subunit>.+?):(?P<function>.+?)=(?P<value>.*)", line)
-    if match is not None:
-        subunit = match.group("subunit")
-        function = match.group("function")
-        value = match.group("value")
-        return YncaCommand(subunit, function, value)
-    return None
+    # Lines from logfiles have a prefix like `"Received: `
+    start = line.find("@")
+    parsed = parse_line(line[start:]) if start >= 0 else None
+    return YncaCommand(*parsed) if parsed is not None else None
 
 
 class YncaDataStore:
@@ -0,0 +1,115 @@
+"""Run callbacks on worker threads instead of the thread receiving the data."""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from .metrics import Histogram
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class CallbackDispatcher:
+    """Runs callbacks on worker threads so slow callbacks do not stall receiving.
+
+    Callbacks are queued by key, e.g. the subunit id. Callbacks with the same key
+    run in order on the same worker. When the queue of a worker is full the callback
+    is dropped and a warning is logged, the values can still be read from the subunits.
+
+    The dispatcher can be shared by multiple APIs, call `close()` when done with it.
+    """
+
+    # Seconds, callbacks are expected to be fast
+    CALLBACK_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(
+        self,
+        workers: int = 1,
+        max_queue_size: int = 1000,
+        budget: float | None = 0.1,
+    ) -> None:
+        """Create a dispatcher and start its workers.
+
+        workers:
+            Amount of worker threads. Keys are spread over the workers.
+
+        max_queue_size:
+            Maximum amount of callbacks waiting per worker.
+
+        budget:
+            Seconds a callback is allowed to take before a warning gets logged, None to never warn.
+        """
+        self._budget = budget
+        self.callback_time = Histogram(self.CALLBACK_TIME_BUCKETS)
+        self.num_dropped = 0
+
+        self._queues: list[
+            queue.Queue[tuple[Callable[..., None], tuple[Any, ...]] | None]
+        ] = [queue.Queue(max_queue_size) for _ in range(workers)]
+        self._threads = [
+            threading.Thread(
+                target=self._run,
+                args=(worker_queue,),
+                name=f"YncaCallbackWorker-{index}",
+                daemon=True,
+            )
+            for index, worker_queue in enumerate(self._queues)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(
+        self, key: str | None, callback: Callable[..., None], *args: Any
+    ) -> None:
+        """Queue a call of the callback with the arguments, does not block."""
+        worker_queue = self._queues[hash(key) % len(self._queues)]
+        try:
+            worker_queue.put_nowait((callback, args))
+        except queue.Full:
+            self.num_dropped += 1
+            logger.warning("Callback queue full, dropped call of %r", callback)
+
+    def _run(
+        self,
+        worker_queue: queue.Queue[tuple[Callable[..., None], tuple[Any, ...]] | None],
+    ) -> None:
+        while (item := worker_queue.get()) is not None:
+            callback, args = item
+            start = time.perf_counter()
+            try:
+                callback(*args)
+            except Exception:
+                logger.exception("Callback %r failed", callback)
+            duration = time.perf_counter() - start
+            self.callback_time.record(duration)
+            if self._budget is not None and duration > self._budget:
+                logger.warning(
+                    "Callback %r took %.3f seconds, budget is %.3f seconds",
+                    callback,
+                    duration,
+                    self._budget,
+                )
+
+    @property
+    def queue_depth(self) -> int:
+        """Amount of callbacks waiting to be run."""
+        return sum(worker_queue.qsize() for worker_queue in self._queues)
+
+    def close(self, timeout: float | None = None) -> None:
+        """Run the queued callbacks and stop the workers.
+
+        timeout:
+            Seconds to wait for each worker to finish, None waits until done.
+        """
+        for worker_queue in self._queues:
+            worker_queue.put(None)
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
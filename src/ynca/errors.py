@@ -13,6 +13,14 @@ class YncaConnectionFailed(YncaException):
     """Connection made, but broke. Most likely connecting to a device that already has the YNCA port occupied."""
 
 
+class YncaRequestFailed(YncaException):
+    """Receiver responded with @UNDEFINED or @RESTRICTED to a request."""
+
+
+class YncaRequestTimeout(YncaException):
+    """No response was received for a request in time."""
+
+
 class YncaInitializationFailedException(YncaException):
     """Initialization of Zone failed.
 
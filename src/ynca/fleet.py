@@ -0,0 +1,189 @@
+"""Manage many receivers from a single I/O thread."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from .async_api import AsyncYncaApi
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Coroutine, Iterable
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class YncaReceiverStats:
+    serial_url: str
+    connected: bool
+    initialized: bool
+    error: str | None
+    num_commands_sent: int
+    send_queue_depth: int
+    num_responses: int
+    response_time_mean: float | None
+    response_time_max: float | None
+
+
+@dataclass
+class YncaFleetStats:
+    receivers: list[YncaReceiverStats] = field(default_factory=list)
+
+    @property
+    def num_connected(self) -> int:
+        return sum(receiver.connected for receiver in self.receivers)
+
+    @property
+    def num_initialized(self) -> int:
+        return sum(receiver.initialized for receiver in self.receivers)
+
+    @property
+    def response_time_mean(self) -> float | None:
+        """Mean response time of GET requests over all receivers."""
+        num_responses = sum(receiver.num_responses for receiver in self.receivers)
+        if num_responses == 0:
+            return None
+        return (
+            sum(
+                (receiver.response_time_mean or 0) * receiver.num_responses
+                for receiver in self.receivers
+            )
+            / num_responses
+        )
+
+    @property
+    def response_time_max(self) -> float | None:
+        """Maximum response time of GET requests over all receivers."""
+        return max(
+            (
+                receiver.response_time_max
+                for receiver in self.receivers
+                if receiver.response_time_max is not None
+            ),
+            default=None,
+        )
+
+
+class YncaFleet:
+    """Manage many receivers from a single I/O thread.
+
+    All receivers run as `AsyncYncaApi` on one selector based event loop in a dedicated thread,
+    so the amount of threads does not grow with the amount of receivers.
+    Each receiver keeps its own send queue and command spacing.
+
+    Setting subunit attributes is allowed from any thread.
+    Update callbacks are called from the I/O thread and should not block.
+    """
+
+    def __init__(
+        self, serial_urls: Iterable[str], communication_log_size: int = 0
+    ) -> None:
+        """Create a fleet for the receivers on the given serial_urls, see `AsyncYncaApi` for supported urls."""
+        self._receivers = {
+            serial_url: AsyncYncaApi(
+                serial_url, communication_log_size=communication_log_size
+            )
+            for serial_url in serial_urls
+        }
+        self._errors: dict[str, BaseException] = {}
+
+        self._loop = asyncio.SelectorEventLoop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="YncaFleet", daemon=True
+        )
+        self._thread.start()
+
+    def run(self, coroutine: Coroutine[Any, Any, T], timeout: float | None = None) -> T:
+        """Run a coroutine on the I/O thread and wait for the result, e.g. `fleet.run(api.get_raw_connection().get_value("MAIN", "VOL"))`."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout)
+
+    def initialize(self, timeout: float | None = None) -> dict[str, BaseException]:
+        """Initialize all receivers concurrently.
+
+        Returns the errors of receivers that failed to initialize, the other receivers can be used.
+        Calling it again only retries the receivers that are not initialized.
+        """
+        return self.run(self._initialize(), timeout)
+
+    async def _initialize(self) -> dict[str, BaseException]:
+        # Receivers can only be initialized once, a failed initialization closes the connection
+        receivers = {
+            serial_url: receiver
+            for serial_url, receiver in self._receivers.items()
+            if receiver._connection is None  # noqa: SLF001
+        }
+        results = await asyncio.gather(
+            *[receiver.initialize() for receiver in receivers.values()],
+            return_exceptions=True,
+        )
+        for serial_url, result in zip(receivers, results, strict=True):
+            if isinstance(result, BaseException):
+                logger.warning("Initialization of %s failed: %s", serial_url, result)
+                self._errors[serial_url] = result
+            else:
+                self._errors.pop(serial_url, None)
+        return dict(self._errors)
+
+    def __getitem__(self, serial_url: str) -> AsyncYncaApi:
+        return self._receivers[serial_url]
+
+    @property
+    def receivers(self) -> dict[str, AsyncYncaApi]:
+        return dict(self._receivers)
+
+    def stats(self) -> YncaFleetStats:
+        """Get health and response time statistics of all receivers."""
+        return YncaFleetStats(
+            [
+                self._receiver_stats(serial_url, receiver)
+                for serial_url, receiver in self._receivers.items()
+            ]
+        )
+
+    def _receiver_stats(
+        self, serial_url: str, receiver: AsyncYncaApi
+    ) -> YncaReceiverStats:
+        error = self._errors.get(serial_url)
+        stats = YncaReceiverStats(
+            serial_url=serial_url,
+            connected=False,
+            initialized=receiver.sys is not None,
+            error=repr(error) if error is not None else None,
+            num_commands_sent=0,
+            send_queue_depth=0,
+            num_responses=0,
+            response_time_mean=None,
+            response_time_max=None,
+        )
+
+        if connection := receiver._connection:  # noqa: SLF001
+            stats.connected = connection.connected
+            stats.num_commands_sent = connection.num_commands_sent
+            stats.send_queue_depth = sum(connection.get_send_queue_depths().values())
+            response_time = connection.metrics.response_time
+            stats.num_responses = response_time.count
+            if response_time.count:
+                stats.response_time_mean = response_time.mean
+                stats.response_time_max = response_time.max
+
+        return stats
+
+    def close(self) -> None:
+        """Close all receivers and stop the I/O thread. The fleet can not be used after closing."""
+        if not self._thread.is_alive():
+            return
+
+        async def _close() -> None:
+            for receiver in self._receivers.values():
+                receiver.close()
+
+        self.run(_close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
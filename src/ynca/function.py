@@ -94,6 +94,11 @@ class FunctionMixinBase(ABC, Generic[T]):
             msg = f"Function {self.name} does not support GET command or does not exist"
             raise AttributeError(msg)
 
+        if (request := instance._initialization_request) is not None:  # noqa: SLF001
+            # Initialization was deferred until the subunit gets used
+            instance._initialization_request = None  # noqa: SLF001
+            request(instance)
+
         return instance.function_handlers[self.name].value
 
     def __set__(self, instance: SubunitBase, value: T) -> None:
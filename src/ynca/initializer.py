@@ -0,0 +1,574 @@
+"""Initialization planning for subunits."""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+import logging
+import threading
+from typing import TYPE_CHECKING
+
+from .capabilities import collect_errors
+from .connection import CommandPriority, YncaProtocol, YncaProtocolStatus
+from .constants import Subunit
+from .enums import Input
+from .errors import YncaInitializationFailedException
+from .multiresponse import multi_response_commands
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable, Collection, Iterable, Iterator, Mapping
+
+    from .capabilities import YncaCapabilityCache
+    from .connection import YncaConnectionBase
+    from .subunit import SubunitBase
+
+logger = logging.getLogger(__name__)
+
+# Subunits that are always initialized, other subunits provide inputs
+EAGER_SUBUNITS = frozenset(
+    (Subunit.SYS, Subunit.MAIN, Subunit.ZONE2, Subunit.ZONE3, Subunit.ZONE4)
+)
+
+# Seconds to wait for the sync of a round, on top of the command spacing of the round
+SYNC_TIMEOUT = 2.0
+
+# Initialization, the state file and model pacing need these
+_REQUIRED_SYS_FUNCTIONS = frozenset(("MODELNAME", "VERSION"))
+
+# Subunits that provide an input
+_INPUT_SUBUNITS: dict[str, tuple[Subunit, ...]] = {
+    Input.AIRPLAY: (Subunit.AIRPLAY,),
+    Input.BLUETOOTH: (Subunit.BT,),
+    Input.DEEZER: (Subunit.DEEZER,),
+    Input.IPOD: (Subunit.IPOD,),
+    Input.IPOD_USB: (Subunit.IPODUSB,),
+    Input.MCLINK: (Subunit.MCLINK,),
+    Input.NAPSTER: (Subunit.NAPSTER,),
+    Input.NETRADIO: (Subunit.NETRADIO,),
+    Input.PANDORA: (Subunit.PANDORA,),
+    Input.PC: (Subunit.PC,),
+    Input.RHAPSODY: (Subunit.RHAP,),
+    Input.SERVER: (Subunit.SERVER,),
+    Input.SIRIUS: (Subunit.SIRIUS,),
+    Input.SIRIUS_IR: (Subunit.SIRIUSIR,),
+    Input.SIRIUS_XM: (Subunit.SIRIUSXM,),
+    Input.SPOTIFY: (Subunit.SPOTIFY,),
+    Input.TIDAL: (Subunit.TIDAL,),
+    Input.TUNER: (Subunit.TUN, Subunit.DAB),
+    Input.UAW: (Subunit.UAW,),
+    Input.USB: (Subunit.USB,),
+}
+
+
+class SubunitSelection:
+    """Subunits and functions to initialize, based on include and exclude lists.
+
+    Entries are subunit ids like `SPOTIFY`, function names like `ELAPSEDTIME`
+    that apply to all subunits or functions of one subunit like `MAIN:SOUNDPRG`.
+
+    When include has subunits only those subunits are used,
+    when include has functions for a subunit only those functions get initialized.
+    Exclude always wins. SYS is always used since initialization depends on it,
+    function names for all subunits do not apply to SYS and its MODELNAME and VERSION
+    are always initialized.
+    """
+
+    def __init__(
+        self,
+        include: Iterable[str] | None = None,
+        exclude: Iterable[str] | None = None,
+        known_functions: Mapping[str, Collection[str]] | None = None,
+    ) -> None:
+        """Create a selection, known_functions are the function names per subunit id.
+
+        When known_functions is given entries that do not match a known subunit or function
+        raise a ValueError, e.g. a typo like `Spotify` would otherwise exclude all functions.
+        """
+        include = list(include or ())
+        exclude = list(exclude or ())
+        if known_functions is not None:
+            self._check(include + exclude, known_functions)
+        self._include_subunits, self._include_functions = self._parse(include)
+        self._exclude_subunits, self._exclude_functions = self._parse(exclude)
+        # Functions of a specific subunit include that subunit
+        self._include_subunits |= self._include_functions.keys() - {""}
+
+    @staticmethod
+    def _parse(entries: Iterable[str]) -> tuple[set[str], dict[str, set[str]]]:
+        """Split entries in subunit ids and function names per subunit, "" holds functions for all subunits."""
+        subunits: set[str] = set()
+        functions: dict[str, set[str]] = {}
+        for entry in entries:
+            subunit_id, _, function_name = entry.rpartition(":")
+            if subunit_id:
+                functions.setdefault(subunit_id, set()).add(function_name)
+            elif entry in Subunit.__members__:
+                subunits.add(entry)
+            else:
+                functions.setdefault("", set()).add(entry)
+        return subunits, functions
+
+    @staticmethod
+    def _check(
+        entries: Iterable[str], known_functions: Mapping[str, Collection[str]]
+    ) -> None:
+        all_functions = set().union(*known_functions.values())
+        for entry in entries:
+            subunit_id, _, function_name = entry.rpartition(":")
+            if subunit_id:
+                known = function_name in known_functions.get(subunit_id, ())
+            else:
+                known = entry in known_functions or entry in all_functions
+            if not known:
+                msg = f"Unknown subunit or function '{entry}'"
+                raise ValueError(msg)
+
+    def includes_subunit(self, subunit_id: str) -> bool:
+        if subunit_id == Subunit.SYS:
+            return True
+        if subunit_id in self._exclude_subunits:
+            return False
+        return not self._include_subunits or subunit_id in self._include_subunits
+
+    def excluded_functions(self, subunit: SubunitBase) -> frozenset[str]:
+        """Names of the functions of the subunit that should not be initialized."""
+        scopes = (subunit.id,) if subunit.id == Subunit.SYS else ("", subunit.id)
+        excluded = set().union(
+            *(self._exclude_functions.get(scope, ()) for scope in scopes)
+        )
+        included = set().union(
+            *(self._include_functions.get(scope, ()) for scope in scopes)
+        )
+        if included:
+            excluded |= subunit.function_handlers.keys() - included
+        if subunit.id == Subunit.SYS:
+            excluded -= _REQUIRED_SYS_FUNCTIONS
+        return frozenset(excluded & subunit.function_handlers.keys())
+
+
+class _Execution:
+    """Rounds of GET commands, each followed by a sync, and the values received for them."""
+
+    def __init__(
+        self,
+        connection: YncaConnectionBase,
+        priority: CommandPriority,
+        expected: dict[tuple[str, str], str],
+    ) -> None:
+        self._connection = connection
+        self._priority = priority
+        self._expected = expected
+        self.received: set[tuple[str, str]] = set()
+        self.sent: list[tuple[str, str]] = []
+        self.success = False
+        # Commands of the current round and the last one that got a reply
+        self._round: list[tuple[str, str]] = []
+        self._positions: dict[tuple[str, str], int] = {}
+        self._replied = -1
+
+    def message_received(
+        self,
+        status: YncaProtocolStatus,
+        subunit: str | None,
+        function_name: str | None,
+        _value: str | None,
+    ) -> None:
+        if subunit is None or function_name is None:
+            return
+        # Receiver handles commands in order, so earlier commands are done as well
+        position = self._positions.get((subunit, function_name), -1)
+        self._replied = max(self._replied, position)
+        if status is not YncaProtocolStatus.OK:
+            return
+        self.received.add((subunit, function_name))
+
+    def rounds(
+        self, commands: list[tuple[str, str]]
+    ) -> Iterator[list[tuple[str, str]]]:
+        """Yield the planned commands, then commands for expected functions that were not received."""
+        yield commands
+
+        missing: list[tuple[str, str]] = []
+        for (subunit_id, function_name), command in self._expected.items():
+            if (subunit_id, function_name) not in self.received and (
+                subunit_id,
+                command,
+            ) not in missing:
+                missing.append((subunit_id, command))
+        if missing:
+            logger.debug("Not received in multi response, requesting %s", missing)
+            yield missing
+
+    def send(
+        self,
+        commands: list[tuple[str, str]],
+        synced: threading.Event | asyncio.Event,
+    ) -> float:
+        """Send the commands followed by a sync, returns the timeout to wait for `synced`."""
+        self._round = commands
+        self._positions = {command: index for index, command in enumerate(commands)}
+        self._replied = -1
+        num_commands_sent_start = self._connection.num_commands_sent
+
+        # Sync has to be in the same lane to be sent after all commands
+        for subunit_id, function_name in commands:
+            self._connection.get(subunit_id, function_name, self._priority)
+        self.sent.extend(commands)
+
+        # Other plans and requests can have a sync in flight as well,
+        # only the response to this sync means the round is done
+        self._connection.sync(synced.set, self._priority)
+
+        # Take command spacing into account and apply large margin
+        # Large margin is needed in practice on slower/busier systems
+        num_commands_sent = self._connection.num_commands_sent - num_commands_sent_start
+        return SYNC_TIMEOUT + (num_commands_sent * (YncaProtocol.COMMAND_SPACING * 5))
+
+    def unfinished(self) -> list[str]:
+        """Ids of the subunits with commands in the current round that did not get a reply."""
+        return list(
+            dict.fromkeys(
+                subunit_id for subunit_id, _ in self._round[self._replied + 1 :]
+            )
+        )
+
+
+class InitializationPlan:
+    """Plan to initialize one or more subunits in a single pass.
+
+    The GET commands for all subunits are queued back-to-back followed by
+    a single `@SYS:VERSION=?` end marker. Because the receiver handles commands
+    in order, the end marker response means all subunits have been initialized.
+    This keeps the send queue filled so no time is lost waiting in between subunits.
+
+    Some GET commands report the values of multiple functions, see `multiresponse`.
+    The plan uses the smallest set of GET commands that covers all functions.
+    Functions that were expected in a multi response but did not arrive
+    are requested on their own in a second pass.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        connection: YncaConnectionBase,
+        subunits: list[SubunitBase],
+        capability_cache: YncaCapabilityCache | None = None,
+        modelname: str = "",
+        *,
+        resync: bool = False,
+        protocol_version: str = "",
+    ) -> None:
+        """Create an initialization plan.
+
+        capability_cache:
+            Optional cache to skip functions known to be unsupported on the model.
+            The cache gets updated with the results of the initialization.
+
+        modelname:
+            Modelname to use for lookups in the capability cache.
+
+        resync:
+            Only GET the functions that already have a value, e.g. to catch up after a reconnect.
+            Functions that did not get a value during initialization are not supported by the device.
+
+        protocol_version:
+            Protocol version of the device, the part after the "/" of @SYS:VERSION.
+            Selects the multi response commands to use, when unknown only the ones supported by all versions are used.
+        """
+        self._connection = connection
+        self._subunits = subunits
+        self._capability_cache = capability_cache
+        self._modelname = modelname
+
+        self.commands: list[tuple[str, str]] = []
+        self.skipped_commands: list[tuple[str, str]] = []
+        # Functions covered by a multi response command mapped to the command to GET them on their own
+        self._expected: dict[tuple[str, str], str] = {}
+        # Sync of the round `execute` is waiting for, set by `cancel` to stop waiting
+        self._synced: threading.Event | None = None
+        self._cancelled = False
+        for subunit in subunits:
+            self._plan_subunit(
+                subunit, resync=resync, protocol_version=protocol_version
+            )
+
+    def _plan_subunit(
+        self, subunit: SubunitBase, *, resync: bool, protocol_version: str
+    ) -> None:
+        # Name of the command to GET each function on its own
+        own_commands = subunit._initializers(resync=resync)  # noqa: SLF001
+
+        # Candidate commands with the functions they cover, in order of preference
+        candidates: dict[str, set[str]] = {}
+        for function_name, command in own_commands.items():
+            candidates.setdefault(command, set()).add(function_name)
+        for command, function_names in multi_response_commands(
+            subunit.id, protocol_version
+        ).items():
+            if covered := function_names & own_commands.keys():
+                candidates.setdefault(command, set()).update(covered)
+
+        for command in list(candidates):
+            if (
+                self._capability_cache is not None
+                and self._capability_cache.is_unsupported(
+                    self._modelname, subunit.id, command
+                )
+            ):
+                del candidates[command]
+                if command in own_commands.values():
+                    self.skipped_commands.append((subunit.id, command))
+
+        # Greedy set cover, the amount of candidates is small and ties go to the first candidate
+        uncovered = set(own_commands)
+        chosen: set[str] = set()
+        while uncovered:
+            coverage = {
+                command: len(function_names & uncovered)
+                for command, function_names in candidates.items()
+            }
+            best = max(coverage, key=coverage.__getitem__, default=None)
+            if best is None or not coverage[best]:
+                break
+            chosen.add(best)
+            uncovered -= candidates[best]
+
+        self.commands.extend(
+            (subunit.id, command) for command in candidates if command in chosen
+        )
+        self._expected.update(
+            ((subunit.id, function_name), command)
+            for function_name, command in own_commands.items()
+            if command not in chosen and function_name not in uncovered
+        )
+
+    def execute(self, *, reconcile: bool = False) -> None:
+        """Send all commands of the plan and wait until all subunits are initialized. This call can take a long time.
+
+        reconcile:
+            Refresh already initialized subunits, update callbacks are only called for changed values.
+        """
+        with self._executing(reconcile=reconcile) as execution:
+            for commands in execution.rounds(self.commands):
+                self._synced = synced = threading.Event()
+                # Cancelled before this round started or while waiting for it
+                if (
+                    self._cancelled
+                    or not synced.wait(execution.send(commands, synced))
+                    or self._cancelled
+                ):
+                    return
+            execution.success = True
+
+    def cancel(self) -> None:
+        """Stop a running `execute`, it fails right away instead of waiting for the receiver."""
+        self._cancelled = True
+        if self._synced is not None:
+            self._synced.set()
+
+    async def async_execute(self, *, reconcile: bool = False) -> None:
+        """Send all commands of the plan and wait until all subunits are initialized without blocking the event loop.
+
+        The connection must deliver messages on the event loop, like `AsyncYncaConnection`.
+        """
+        with self._executing(reconcile=reconcile) as execution:
+            for commands in execution.rounds(self.commands):
+                synced = asyncio.Event()
+                try:
+                    await asyncio.wait_for(
+                        synced.wait(), execution.send(commands, synced)
+                    )
+                except TimeoutError:
+                    return
+            execution.success = True
+
+    @contextmanager
+    def _executing(self, *, reconcile: bool) -> Iterator[_Execution]:
+        """Prepare the subunits and collect the results, the caller sends the commands and stores success."""
+        subunit_ids = [subunit.id for subunit in self._subunits]
+        logger.info("Initialization begin for %s.", ", ".join(subunit_ids))
+
+        for subunit in self._subunits:
+            subunit._begin_initialization(reconcile=reconcile)  # noqa: SLF001
+
+        # Errors are only needed to update the capability cache
+        errors_context: AbstractContextManager[
+            dict[tuple[str, str], YncaProtocolStatus]
+        ] = (
+            collect_errors(self._connection)
+            if self._capability_cache is not None
+            else nullcontext({})
+        )
+
+        execution = _Execution(
+            self._connection,
+            CommandPriority.REFRESH if reconcile else CommandPriority.INITIALIZATION,
+            self._expected,
+        )
+        self._connection.register_message_callback(execution.message_received)
+        try:
+            with errors_context as errors:
+                yield execution
+        finally:
+            self._connection.unregister_message_callback(execution.message_received)
+
+        for subunit in self._subunits:
+            subunit._end_initialization(success=execution.success)  # noqa: SLF001
+
+        if not execution.success:
+            # All commands can have a reply while the sync is missing
+            unfinished = execution.unfinished() or subunit_ids
+            msg = f"Subunit {', '.join(unfinished)} initialization failed"
+            raise YncaInitializationFailedException(msg)
+
+        if self._capability_cache is not None:
+            self._capability_cache.update(self._modelname, execution.sent, errors)
+
+        logger.info("Initialization end for %s.", ", ".join(subunit_ids))
+
+
+class LazyInitialization:
+    """Initialize subunits when they get used instead of all at once.
+
+    A subunit gets initialized on first access of one of its values
+    or when a zone selects the input it provides.
+    Returned values are None until the subunit is initialized,
+    after that the update callbacks get called with all values.
+
+    Requested subunits are initialized in the background with `run()` or `async_run()`,
+    `start` gets called when that needs to be started.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        connection: YncaConnectionBase,
+        subunits: list[SubunitBase],
+        start: Callable[[LazyInitialization], None],
+        capability_cache: YncaCapabilityCache | None = None,
+        modelname: str = "",
+        *,
+        protocol_version: str = "",
+    ) -> None:
+        self._connection = connection
+        self._subunits = {subunit.id: subunit for subunit in subunits}
+        self._start = start
+        self._capability_cache = capability_cache
+        self._modelname = modelname
+        self._protocol_version = protocol_version
+
+        self._lock = threading.Lock()
+        self._requested: list[SubunitBase] = []
+        self._running = False
+        self._closed = False
+        self._plan: InitializationPlan | None = None
+
+        for subunit in subunits:
+            subunit._initialization_request = self.request  # noqa: SLF001
+        self._connection.register_message_callback(self._message_received)
+
+    @property
+    def pending(self) -> list[SubunitBase]:
+        """Subunits that are not requested yet."""
+        return [
+            subunit
+            for subunit in self._subunits.values()
+            if subunit._initialization_request is not None  # noqa: SLF001
+        ]
+
+    def request(self, subunit: SubunitBase) -> None:
+        """Request initialization of a subunit."""
+        subunit._initialization_request = None  # noqa: SLF001
+        with self._lock:
+            self._requested.append(subunit)
+            if self._running:
+                return
+            self._running = True
+        try:
+            self._start(self)
+        except BaseException:
+            # Next request starts again, it also initializes this subunit
+            with self._lock:
+                self._running = False
+            raise
+
+    def request_input(self, input_: str) -> None:
+        """Request initialization of the subunits that provide the input."""
+        for subunit_id in _INPUT_SUBUNITS.get(input_, ()):
+            subunit = self._subunits.get(subunit_id)
+            if (
+                subunit is not None
+                and subunit._initialization_request is not None  # noqa: SLF001
+            ):
+                self.request(subunit)
+
+    def _message_received(
+        self,
+        status: YncaProtocolStatus,
+        subunit: str | None,
+        function_name: str | None,
+        value: str | None,
+    ) -> None:
+        if (
+            status is YncaProtocolStatus.OK
+            and function_name == "INP"
+            and subunit in EAGER_SUBUNITS
+            and value is not None
+        ):
+            self.request_input(value)
+
+    def _next_plan(self) -> InitializationPlan | None:
+        with self._lock:
+            requested, self._requested = self._requested, []
+            if not requested or self._closed:
+                self._running = False
+                self._plan = None
+                return None
+            self._plan = InitializationPlan(
+                self._connection,
+                requested,
+                self._capability_cache,
+                self._modelname,
+                protocol_version=self._protocol_version,
+            )
+            return self._plan
+
+    def _initialized(self, plan: InitializationPlan) -> None:
+        if self._capability_cache is not None:
+            self._capability_cache.save()
+        for subunit in plan._subunits:  # noqa: SLF001
+            subunit._report_values()  # noqa: SLF001
+
+    def run(self) -> None:
+        """Initialize requested subunits until there are no more requests. This call can take a long time."""
+        while (plan := self._next_plan()) is not None:
+            try:
+                plan.execute()
+            except YncaInitializationFailedException:
+                if not self._closed:
+                    logger.warning("Lazy initialization failed")
+                continue
+            self._initialized(plan)
+
+    async def async_run(self) -> None:
+        """Initialize requested subunits until there are no more requests without blocking the event loop."""
+        while (plan := self._next_plan()) is not None:
+            try:
+                await plan.async_execute()
+            except YncaInitializationFailedException:
+                logger.warning("Lazy initialization failed")
+                continue
+            self._initialized(plan)
+
+    def close(self) -> None:
+        """Stop handling requests, subunits that were not requested stay uninitialized.
+
+        A running `run()` stops without waiting for the initialization in progress.
+        """
+        self._connection.unregister_message_callback(self._message_received)
+        with self._lock:
+            self._closed = True
+            self._requested.clear()
+            plan = self._plan
+        if plan is not None:
+            plan.cancel()
+        for subunit in self.pending:
+            subunit._initialization_request = None  # noqa: SLF001
@@ -0,0 +1,132 @@
+"""Metrics of the communication with a receiver."""
+
+from __future__ import annotations
+
+import bisect
+from collections import Counter
+import time
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable
+
+    from .protocol import CommandPriority, YncaProtocolStatus
+
+
+class Histogram:
+    """Histogram with fixed buckets, recording a value does not allocate.
+
+    bounds are the upper bounds of the buckets, values above the last bound go in an overflow bucket.
+    """
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self._bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float | None:
+        return self.sum / self.count if self.count else None
+
+    def snapshot(self) -> dict[str, Any]:
+        """Get the histogram as dict, bucket counts are cumulative like Prometheus `le` buckets."""
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(
+            [*map(str, self._bounds), "+Inf"], self._counts, strict=True
+        ):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "buckets": buckets,
+        }
+
+
+class YncaMetrics:
+    """Metrics of a connection, cheap enough to always be enabled.
+
+    Values are updated without locking by the threads handling the connection,
+    so a snapshot taken while communicating can be slightly inconsistent.
+    """
+
+    # Seconds, receivers typically respond within a few milliseconds
+    RESPONSE_TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+    # Seconds, commands wait at least the command spacing for each command queued before them
+    QUEUE_WAIT_BUCKETS = (0.01, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self) -> None:
+        self._start = time.monotonic()
+        self.num_connects = 0
+        self.num_commands_written = 0
+        self.num_lines_received = 0
+        self.num_received: Counter[YncaProtocolStatus] = Counter()
+        self.num_keepalive_misses = 0
+
+        self.response_time = Histogram(self.RESPONSE_TIME_BUCKETS)
+        self.response_time_per_command: dict[
+            tuple[str | None, str | None], Histogram
+        ] = {}
+        self.queue_wait = Histogram(self.QUEUE_WAIT_BUCKETS)
+
+        # Set by the connection, so depths are only determined when needed
+        self.queue_depths: Callable[[], dict[CommandPriority, int]] | None = None
+
+    @property
+    def num_reconnects(self) -> int:
+        return max(0, self.num_connects - 1)
+
+    @property
+    def received_line_rate(self) -> float:
+        """Average amount of lines received per second since the metrics were created."""
+        return self.num_lines_received / (time.monotonic() - self._start)
+
+    def record_response_time(
+        self, command: tuple[str | None, str | None], response_time: float
+    ) -> None:
+        """Record the time from sending a GET for the (subunit, function) command to its response."""
+        self.response_time.record(response_time)
+
+        # Histograms per command are only allocated the first time the command is used
+        if (histogram := self.response_time_per_command.get(command)) is None:
+            histogram = self.response_time_per_command[command] = Histogram(
+                self.RESPONSE_TIME_BUCKETS
+            )
+        histogram.record(response_time)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Get all metrics as a dict with plain values, e.g. to export to a monitoring system."""
+        queue_depths = self.queue_depths() if self.queue_depths else {}
+        return {
+            "connects": self.num_connects,
+            "reconnects": self.num_reconnects,
+            "commands_written": self.num_commands_written,
+            "lines_received": self.num_lines_received,
+            "received_line_rate": self.received_line_rate,
+            "received": {
+                status.name: count for status, count in self.num_received.items()
+            },
+            "keepalive_misses": self.num_keepalive_misses,
+            "queue_depth": {
+                priority.name: depth for priority, depth in queue_depths.items()
+            },
+            "queue_wait": self.queue_wait.snapshot(),
+            "response_time": self.response_time.snapshot(),
+            "response_time_per_command": {
+                f"{subunit}:{function}": histogram.snapshot()
+                for (
+                    subunit,
+                    function,
+                ), histogram in self.response_time_per_command.items()
+            },
+        }
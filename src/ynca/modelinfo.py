@@ -3,11 +3,14 @@
 from dataclasses import dataclass
 
 from .enums import SoundPrg
+from .protocol import CommandPacing
 
 
 @dataclass
 class ModelInfo:
     soundprg: list[SoundPrg]
+    # Pacing profile to use after initialization, None keeps the fixed command spacing
+    pacing: CommandPacing | None = None
 
 
 BasicSoundPrgList: list[SoundPrg] = [
@@ -0,0 +1,91 @@
+"""GET commands that report the values of multiple functions."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from .constants import Subunit
+
+ZONES = frozenset((Subunit.MAIN, Subunit.ZONE2, Subunit.ZONE3, Subunit.ZONE4))
+
+
+@dataclass(frozen=True)
+class MultiResponseCommand:
+    """A GET command that also reports the values of other functions.
+
+    Only functions that can also be requested on their own are listed.
+    Functions that can only be initialized with the command use `init=` on the function instead.
+    Received values are checked after initialization, functions that were not reported
+    get requested on their own, so listing a function that is not always reported only costs time.
+
+    name:
+        Function name to GET, e.g. BASIC
+
+    subunits:
+        Subunits that support the command.
+
+    functions:
+        Functions reported in the response.
+
+    protocol_versions:
+        Prefixes of the protocol versions (second part of @SYS:VERSION) that report the functions, empty for all versions.
+    """
+
+    name: str
+    subunits: frozenset[Subunit]
+    functions: frozenset[str]
+    protocol_versions: tuple[str, ...] = ()
+
+    def matches(self, subunit_id: str, protocol_version: str) -> bool:
+        return subunit_id in self.subunits and (
+            not self.protocol_versions
+            or protocol_version.startswith(self.protocol_versions)
+        )
+
+
+# Gathered from the logs in the repository
+MULTI_RESPONSE_COMMANDS: tuple[MultiResponseCommand, ...] = (
+    MultiResponseCommand("BASIC", ZONES, frozenset(("SLEEP",))),
+    MultiResponseCommand("BASIC", frozenset((Subunit.MAIN,)), frozenset(("ENHANCER",))),
+    MultiResponseCommand(
+        "BASIC",
+        frozenset((Subunit.MAIN,)),
+        frozenset(("ADAPTIVEDRC", "EXBASS", "PUREDIRMODE")),
+        ("3.", "4."),
+    ),
+    MultiResponseCommand(
+        "BASIC", frozenset((Subunit.MAIN,)), frozenset(("3DCINEMA",)), ("4.",)
+    ),
+    MultiResponseCommand(
+        "BASIC",
+        frozenset((Subunit.ZONE2, Subunit.ZONE3)),
+        frozenset(("ENHANCER", "EXBASS")),
+        ("3.",),
+    ),
+    MultiResponseCommand(
+        "METAINFO",
+        frozenset((Subunit.NETRADIO, Subunit.PANDORA)),
+        frozenset(("STATION",)),
+    ),
+)
+
+
+def protocol_version(version: str) -> str:
+    """Get the protocol version from a VERSION value like 1.80/2.01, empty when unknown."""
+    _, _, protocol = version.partition("/")
+    return protocol
+
+
+def multi_response_commands(
+    subunit_id: str,
+    protocol_version: str = "",
+    commands: tuple[MultiResponseCommand, ...] = MULTI_RESPONSE_COMMANDS,
+) -> dict[str, frozenset[str]]:
+    """Functions reported by each multi response command of the subunit for the protocol version."""
+    result: dict[str, frozenset[str]] = {}
+    for command in commands:
+        if command.matches(subunit_id, protocol_version):
+            result[command.name] = (
+                result.get(command.name, frozenset()) | command.functions
+            )
+    return result
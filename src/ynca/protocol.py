@@ -1,36 +1,73 @@
 from __future__ import annotations
 
-from enum import Enum
+import collections
+from dataclasses import dataclass
+from enum import Enum, IntEnum
+import itertools
+import json
 import logging
+from pathlib import Path
 import queue
-import re
 import threading
 import time
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 import serial  # type: ignore[import-untyped]
 import serial.threaded  # type: ignore[import-untyped]
 
-from .helpers import RingBuffer
+from .codec import parse_line
+from .metrics import YncaMetrics
 
 if TYPE_CHECKING:  # pragma: no cover
     from collections.abc import Callable
 
+    from .metrics import Histogram
+
 logger = logging.getLogger(__name__)
 
 
-class LogBuffer(RingBuffer[str]):
-    def __init__(self, size: int) -> None:
-        super().__init__(size)
-        self._lock = threading.Lock()
+class CommunicationLog:
+    """Ring of the last size communication items, stored as (timestamp, direction, line) tuples.
 
-    def add(self, item: str) -> None:
-        with self._lock:
-            super().add(item)
+    Items are only formatted when requested. Adding is lock free so it can be done from
+    multiple threads, a sequence number keeps the order of the items.
+    Check `enabled` before adding to avoid any work when logging is disabled.
+    """
 
-    def get_buffer(self) -> list[str]:
-        with self._lock:
-            return super().get_buffer()
+    SEND = "Send"
+    RECEIVED = "Received"
+
+    def __init__(self, size: int) -> None:
+        self.enabled = size > 0
+        self._size = size
+        self._items: list[tuple[int, float, str, str] | None] = [None] * size
+        self._sequence = itertools.count()
+        # To convert the perf_counter timestamps to wall clock time on export
+        self._wall_clock_offset = time.time() - time.perf_counter()
+
+    def add(self, timestamp: float, direction: str, line: str) -> None:
+        sequence = next(self._sequence)
+        self._items[sequence % self._size] = (sequence, timestamp, direction, line)
+
+    def _ordered_items(self) -> list[tuple[int, float, str, str]]:
+        return sorted(item for item in self._items if item is not None)
+
+    def get_items(self) -> list[str]:
+        return [
+            f"{timestamp:.6f} {direction}: {line}"
+            for _, timestamp, direction, line in self._ordered_items()
+        ]
+
+    def save(self, filename: str | Path) -> None:
+        """Save the items as JSON lines with wall clock time for offline analysis."""
+        with Path(filename).open("w", encoding="utf-8") as file:
+            for _, timestamp, direction, line in self._ordered_items():
+                item = {
+                    "time": timestamp + self._wall_clock_offset,
+                    "direction": direction.lower(),
+                    "line": line,
+                }
+                file.write(json.dumps(item) + "\n")
 
 
 class YncaProtocolStatus(Enum):
@@ -39,6 +76,476 @@ class YncaProtocolStatus(Enum):
     RESTRICTED = 2
 
 
+# Use MODELNAME as keep-alive, supported by all
+KEEP_ALIVE_COMMAND = "@SYS:MODELNAME=?"
+
+# Use VERSION as sync, supported by all
+SYNC_COMMAND = "@SYS:VERSION=?"
+
+
+def _parse_received_line(
+    line: str, last_sent: tuple[str | None, str | None]
+) -> tuple[YncaProtocolStatus, str | None, str | None, str | None]:
+    """Parse a received line into status, subunit, function and value.
+
+    The receiver handles commands in order and responds well within the command spacing
+    so errors are attributed to the last command sent.
+    """
+    if line == "@UNDEFINED":
+        return (YncaProtocolStatus.UNDEFINED, *last_sent, None)
+    if line == "@RESTRICTED":
+        return (YncaProtocolStatus.RESTRICTED, *last_sent, None)
+
+    parsed = parse_line(line)
+    if parsed is None:
+        return (YncaProtocolStatus.OK, None, None, None)
+    return (YncaProtocolStatus.OK, *parsed)
+
+
+def _parse_command(message: str) -> tuple[str | None, str | None]:
+    """Get subunit and function of a command that is sent."""
+    parsed = parse_line(message)
+    return (parsed[0], parsed[1]) if parsed else (None, None)
+
+
+def _is_keep_alive_response(
+    subunit: str | None, function: str | None, value: str | None
+) -> bool:
+    return subunit == "SYS" and function == "MODELNAME" and value is not None
+
+
+class RelativeCommandMode(Enum):
+    """How coalescing of PUTs handles relative values like Up and Down.
+
+    PRESERVE:
+        Relative commands are always sent and an absolute value
+        does not replace relative commands queued before it.
+
+    MERGE:
+        Queued opposite relative commands cancel each other out
+        and an absolute value replaces queued relative commands.
+    """
+
+    PRESERVE = "preserve"
+    MERGE = "merge"
+
+
+def _is_relative(value: str) -> bool:
+    return value.split(" ", 1)[0] in ("Up", "Down")
+
+
+def _is_opposite(value_1: str, value_2: str) -> bool:
+    """Check if relative values cancel each other out, e.g. Up and Down or "Up 2 dB" and "Down 2 dB"."""
+    direction_1, _, step_1 = value_1.partition(" ")
+    direction_2, _, step_2 = value_2.partition(" ")
+    return {direction_1, direction_2} == {"Up", "Down"} and step_1 == step_2
+
+
+class CommandPriority(IntEnum):
+    """Priority of commands in the send queue, lower values are sent first."""
+
+    INTERACTIVE = 0
+    REFRESH = 1
+    INITIALIZATION = 2
+    KEEPALIVE = 3
+
+
+class _SendQueue:
+    """Send queue with a FIFO lane per CommandPriority.
+
+    Higher priority lanes are served first. To avoid starvation a waiting lane
+    is served anyway when it was passed over STARVATION_LIMIT times in a row.
+
+    The time items wait in the queue is recorded in the optional wait_histogram.
+    """
+
+    STARVATION_LIMIT = 10
+
+    def __init__(self, wait_histogram: Histogram | None = None) -> None:
+        self._wait_histogram = wait_histogram
+        self._lanes: dict[CommandPriority, collections.deque] = {
+            priority: collections.deque() for priority in CommandPriority
+        }
+        self._passed_over = dict.fromkeys(CommandPriority, 0)
+        self.max_depths = dict.fromkeys(CommandPriority, 0)
+        self._condition = threading.Condition()
+
+    def put(self, item: Any, priority: CommandPriority) -> None:
+        with self._condition:
+            lane = self._lanes[priority]
+            lane.append((time.monotonic(), item))
+            self.max_depths[priority] = max(self.max_depths[priority], len(lane))
+            self._condition.notify()
+
+    def get(self, timeout: float) -> Any:
+        """Get the next item to send, raises queue.Empty when nothing was queued within timeout."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: any(self._lanes.values()), timeout):
+                raise queue.Empty
+            queued_at, item = self._lanes[self._next_priority()].popleft()
+            if self._wait_histogram is not None:
+                self._wait_histogram.record(time.monotonic() - queued_at)
+            return item
+
+    def _next_priority(self) -> CommandPriority:
+        waiting = [priority for priority in CommandPriority if self._lanes[priority]]
+
+        selected = waiting[0]
+        for priority in waiting[1:]:
+            if self._passed_over[priority] >= self.STARVATION_LIMIT:
+                selected = priority
+                break
+
+        for priority in waiting:
+            self._passed_over[priority] = (
+                0 if priority is selected else self._passed_over[priority] + 1
+            )
+        return selected
+
+    def empty(self) -> bool:
+        with self._condition:
+            return not any(self._lanes.values())
+
+    def clear(self) -> None:
+        with self._condition:
+            for lane in self._lanes.values():
+                lane.clear()
+            self._passed_over = dict.fromkeys(CommandPriority, 0)
+
+    def depths(self) -> dict[CommandPriority, int]:
+        with self._condition:
+            return {priority: len(lane) for priority, lane in self._lanes.items()}
+
+
+class _QueuedPut:
+    """PUT in the send queue of which the values can still be changed while queued."""
+
+    def __init__(self, subunit: str, function: str, value: str) -> None:
+        self.subunit = subunit
+        self.function = function
+        self.values = [value]
+
+    @property
+    def has_relative_values(self) -> bool:
+        return any(_is_relative(value) for value in self.values)
+
+
+class _Sync:
+    """Sync in the send queue, the callback gets called when the response to this sync is received."""
+
+    def __init__(self, callback: Callable[[], None]) -> None:
+        self.callback = callback
+
+
+class _SyncTracker:
+    """Matches the responses to `SYNC_COMMAND` to the requests in the order they were written.
+
+    The command can also be sent for other reasons, e.g. a plain GET of SYS:VERSION,
+    those requests have no callback. Requests that did not get a response within
+    TIMEOUT seconds are dropped, so a lost response does not shift all later ones.
+    """
+
+    TIMEOUT = 5.0
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._written: collections.deque[tuple[float, Callable[[], None] | None]] = (
+            collections.deque()
+        )
+
+    def written(self, now: float, callback: Callable[[], None] | None) -> None:
+        with self._lock:
+            self._written.append((now, callback))
+
+    def received(self, now: float) -> Callable[[], None] | None:
+        """Get the callback of the request the response belongs to, None when it was not a sync."""
+        with self._lock:
+            while self._written and now - self._written[0][0] > self.TIMEOUT:
+                self._written.popleft()
+            return self._written.popleft()[1] if self._written else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._written.clear()
+
+
+@dataclass(frozen=True)
+class CommandPacing:
+    """Settings for adaptive spacing between commands.
+
+    The spacing starts at max_spacing and narrows towards min_spacing while GETs
+    get their response before the next command is sent. It backs off when a response
+    is missing or on a burst of @RESTRICTED responses.
+
+    min_spacing:
+        Lower limit of the spacing in seconds.
+
+    max_spacing:
+        Upper limit of the spacing in seconds, None uses `YncaProtocol.COMMAND_SPACING`.
+
+    narrow_factor:
+        Factor applied to the spacing for each response received in time.
+
+    backoff_factor:
+        Factor applied to the spacing when backing off.
+
+    response_time_margin:
+        Spacing does not narrow below the measured response time multiplied by this margin.
+
+    restricted_burst:
+        Amount of @RESTRICTED responses in a row that causes a back off.
+    """
+
+    min_spacing: float = 0.02
+    max_spacing: float | None = None
+    narrow_factor: float = 0.9
+    backoff_factor: float = 2.0
+    response_time_margin: float = 1.5
+    restricted_burst: int = 3
+
+
+@dataclass
+class PacingStats:
+    adaptive: bool
+    spacing: float
+    """Current spacing between commands in seconds."""
+    response_time: float | None
+    """Smoothed response time of GETs in seconds, None when no responses were received."""
+    num_backoffs: int
+    num_missing_responses: int
+    command_rate: float | None
+    """Commands sent per second while sending, None when nothing was sent."""
+
+
+class _Pacer:
+    """Determines the spacing between commands, adapts to the receiver when a `CommandPacing` is set.
+
+    Only the last sent GET is tracked, the receiver handles commands in order.
+    Multiresponse GETs like METAINFO respond with other functions,
+    so any response of the same subunit counts as the response.
+    """
+
+    # Weight of a new response time in the smoothed response time
+    RESPONSE_TIME_WEIGHT = 0.125
+
+    def __init__(
+        self, pacing: CommandPacing | None = None, metrics: YncaMetrics | None = None
+    ) -> None:
+        self._lock = threading.Lock()
+        self._metrics = metrics
+        self._pending: tuple[tuple[str | None, str | None], float] | None = None
+        self._num_restricted = 0
+        self._response_time: float | None = None
+        self._num_commands = 0
+        self._busy_time = 0.0
+        self.num_backoffs = 0
+        self.num_missing_responses = 0
+        self.set_pacing(pacing)
+
+    def set_pacing(self, pacing: CommandPacing | None) -> None:
+        with self._lock:
+            self._pacing = pacing
+            self._spacing = self._max_spacing()
+
+    def _max_spacing(self) -> float:
+        if self._pacing is None or self._pacing.max_spacing is None:
+            return YncaProtocol.COMMAND_SPACING
+        return self._pacing.max_spacing
+
+    @property
+    def spacing(self) -> float:
+        # Without pacing follow COMMAND_SPACING, also when it changes
+        return self._spacing if self._pacing else YncaProtocol.COMMAND_SPACING
+
+    def command_sent(
+        self, command: tuple[str | None, str | None], now: float, *, is_get: bool
+    ) -> None:
+        """Call before writing the (subunit, function) command, the response can arrive before the write returns."""
+        with self._lock:
+            self._pending = (command, now) if is_get and command[0] else None
+
+    def response_received(
+        self, status: YncaProtocolStatus, subunit: str | None, now: float
+    ) -> None:
+        with self._lock:
+            if status is YncaProtocolStatus.RESTRICTED:
+                self._num_restricted += 1
+                if (
+                    self._pacing
+                    and self._num_restricted >= self._pacing.restricted_burst
+                ):
+                    self._num_restricted = 0
+                    self._backoff()
+            else:
+                self._num_restricted = 0
+
+            if self._pending is None or self._pending[0][0] != subunit:
+                return
+
+            command, sent_at = self._pending
+            self._pending = None
+            response_time = now - sent_at
+            if self._metrics is not None:
+                self._metrics.record_response_time(command, response_time)
+            self._response_time = (
+                response_time
+                if self._response_time is None
+                else self._response_time
+                + (response_time - self._response_time) * self.RESPONSE_TIME_WEIGHT
+            )
+
+            if self._pacing and status is not YncaProtocolStatus.RESTRICTED:
+                self._spacing = min(
+                    self._max_spacing(),
+                    max(
+                        self._pacing.min_spacing,
+                        self._response_time * self._pacing.response_time_margin,
+                        self._spacing * self._pacing.narrow_factor,
+                    ),
+                )
+
+    def command_done(self, duration: float) -> None:
+        """Call when the spacing after a command has passed, a GET without response by then is considered missing."""
+        with self._lock:
+            self._num_commands += 1
+            self._busy_time += duration
+            if self._pending is not None:
+                self._pending = None
+                self.num_missing_responses += 1
+                if self._pacing:
+                    self._backoff()
+
+    def _backoff(self) -> None:
+        assert self._pacing is not None  # noqa: S101
+        self._spacing = min(
+            self._max_spacing(), self._spacing * self._pacing.backoff_factor
+        )
+        self.num_backoffs += 1
+
+    def stats(self) -> PacingStats:
+        with self._lock:
+            return PacingStats(
+                adaptive=self._pacing is not None,
+                spacing=self.spacing,
+                response_time=self._response_time,
+                num_backoffs=self.num_backoffs,
+                num_missing_responses=self.num_missing_responses,
+                command_rate=(
+                    self._num_commands / self._busy_time if self._busy_time else None
+                ),
+            )
+
+
+@dataclass(frozen=True)
+class KeepAlive:
+    """Settings for keep-alives and waking up the receiver.
+
+    A keep-alive is only sent when nothing was sent or received for a while,
+    so a receiver that reports values on its own does not get keep-alives.
+
+    A receiver that might be asleep gets wake-up probes before the next command,
+    because the first command after waking up gets lost. The receiver might be asleep
+    right after connecting, when the last keep-alive was not answered
+    or when nothing was received for a while.
+
+    interval:
+        Seconds without activity before a keep-alive is sent, None uses `YncaProtocol.KEEP_ALIVE_INTERVAL`.
+
+    wake_up_after:
+        Seconds without receiving anything after which the receiver might be asleep.
+        The YNCA spec mentions a standby timeout of 40 seconds.
+
+    wake_up_probes:
+        Maximum amount of probes sent to wake up the receiver, 0 disables wake-up probing.
+
+    probe_timeout:
+        Seconds to wait for a response on a probe before sending the next one.
+    """
+
+    interval: float | None = None
+    wake_up_after: float = 40.0
+    wake_up_probes: int = 2
+    probe_timeout: float = 0.5
+
+
+class _KeepAliveMonitor:
+    """Keeps track of the activity on a connection to determine when keep-alives and wake-up probes are needed.
+
+    Times are in seconds from any monotonic clock, as long as it is the same for all calls.
+    """
+
+    def __init__(self, keep_alive: KeepAlive, metrics: YncaMetrics) -> None:
+        self.keep_alive = keep_alive
+        self._metrics = metrics
+        self.pending = False
+        # MODELNAME was also requested by the user, responses are not only for the keep-alive
+        self._requested = False
+        self._last_activity = 0.0
+        self._last_received: float | None = None
+        self._num_probes = 0
+
+    @property
+    def interval(self) -> float:
+        if self.keep_alive.interval is not None:
+            return self.keep_alive.interval
+        return YncaProtocol.KEEP_ALIVE_INTERVAL
+
+    def connected(self, now: float) -> None:
+        self.pending = False
+        self._requested = False
+        self._last_activity = now
+        self._last_received = None
+        self._num_probes = 0
+
+    def command_sent(self, now: float) -> None:
+        self._last_activity = now
+
+    def requested(self) -> None:
+        """Indicate that the user sent the keep-alive command itself."""
+        self._requested = True
+
+    def is_keep_alive_response(
+        self, subunit: str | None, function: str | None, value: str | None
+    ) -> bool:
+        """Check if a received line only answers a keep-alive and should not be reported."""
+        return (
+            self.pending
+            and not self._requested
+            and _is_keep_alive_response(subunit, function, value)
+        )
+
+    def keep_alive_sent(self, now: float) -> None:
+        # Nothing was received since the previous keep-alive
+        if self.pending:
+            self._metrics.num_keepalive_misses += 1
+        self.pending = True
+        self._last_activity = now
+
+    def probe_sent(self, now: float) -> None:
+        self._num_probes += 1
+        self.keep_alive_sent(now)
+
+    def line_received(self, now: float) -> None:
+        self.pending = False
+        self._requested = False
+        self._last_activity = now
+        self._last_received = now
+        self._num_probes = 0
+
+    def time_until_keep_alive(self, now: float) -> float:
+        return max(0.0, self._last_activity + self.interval - now)
+
+    def needs_probe(self, now: float) -> bool:
+        """Check if a probe has to be sent before the next command, gives up after `wake_up_probes` probes."""
+        if self._num_probes >= self.keep_alive.wake_up_probes:
+            return False
+        return (
+            self._last_received is None
+            or self.pending
+            or now - self._last_received > self.keep_alive.wake_up_after
+        )
+
+
 class YncaProtocol(serial.threaded.LineReader):
     # YNCA spec specifies that there should be at least 100 milliseconds between commands
     COMMAND_SPACING = 0.1
@@ -46,7 +553,7 @@ class YncaProtocol(serial.threaded.LineReader):
     # YNCA spec says standby timeout is 40 seconds, so use a shorter period to be on the safe side
     KEEP_ALIVE_INTERVAL = 30
 
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         message_callback: (
             Callable[[YncaProtocolStatus, str | None, str | None, str | None], None]
@@ -54,17 +561,46 @@ class YncaProtocol(serial.threaded.LineReader):
         ) = None,
         disconnect_callback: Callable[[], None] | None = None,
         communication_log_size: int = 0,
+        *,
+        coalesce_puts: bool = False,
+        relative_command_mode: RelativeCommandMode = RelativeCommandMode.PRESERVE,
+        pacing: CommandPacing | None = None,
+        metrics: YncaMetrics | None = None,
+        keep_alive: KeepAlive | None = None,
     ) -> None:
         super().__init__()
         self._message_callback = message_callback
+        self.metrics = metrics if metrics is not None else YncaMetrics()
         self._disconnect_callback = disconnect_callback
-        self._send_queue: queue.Queue
+        self._send_queue: _SendQueue
         self._send_thread: threading.Thread
         self._connected = False
-        self._keep_alive_pending: threading.Event = threading.Event()
-        self._communication_log_buffer: LogBuffer = LogBuffer(communication_log_size)
+        self._keep_alive = _KeepAliveMonitor(keep_alive or KeepAlive(), self.metrics)
+        self._line_received = threading.Event()
+        self._communication_log = CommunicationLog(communication_log_size)
         self.num_commands_sent = 0
 
+        # PUTs that are still waiting in the send queue per (subunit, function)
+        # New PUTs for the same function replace the queued values when coalescing
+        self._coalesce_puts = coalesce_puts
+        self._relative_command_mode = relative_command_mode
+        self._queued_puts: dict[tuple[str, str], _QueuedPut] = {}
+        self._queued_puts_lock = threading.Lock()
+        self.num_commands_elided = 0
+
+        # Subunit and function of the last command sent to the receiver.
+        # Used to attribute @UNDEFINED and @RESTRICTED responses.
+        self._last_sent: tuple[str | None, str | None] = (None, None)
+        self._last_sent_is_get = False
+        self._syncs = _SyncTracker()
+
+        self._pacer = _Pacer(pacing, self.metrics)
+
+    @property
+    def last_sent_is_get(self) -> bool:
+        """Indicates if the last command sent was a GET, errors are attributed to that command."""
+        return self._last_sent_is_get
+
     @property
     def connected(self) -> bool:
         return self._connected
@@ -74,17 +610,16 @@ class YncaProtocol(serial.threaded.LineReader):
 
         logger.debug("Connected")
 
-        self._send_queue = queue.Queue()
+        self._keep_alive.connected(time.monotonic())
+        self._send_queue = _SendQueue(self.metrics.queue_wait)
+        self.metrics.queue_depths = self._send_queue.depths
         self._send_thread = threading.Thread(target=self._send_handler)
         self._send_thread.start()
 
         self._connected = True
-        self._keep_alive_pending.clear()
 
-        # When the device is in low power mode the first command is to wake up and gets lost
-        # So send a dummy keep-alive on connect and a real one to make sure keep-alive administration is up-to-date
-        self._send_keepalive()
-        self._send_keepalive()
+        # Check the connection right away, the receiver gets woken up first if needed
+        self._send_keepalive(CommandPriority.INTERACTIVE)
 
     def connection_lost(self, exc: Exception) -> None:
         self._connected = False
@@ -92,14 +627,11 @@ class YncaProtocol(serial.threaded.LineReader):
         logger.debug("Connection closed/lost %s", exc)
 
         if self._send_queue:
-            # There seems to be no way to clear a queue so just read all and add the _EXIT command
-            try:
-                while self._send_queue.get(False):
-                    pass
-            except queue.Empty:
-                pass
-            finally:
-                self._send_queue.put("_EXIT")
+            self._send_queue.clear()
+            self._send_queue.put("_EXIT", CommandPriority.INTERACTIVE)
+            with self._queued_puts_lock:
+                self._queued_puts.clear()
+        self._syncs.clear()
         if self._send_thread:
             self._send_thread.join(2)
 
@@ -107,86 +639,206 @@ class YncaProtocol(serial.threaded.LineReader):
             self._disconnect_callback()
 
     def handle_line(self, line: str) -> None:
-        ignore = False
-        status = YncaProtocolStatus.OK
-        subunit: str | None = None
-        function: str | None = None
-        value: str | None = None
-
         logger.debug("Recv - %s", line)
-        self._communication_log_buffer.add(
-            f"{time.perf_counter():.6f} Received: {line}"
-        )
-
-        if line == "@UNDEFINED":
-            status = YncaProtocolStatus.UNDEFINED
-        elif line == "@RESTRICTED":
-            status = YncaProtocolStatus.RESTRICTED
+        if self._communication_log.enabled:
+            self._communication_log.add(
+                time.perf_counter(), CommunicationLog.RECEIVED, line
+            )
 
-        match = re.match(r"@(?P<subunit>.+?):(?P<function>.+?)=(?P<value>.*)", line)
-        if match is not None:
-            subunit = match.group("subunit")
-            function = match.group("function")
-            value = match.group("value")
+        status, subunit, function, value = _parse_received_line(line, self._last_sent)
+        self.metrics.num_lines_received += 1
+        self.metrics.num_received[status] += 1
+        self._pacer.response_received(status, subunit, time.perf_counter())
 
-            if (
-                self._keep_alive_pending.is_set()
-                and subunit == "SYS"
-                and function == "MODELNAME"
-            ):
-                ignore = True
-
-        self._keep_alive_pending.clear()
+        ignore = self._keep_alive.is_keep_alive_response(subunit, function, value)
+        self._keep_alive.line_received(time.monotonic())
+        self._line_received.set()
 
         if not ignore and self._message_callback is not None:
             self._message_callback(status, subunit, function, value)
 
-    def _send_keepalive(self) -> None:
+        if (
+            status is YncaProtocolStatus.OK
+            and subunit == "SYS"
+            and function == "VERSION"
+            and (callback := self._syncs.received(time.monotonic())) is not None
+        ):
+            callback()
+
+    def _send_keepalive(
+        self, priority: CommandPriority = CommandPriority.KEEPALIVE
+    ) -> None:
         if self._send_queue:
-            self._send_queue.put("_KEEP_ALIVE")
+            self._send_queue.put("_KEEP_ALIVE", priority)
 
     def _send_handler(self) -> None:
         stop = False
         while not stop and self._send_queue:
             try:
-                message = self._send_queue.get(True, self.KEEP_ALIVE_INTERVAL)
+                message = self._send_queue.get(
+                    self._keep_alive.time_until_keep_alive(time.monotonic())
+                )
 
                 if message == "_EXIT":
                     stop = True
-                elif message == "_KEEP_ALIVE":
-                    message = "@SYS:MODELNAME=?"  # Use MODELNAME as keep-alive, supported by all
-                    self._keep_alive_pending.set()
-
-                if not stop:
-                    logger.debug("Send - %s", message)
-                    self._communication_log_buffer.add(
-                        f"{time.perf_counter():.6f} Send: {message}"
-                    )
+                    continue
 
-                    self.write_line(message)
+                if message == "_KEEP_ALIVE":
+                    self._write_keep_alive()
+                    continue
 
-                    # Maintain required command spacing
-                    time.sleep(self.COMMAND_SPACING)
+                self._wake_up()
+                self._write_queued(message)
             except queue.Empty:
                 # To avoid random message being eaten because device goes to sleep, keep it alive
-                self._send_keepalive()
+                # Received messages count as activity, so check if it is still needed
+                if self._keep_alive.time_until_keep_alive(time.monotonic()) == 0:
+                    self._send_keepalive()
             except serial.SerialException:  # pragma: no cover
                 logger.exception("Serial error while writing, stopping thread")
                 stop = True
 
+    def _write_queued(self, message: str | _QueuedPut | _Sync) -> None:
+        if isinstance(message, _QueuedPut):
+            # Values can not change anymore once the PUT leaves the queue
+            with self._queued_puts_lock:
+                key = (message.subunit, message.function)
+                if self._queued_puts.get(key) is message:
+                    del self._queued_puts[key]
+            for value in message.values:
+                self._write_message(f"@{message.subunit}:{message.function}={value}")
+        elif isinstance(message, _Sync):
+            self._write_message(SYNC_COMMAND, message.callback)
+        else:
+            if message == KEEP_ALIVE_COMMAND:
+                self._keep_alive.requested()
+            self._write_message(message)
+
+    def _write_keep_alive(self) -> None:
+        # A probe is a keep-alive as well
+        if not self._wake_up():
+            self._keep_alive.keep_alive_sent(time.monotonic())
+            self._write_message(KEEP_ALIVE_COMMAND)
+
+    def _wake_up(self) -> bool:
+        """Send probes while the receiver might be asleep, returns True when a probe was sent."""
+        probed = False
+        while self._connected and self._keep_alive.needs_probe(time.monotonic()):
+            probed = True
+            self._line_received.clear()
+            self._keep_alive.probe_sent(time.monotonic())
+            self._write_message(KEEP_ALIVE_COMMAND)
+            self._line_received.wait(self._keep_alive.keep_alive.probe_timeout)
+        return probed
+
+    def _write_message(
+        self, message: str, sync_callback: Callable[[], None] | None = None
+    ) -> None:
+        logger.debug("Send - %s", message)
+        if self._communication_log.enabled:
+            self._communication_log.add(
+                time.perf_counter(), CommunicationLog.SEND, message
+            )
+
+        # Before writing, the response can arrive before write_line returns
+        if message == SYNC_COMMAND:
+            self._syncs.written(time.monotonic(), sync_callback)
+        self._last_sent = _parse_command(message)
+        self._last_sent_is_get = message.endswith("=?")
+        start = time.perf_counter()
+        self._pacer.command_sent(self._last_sent, start, is_get=self._last_sent_is_get)
+        self.metrics.num_commands_written += 1
+        self._keep_alive.command_sent(time.monotonic())
+        self.write_line(message)
+
+        # Maintain required command spacing
+        time.sleep(self._pacer.spacing)
+        self._pacer.command_done(time.perf_counter() - start)
+
+    def _coalesce_put(self, subunit: str, funcname: str, parameter: str) -> bool:
+        """Try to merge the PUT into a queued PUT for the same function. Returns False when it has to be queued."""
+        queued_put = self._queued_puts.get((subunit, funcname))
+        if queued_put is None:
+            return False
+
+        merge = self._relative_command_mode is RelativeCommandMode.MERGE
+        if not _is_relative(parameter):
+            if merge or not queued_put.has_relative_values:
+                # Last write wins
+                self.num_commands_elided += len(queued_put.values)
+                queued_put.values = [parameter]
+                return True
+        elif merge and all(_is_relative(value) for value in queued_put.values):
+            if queued_put.values and _is_opposite(queued_put.values[-1], parameter):
+                queued_put.values.pop()
+                self.num_commands_elided += 2
+            else:
+                queued_put.values.append(parameter)
+            return True
+
+        return False
+
     def raw(self, raw_data: str) -> None:
         if self._send_queue:
-            self._send_queue.put(raw_data)
+            self._send_queue.put(raw_data, CommandPriority.INTERACTIVE)
             self.num_commands_sent += 1
 
-    def put(self, subunit: str, funcname: str, parameter: str) -> None:
+    def put(
+        self,
+        subunit: str,
+        funcname: str,
+        parameter: str,
+        priority: CommandPriority = CommandPriority.INTERACTIVE,
+    ) -> None:
         if self._send_queue:
-            self._send_queue.put(f"@{subunit}:{funcname}={parameter}")
             self.num_commands_sent += 1
+            if not self._coalesce_puts or parameter == "?":
+                self._send_queue.put(f"@{subunit}:{funcname}={parameter}", priority)
+                return
 
-    def get(self, subunit: str, funcname: str) -> None:
-        self.put(subunit, funcname, "?")
+            with self._queued_puts_lock:
+                if not self._coalesce_put(subunit, funcname, parameter):
+                    queued_put = _QueuedPut(subunit, funcname, parameter)
+                    self._queued_puts[(subunit, funcname)] = queued_put
+                    self._send_queue.put(queued_put, priority)
+
+    def get(
+        self,
+        subunit: str,
+        funcname: str,
+        priority: CommandPriority = CommandPriority.REFRESH,
+    ) -> None:
+        self.put(subunit, funcname, "?", priority)
+
+    def sync(
+        self,
+        callback: Callable[[], None],
+        priority: CommandPriority = CommandPriority.REFRESH,
+    ) -> None:
+        if self._send_queue:
+            self.num_commands_sent += 1
+            self._send_queue.put(_Sync(callback), priority)
+
+    def get_send_queue_depths(self) -> dict[CommandPriority, int]:
+        """Get the amount of commands waiting in the send queue per priority."""
+        return self._send_queue.depths()
+
+    def get_send_queue_max_depths(self) -> dict[CommandPriority, int]:
+        """Get the maximum amount of commands that were waiting in the send queue per priority."""
+        return dict(self._send_queue.max_depths)
+
+    def set_pacing(self, pacing: CommandPacing | None) -> None:
+        """Set adaptive pacing, None uses the fixed COMMAND_SPACING."""
+        self._pacer.set_pacing(pacing)
+
+    def get_pacing_stats(self) -> PacingStats:
+        """Get statistics of the spacing between commands."""
+        return self._pacer.stats()
 
     def get_communication_log_items(self) -> list[str]:
         """Get a list of logged communication items."""
-        return self._communication_log_buffer.get_buffer()
+        return self._communication_log.get_items()
+
+    def save_communication_log(self, filename: str | Path) -> None:
+        """Save the logged communication items as JSON lines for offline analysis."""
+        self._communication_log.save(filename)
@@ -0,0 +1,307 @@
+"""YNCA proxy to share a single receiver connection with multiple clients.
+
+A receiver only allows 1 YNCA connection at the time.
+The proxy holds that connection and serves many clients, e.g. an automation system,
+diagnostic tools and the YNCA terminal at the same time.
+
+* GETs are answered from a cache of values received from the receiver when possible.
+  Concurrent GETs for the same function are sent to the receiver only once.
+  Replies are in the order of the GETs, like the receiver does. So GETs of a client
+  that still waits for replies of the receiver are sent to the receiver as well.
+* Clients waiting for replies get all lines from the receiver, so replies to GETs
+  reporting multiple functions (e.g. BASIC and METAINFO) reach the client that asked.
+* PUTs are forwarded to the receiver, PUTs for a function still waiting to be sent are coalesced.
+* Values reported by the receiver are broadcast to all clients.
+
+So the amount of commands sent to the receiver does not grow with the amount of clients.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import socket
+import socketserver
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from .codec import parse_line_bytes
+from .connection import YncaConnection, YncaProtocolStatus
+
+if TYPE_CHECKING:  # pragma: no cover
+    from io import BufferedIOBase
+
+logger = logging.getLogger(__name__)
+
+# GETs that did not get a response within this time are sent again,
+# e.g. multiresponse functions like METAINFO never respond with the function itself
+PENDING_GET_TIMEOUT = 2.0
+
+
+class _PendingGet:
+    """GET sent to the receiver, with the clients waiting for its reply."""
+
+    def __init__(self, key: tuple[str, str], client: _ProxyClient) -> None:
+        self.key = key
+        self.waiters = {client}
+        self.sent_at = time.monotonic()
+        # Other clients can only join before the reply started
+        self.replying = False
+
+
+class _ProxyClient:
+    """Client connected to the proxy, writes can come from multiple threads."""
+
+    def __init__(self, request: socket.socket, wfile: BufferedIOBase) -> None:
+        self._request = request
+        self._wfile = wfile
+        self._lock = threading.Lock()
+
+    def send(self, line: str) -> None:
+        with self._lock:
+            try:
+                self._wfile.write(f"{line}\r\n".encode())
+            except OSError:
+                # Client is gone, its handler cleans up
+                logger.debug("Send to disconnected client failed")
+
+    def disconnect(self) -> None:
+        try:
+            self._request.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            logger.debug("Client already disconnected")
+
+
+class YncaProxyHandler(socketserver.StreamRequestHandler):
+    """Handles a single client of the proxy."""
+
+    server: YncaProxyServer
+
+    def handle(self) -> None:
+        client = _ProxyClient(self.request, self.wfile)
+        logger.info("Client connected from: %s", self.client_address[0])
+
+        try:
+            self.server.add_client(client)
+        except Exception:
+            logger.exception("Upstream connection failed")
+            return
+
+        try:
+            while bytes_line := self.rfile.readline():
+                parsed = parse_line_bytes(bytes_line.strip())
+                if parsed is None:
+                    continue
+                subunit, function, value = parsed
+                if value == "?":
+                    self.server.handle_get(client, subunit, function)
+                else:
+                    self.server.handle_put(subunit, function, value)
+        except OSError:
+            logger.debug("Client connection error")
+        finally:
+            self.server.remove_client(client)
+            logger.info("Client disconnected")
+
+
+class YncaProxyServer(socketserver.ThreadingTCPServer):
+    """Socket server sharing a single connection to a receiver with all its clients.
+
+    The connection to the receiver is made when the first client connects
+    and is made again on the next client after it was lost.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(
+        self,
+        server_address: tuple[str, int],
+        serial_url: str,
+        communication_log_size: int = 0,
+    ) -> None:
+        """Create a proxy for the receiver at serial_url, see `YncaConnection` for supported serial_urls."""
+        super().__init__(server_address, YncaProxyHandler)
+        self._serial_url = serial_url
+        self._communication_log_size = communication_log_size
+        self.connection: YncaConnection | None = None
+
+        self._lock = threading.Lock()
+        self._clients: set[_ProxyClient] = set()
+        self._cache: dict[tuple[str, str], str] = {}
+        # In the order sent, the receiver replies in the same order
+        self._pending_gets: list[_PendingGet] = []
+
+        self.num_cache_hits = 0
+
+    def add_client(self, client: _ProxyClient) -> None:
+        with self._lock:
+            if self.connection is None or not self.connection.connected:
+                connection = YncaConnection.create_from_serial_url(self._serial_url)
+                connection.register_message_callback(self._upstream_message_received)
+                connection.connect(
+                    self._upstream_disconnected,
+                    self._communication_log_size,
+                    coalesce_puts=True,
+                )
+                self.connection = connection
+            self._clients.add(client)
+
+    def remove_client(self, client: _ProxyClient) -> None:
+        with self._lock:
+            self._clients.discard(client)
+            for pending_get in self._pending_gets:
+                pending_get.waiters.discard(client)
+
+    def handle_get(self, client: _ProxyClient, subunit: str, function: str) -> None:
+        key = (subunit, function)
+        send = False
+        with self._lock:
+            # Replies never came, e.g. multiresponse functions do not reply with the function itself
+            expired = time.monotonic() - PENDING_GET_TIMEOUT
+            while self._pending_gets and self._pending_gets[0].sent_at < expired:
+                del self._pending_gets[0]
+
+            waiting = any(client in pending.waiters for pending in self._pending_gets)
+            value = None if waiting else self._cache.get(key)
+            if value is not None:
+                self.num_cache_hits += 1
+            elif not waiting and (
+                pending_get := next(
+                    (
+                        pending
+                        for pending in self._pending_gets
+                        if pending.key == key and not pending.replying
+                    ),
+                    None,
+                )
+            ):
+                # Client waits for nothing else, so the reply is still in order
+                pending_get.waiters.add(client)
+            else:
+                # Answering from the cache would reply before earlier GETs of the client
+                self._pending_gets.append(_PendingGet(key, client))
+                send = True
+
+        if value is not None:
+            client.send(f"@{subunit}:{function}={value}")
+        elif send and self.connection:
+            self.connection.get(subunit, function)
+
+    def handle_put(self, subunit: str, function: str, value: str) -> None:
+        with self._lock:
+            # Receiver reports the resulting value, until then the cached value is outdated
+            self._cache.pop((subunit, function), None)
+        if self.connection:
+            self.connection.put(subunit, function, value)
+
+    def _upstream_message_received(
+        self,
+        status: YncaProtocolStatus,
+        subunit: str | None,
+        function: str | None,
+        value: str | None,
+    ) -> None:
+        if subunit is None or function is None:
+            return
+
+        key = (subunit, function)
+        with self._lock:
+            # Lines can be part of the reply to any of the pending GETs
+            waiting = set().union(*(pending.waiters for pending in self._pending_gets))
+            index = next(
+                (
+                    index
+                    for index, pending in enumerate(self._pending_gets)
+                    if pending.key == key
+                ),
+                None,
+            )
+            waiters = set()
+            if index is not None:
+                waiters = self._pending_gets[index].waiters
+                # Receiver replies in order, so earlier GETs are done as well
+                del self._pending_gets[: index + 1]
+            elif self._pending_gets:
+                # Part of a multiresponse reply of the oldest GET, or a report of a change
+                self._pending_gets[0].replying = True
+
+            if status is not YncaProtocolStatus.OK:
+                recipients = waiters
+            else:
+                # Other clients only need to know about changes
+                known_value = self._cache.get(key)
+                unchanged = known_value == value or (
+                    bool(waiters) and known_value is None
+                )
+                recipients = waiting if unchanged else set(self._clients)
+                self._cache[key] = value  # type: ignore[assignment]
+
+        line = (
+            f"@{subunit}:{function}={value}"
+            if status is YncaProtocolStatus.OK
+            else f"@{status.name}"
+        )
+        for client in recipients:
+            client.send(line)
+
+    def _upstream_disconnected(self) -> None:
+        logger.warning("Connection to receiver lost, disconnecting clients")
+        with self._lock:
+            self._cache.clear()
+            self._pending_gets.clear()
+            clients = list(self._clients)
+        # Same as a receiver going away, clients will reconnect
+        for client in clients:
+            client.disconnect()
+
+    def server_close(self) -> None:
+        with self._lock:
+            clients = list(self._clients)
+            connection, self.connection = self.connection, None
+        for client in clients:
+            client.disconnect()
+        if connection:
+            connection.close()
+        super().server_close()
+
+
+def main(args: argparse.Namespace) -> None:  # pragma: no cover
+    with YncaProxyServer((args.host, args.port), args.serial_url) as server:
+        logger.info("Waiting for connections")
+        server.serve_forever()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser(
+        description="YNCA proxy to share a single receiver connection with multiple clients."
+    )
+
+    parser.add_argument(
+        "serial_url",
+        help="Serial url of the receiver, e.g. /dev/ttyUSB0 or socket://192.168.178.21:50000",
+    )
+    parser.add_argument(
+        "--host",
+        help="Host interface to bind to, default is 0.0.0.0 for all interfaces",
+        default="0.0.0.0",  # noqa: S104
+    )
+    parser.add_argument(
+        "--port",
+        help="Port to use, default is the standard port 50000",
+        default=50000,
+        type=int,
+    )
+    parser.add_argument(
+        "--loglevel",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        default="INFO",
+        help="Define loglevel, default is INFO.",
+    )
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.loglevel)
+
+    main(args)
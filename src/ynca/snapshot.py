@@ -0,0 +1,93 @@
+"""Consistent views on the values of all subunits."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import threading
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Iterable, Mapping
+
+
+@dataclass(frozen=True)
+class YncaSnapshot:
+    """Values of subunits at one point in the sequence of updates.
+
+    sequence:
+        Sequence number of the last update included in the snapshot.
+
+    values:
+        Immutable mapping of {subunit_id: {function_name: value}}.
+    """
+
+    sequence: int
+    values: Mapping[str, Mapping[str, Any]]
+
+
+class YncaChangeTracker:
+    """Numbers every value change of the subunits with a monotonic sequence number.
+
+    Values are recorded by the thread receiving the data, snapshots can be taken from any thread.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._sequence = 0
+        # Latest change per (subunit, function), ordered by sequence number
+        self._changes: dict[tuple[str, str], tuple[int, Any]] = {}
+
+    @property
+    def sequence(self) -> int:
+        """Sequence number of the last recorded change, 0 when nothing was recorded."""
+        return self._sequence
+
+    def record(self, subunit_id: str, function_name: str, value: Any) -> int:
+        """Record a changed value, returns its sequence number."""
+        key = (subunit_id, function_name)
+        with self._lock:
+            self._sequence += 1
+            # Reinsert to keep the dict ordered by sequence number
+            self._changes.pop(key, None)
+            self._changes[key] = (self._sequence, value)
+            return self._sequence
+
+    @staticmethod
+    def _snapshot(
+        sequence: int, changes: Iterable[tuple[tuple[str, str], Any]]
+    ) -> YncaSnapshot:
+        values: dict[str, dict[str, Any]] = {}
+        for (subunit_id, function_name), value in changes:
+            values.setdefault(subunit_id, {})[function_name] = value
+        return YncaSnapshot(
+            sequence,
+            MappingProxyType(
+                {
+                    subunit_id: MappingProxyType(subunit_values)
+                    for subunit_id, subunit_values in values.items()
+                }
+            ),
+        )
+
+    def snapshot(self) -> YncaSnapshot:
+        """Get the latest values of all subunits."""
+        with self._lock:
+            sequence = self._sequence
+            changes = [(key, value) for key, (_, value) in self._changes.items()]
+        return self._snapshot(sequence, changes)
+
+    def changes_since(self, sequence: int) -> YncaSnapshot:
+        """Get the values that changed after the sequence number.
+
+        Use the sequence number of the result for the next call to get all changes exactly once.
+        Values that changed multiple times are only included with their latest value.
+        """
+        changes = []
+        with self._lock:
+            for key, (change_sequence, value) in reversed(self._changes.items()):
+                if change_sequence <= sequence:
+                    break
+                changes.append((key, value))
+            current_sequence = self._sequence
+        return self._snapshot(current_sequence, reversed(changes))
@@ -0,0 +1,55 @@
+"""Persistent state snapshots for warm starts."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import json
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+STATE_FORMAT_VERSION = 1
+
+
+@dataclass
+class YncaState:
+    """Snapshot of the raw values of all subunits of a receiver.
+
+    Values are stored as received from the receiver so they can be converted
+    again when restoring. The snapshot is only valid for the receiver
+    with the same MODELNAME and VERSION.
+    """
+
+    modelname: str
+    version: str
+    subunits: dict[str, dict[str, str]] = field(default_factory=dict)
+
+    def matches(self, modelname: str, version: str) -> bool:
+        return self.modelname == modelname and self.version == version
+
+    def save(self, filename: str | Path) -> None:
+        data = {
+            "format": STATE_FORMAT_VERSION,
+            "modelname": self.modelname,
+            "version": self.version,
+            "subunits": self.subunits,
+        }
+        Path(filename).write_text(
+            json.dumps(data, separators=(",", ":")), encoding="utf-8"
+        )
+
+    @classmethod
+    def load(cls, filename: str | Path) -> YncaState | None:
+        """Load a state snapshot, returns None when there is no usable snapshot."""
+        try:
+            data = json.loads(Path(filename).read_text(encoding="utf-8"))
+            if data["format"] != STATE_FORMAT_VERSION:
+                logger.info("Ignoring state file %s, unsupported format", filename)
+                return None
+            return cls(data["modelname"], data["version"], data["subunits"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring state file %s, could not load it: %s", filename, e)
+            return None
@@ -3,17 +3,22 @@ from __future__ import annotations
 from abc import ABC
 from enum import Flag, auto
 import logging
-import threading
-from typing import TYPE_CHECKING, Any, Protocol
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, ClassVar, Protocol
 
-from .connection import YncaConnection, YncaProtocol, YncaProtocolStatus
+from .connection import YncaConnectionBase, YncaProtocolStatus
 from .constants import Subunit
 from .enums import Avail
 from .errors import YncaInitializationFailedException
 from .function import Cmd, EnumFunctionMixin, FunctionMixinBase
+from .initializer import InitializationPlan
+from .update_policy import UpdatePolicy, _UpdateBatcher, _UpdateLimiter
 
 if TYPE_CHECKING:  # pragma: no cover
-    from collections.abc import Callable
+    from collections.abc import Callable, Iterable, Mapping
+
+    from .dispatcher import CallbackDispatcher
+    from .snapshot import YncaChangeTracker
 
 logger = logging.getLogger(__name__)
 
@@ -36,10 +41,30 @@ class YncaFunctionHandler:
         function: FunctionMixinBase,
     ) -> None:
         self.value = None
+        self.value_str: str | None = None
         self.function = function
 
-    def update(self, value_str: str) -> None:
+    def update(self, value_str: str) -> bool:
+        """Update the value, returns True if the value changed.
+
+        Unchanged values are not converted again.
+        """
+        if value_str == self.value_str:
+            return False
+        self.value_str = value_str
         self.value = self.function.converter.to_value(value_str)
+        return True
+
+
+def _initializer_names(functions: Iterable[FunctionMixinBase]) -> dict[str, str]:
+    """Names of the functions to GET to initialize the functions, per function name."""
+    return {
+        function.name: (
+            function.initializer if function.initializer is not None else function.name
+        )
+        for function in functions
+        if not function.no_initialize
+    }
 
 
 class SubunitBaseMixinProtocol(Protocol):  # pragma: no cover
@@ -56,24 +81,130 @@ class SubunitBase(ABC):
 
     avail = EnumFunctionMixin[Avail](Avail, Cmd.GET)
 
-    def __init__(self, connection: YncaConnection) -> None:
-        self._update_callbacks: set[Callable[[str, Any], None]] = set()
+    # Seconds without updates that end a burst for the batch update callbacks
+    BATCH_GAP = 0.05
 
-        self.function_handlers: dict[str, YncaFunctionHandler] = {}
+    # Functions and the names of the functions needed to initialize them.
+    # These are the same for all instances of a class so they are gathered once per class.
+    _function_table: ClassVar[Mapping[str, FunctionMixinBase]] = MappingProxyType({})
+    _initializer_names: ClassVar[Mapping[str, str]] = MappingProxyType({})
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+
+        functions: dict[str, FunctionMixinBase] = {}
 
         # Note that we need to iterate over the _class_
         # otherwise the YncaFunction descriptors get/set functions would trigger.
         # Sort the list to have a deterministic/understandable order for easier testing
-        for attribute_name in sorted(dir(self.__class__)):
-            attribute = getattr(self.__class__, attribute_name, None)
+        for attribute_name in sorted(dir(cls)):
+            attribute = getattr(cls, attribute_name, None)
             if isinstance(attribute, FunctionMixinBase):
-                self.function_handlers[attribute.name] = YncaFunctionHandler(attribute)
+                functions[attribute.name] = attribute
+
+        cls._function_table = MappingProxyType(functions)
+        cls._initializer_names = MappingProxyType(
+            _initializer_names(functions.values())
+        )
+
+    def __init__(self, connection: YncaConnectionBase) -> None:
+        # Callbacks with the names of the functions they are interested in, None for all functions
+        self._update_callbacks: dict[
+            Callable[[str, Any], None], frozenset[str] | None
+        ] = {}
+
+        self.function_handlers: dict[str, YncaFunctionHandler] = {
+            function_name: YncaFunctionHandler(function)
+            for function_name, function in self._function_table.items()
+        }
+        # Functions with an update policy
+        self._update_limiters: dict[str, _UpdateLimiter] = {}
+        # Runs the update callbacks when set, otherwise they run on the thread receiving the data
+        self._callback_dispatcher: CallbackDispatcher | None = None
+        # Numbers the value changes for consistent snapshots, set by the API
+        self._change_tracker: YncaChangeTracker | None = None
+
+        self._batch_update_callbacks: set[Callable[[str, dict[str, Any]], None]] = set()
+        # Created when the first batch update callback is registered
+        self._batcher: _UpdateBatcher | None = None
 
         self._initialized = False
-        self._initialized_event = threading.Event()
+        # Called on first access of a value when initialization of the subunit is deferred
+        self._initialization_request: Callable[[SubunitBase], None] | None = None
+        # Functions that are not initialized, their values can be requested with `refresh()`
+        self._excluded_functions: frozenset[str] = frozenset()
 
         self._connection = connection
-        self._connection.register_message_callback(self._protocol_message_received)
+        self._connection.register_message_callback(
+            self._protocol_message_received, self.id
+        )
+
+    def _initializers(self, *, resync: bool = False) -> Mapping[str, str]:
+        """Names of the functions to GET per function to initialize, in function table order.
+
+        When resyncing only the functions that have a value are returned.
+        Functions without a value are not supported by the device,
+        so there is no need to ask for them again e.g. after a reconnect.
+        """
+        if (
+            not resync
+            and not self._excluded_functions
+            and len(self.function_handlers) == len(self._function_table)
+        ):
+            return self._initializer_names
+
+        # Some functions are left out for this instance
+        return _initializer_names(
+            handler.function
+            for function_name, handler in self.function_handlers.items()
+            if (
+                handler.value_str is not None
+                if resync
+                else function_name not in self._excluded_functions
+            )
+        )
+
+    def _begin_initialization(self, *, reconcile: bool = False) -> None:
+        """Prepare for initialization.
+
+        When reconciling, the subunit stays initialized so values
+        that differ from the current ones are reported to the update callbacks.
+        """
+        if not reconcile:
+            self._initialized = False
+            self._initialization_request = None
+
+    def _end_initialization(self, *, success: bool) -> None:
+        if success:
+            self._initialized = True
+
+    def _restore_values(self, values: dict[str, str]) -> None:
+        """Restore function values from a state snapshot and mark the subunit initialized.
+
+        Excluded functions are skipped, they are not initialized either.
+        """
+        for function_name, value_str in values.items():
+            if function_name in self._excluded_functions:
+                continue
+            if (
+                handler := self.function_handlers.get(function_name)
+            ) and handler.update(value_str):
+                self._record_change(function_name, handler.value)
+        self._initialized = True
+
+    def _report_values(self) -> None:
+        """Call the update callbacks for all functions that have a value."""
+        for function_name, handler in self.function_handlers.items():
+            if handler.value_str is not None:
+                self._call_registered_update_callbacks(function_name, handler.value)
+
+    def _get_values(self) -> dict[str, str]:
+        """Get the raw values of all functions that have a value."""
+        return {
+            function_name: handler.value_str
+            for function_name, handler in self.function_handlers.items()
+            if handler.value_str is not None
+        }
 
     def initialize(self) -> None:
         """Initialize the data for the subunit and makes sure to wait until done. This call can take a long time."""
@@ -81,94 +212,169 @@ class SubunitBase(ABC):
             msg = "No valid connection"
             raise YncaInitializationFailedException(msg)
 
-        logger.info("Subunit %s initialization begin.", self.id)
-
-        self._initialized_event.clear()
-        self._initialized = False
-
-        num_commands_sent_start = self._connection.num_commands_sent
+        InitializationPlan(self._connection, [self]).execute()
 
-        # Setup YNCA function handlers
-        initialized_function_names = []
-        for function_name, handler in self.function_handlers.items():
-            if not handler.function.no_initialize:
-                function_initializer_name = (
-                    handler.function.initializer
-                    if handler.function.initializer is not None
-                    else function_name
-                )
-                if function_initializer_name not in initialized_function_names:
-                    self._get(function_initializer_name)
-                    initialized_function_names.append(function_initializer_name)
-
-        # Use SYS:VERSION as a sync since it is available on all receivers
-        self._connection.get(Subunit.SYS, "VERSION")
-
-        # Take command spacing into account and apply large margin
-        # Large margin is needed in practice on slower/busier systems
-        num_commands_sent = self._connection.num_commands_sent - num_commands_sent_start
-        if self._initialized_event.wait(
-            2 + num_commands_sent * (YncaProtocol.COMMAND_SPACING * 5)
-        ):
-            self._initialized = True
-        else:
-            msg = f"Subunit {self.id} initialization failed"
-            raise YncaInitializationFailedException(msg)
+    def refresh(self, *function_names: str) -> None:
+        """Request the values of the functions from the device, e.g. for functions that were excluded from initialization.
 
-        logger.info("Subunit %s initialization end.", self.id)
+        Only requests are sent, the update callbacks get called when the values arrive.
+        """
+        initializer_names = _initializer_names(
+            self.function_handlers[function_name].function
+            for function_name in function_names
+        )
+        # Functions can share an initializer, only GET it once
+        for initializer_name in dict.fromkeys(initializer_names.values()):
+            self._connection.get(self.id, initializer_name)
 
     def close(self) -> None:
         if self._connection:
             self._connection.unregister_message_callback(
-                self._protocol_message_received
+                self._protocol_message_received, self.id
             )
-            self._update_callbacks = set()
+            self._update_callbacks = {}
+            if self._batch_update_callbacks:
+                self._connection.unregister_message_callback(
+                    self._sync_received, Subunit.SYS
+                )
+            self._batch_update_callbacks = set()
+        for limiter in self._update_limiters.values():
+            limiter.cancel()
+        if self._batcher is not None:
+            self._batcher.cancel()
 
     def _protocol_message_received(
         self,
         status: YncaProtocolStatus,
-        subunit: str | None,
+        _subunit: str | None,
         function_name: str | None,
         value_str: str | None,
     ) -> None:
         if status is not YncaProtocolStatus.OK:
-            # Can't really handle errors since at this point we can't see to what command it belonged
-            return
-
-        # During initialization SYS:VERSION is used to signal that initialization is done
-        if (
-            not self._initialized
-            and subunit == Subunit.SYS
-            and function_name == "VERSION"
-        ):
-            self._initialized_event.set()
-
-        if self.id != subunit:
+            # Errors do not change values
             return
 
+        # Connection only delivers messages for this subunit
+        # Values are often repeated, e.g. in BASIC responses, only report changes
         if (
             function_name is not None
             and value_str is not None
             and (handler := self.function_handlers.get(function_name, None))
+            and handler.update(value_str)
         ):
-            handler.update(value_str)
-            self._call_registered_update_callbacks(function_name, handler.value)
+            self._record_change(function_name, handler.value)
+            if limiter := self._update_limiters.get(function_name):
+                limiter.update()
+            else:
+                self._call_registered_update_callbacks(function_name, handler.value)
+
+    def _record_change(self, function_name: str, value: Any) -> None:
+        if self._change_tracker is not None:
+            self._change_tracker.record(self.id, function_name, value)
 
     def _put(self, function_name: str, value: str) -> None:
         if self._connection:
             self._connection.put(self.id, function_name, value)
 
-    def _get(self, function_name: str) -> None:
-        if self._connection:
-            self._connection.get(self.id, function_name)
+    def register_update_callback(
+        self,
+        callback: Callable[[str, Any], None],
+        functions: Iterable[str] | None = None,
+    ) -> None:
+        """Register a callback that gets called with the function name and new value when a value changes.
 
-    def register_update_callback(self, callback: Callable[[str, Any], None]) -> None:
-        self._update_callbacks.add(callback)
+        functions:
+            Names of the functions to get called for, e.g. {"PWR", "VOL"}. None for all functions.
+            Registering the same callback again replaces the functions.
+        """
+        self._update_callbacks[callback] = (
+            frozenset(functions) if functions is not None else None
+        )
 
     def unregister_update_callback(self, callback: Callable[[str, Any], None]) -> None:
-        self._update_callbacks.remove(callback)
+        del self._update_callbacks[callback]
+
+    def register_batch_update_callback(
+        self, callback: Callable[[str, dict[str, Any]], None]
+    ) -> None:
+        """Register a callback that gets called with the subunit id and the changed values of a burst of updates.
+
+        A response to e.g. BASIC or powering on changes a lot of values at once,
+        this callback gets called once with all of them as {function_name: value}.
+        A burst ends when there were no updates for `BATCH_GAP` seconds
+        or when the @SYS:VERSION sync marker is received.
+        The update callbacks are still called for each value.
+        """
+        if self._batcher is None:
+            self._batcher = _UpdateBatcher(
+                self.BATCH_GAP,
+                self._call_batch_update_callbacks,
+                self._connection.call_later,
+            )
+        if not self._batch_update_callbacks:
+            self._connection.register_message_callback(self._sync_received, Subunit.SYS)
+        self._batch_update_callbacks.add(callback)
+
+    def unregister_batch_update_callback(
+        self, callback: Callable[[str, dict[str, Any]], None]
+    ) -> None:
+        self._batch_update_callbacks.remove(callback)
+        if not self._batch_update_callbacks:
+            self._connection.unregister_message_callback(
+                self._sync_received, Subunit.SYS
+            )
+            if self._batcher is not None:
+                self._batcher.cancel()
+
+    def _sync_received(
+        self,
+        status: YncaProtocolStatus,
+        _subunit: str | None,
+        function_name: str | None,
+        _value: str | None,
+    ) -> None:
+        if (
+            status is YncaProtocolStatus.OK
+            and function_name == "VERSION"
+            and self._batcher is not None
+        ):
+            self._batcher.flush()
+
+    def _call_batch_update_callbacks(self, values: dict[str, Any]) -> None:
+        for callback in self._batch_update_callbacks:
+            if self._callback_dispatcher is not None:
+                self._callback_dispatcher.submit(self.id, callback, self.id, values)
+            else:
+                callback(self.id, values)
+
+    def set_update_policy(
+        self, function_name: str, policy: UpdatePolicy | None
+    ) -> None:
+        """Limit how often updates of a function are delivered to the update callbacks, e.g. for ELAPSEDTIME.
+
+        None delivers all updates again, a pending update is dropped when replacing a policy.
+        """
+        handler = self.function_handlers[function_name]
+        if limiter := self._update_limiters.pop(function_name, None):
+            limiter.cancel()
+        if policy is not None:
+            self._update_limiters[function_name] = _UpdateLimiter(
+                policy,
+                lambda: self._call_registered_update_callbacks(
+                    function_name, handler.value
+                ),
+                self._connection.call_later,
+            )
 
     def _call_registered_update_callbacks(self, function_name: str, value: Any) -> None:
         if self._initialized:
-            for callback in self._update_callbacks:
-                callback(function_name, value)
+            for callback, functions in self._update_callbacks.items():
+                if functions is None or function_name in functions:
+                    if self._callback_dispatcher is not None:
+                        self._callback_dispatcher.submit(
+                            self.id, callback, function_name, value
+                        )
+                    else:
+                        callback(function_name, value)
+            if self._batch_update_callbacks and self._batcher is not None:
+                self._batcher.add(function_name, value)
@@ -69,6 +69,7 @@ def do_vol_down(
 class ZoneBase(PlaybackFunctionMixin, SubunitBase):
     # BASIC gets a lot of attribute like PWR, SLEEP, VOL, MUTE, INP, STRAIGHT, ENHANCER, SOUNDPRG and more
     # Use it to significantly reduce the amount of commands to send
+    # Functions that are not in BASIC on all models are listed in multiresponse.py instead of using init=
 
     adaptivedrc = EnumFunctionMixin[AdaptiveDrc](AdaptiveDrc)
     dirmode = EnumFunctionMixin[DirMode](DirMode, init="BASIC")
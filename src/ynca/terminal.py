@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
-import re
 import sys
 
+from .codec import parse_line
 from .connection import YncaConnection, YncaProtocolStatus
 
 PROMPT = ">> "
@@ -49,6 +49,8 @@ def ynca_terminal(serial_url: str) -> None:
 
         if status is YncaProtocolStatus.OK:
             print(f"Received: {status.name} @{subunit}:{function}={value}")
+        elif subunit is not None:
+            print(f"Received: @{status.name} for @{subunit}:{function}")
         else:
             print(f"Received: @{status.name}")
 
@@ -71,19 +73,13 @@ def ynca_terminal(serial_url: str) -> None:
         if command.lower() in ["bye", "done", "exit", "q", "quit"]:
             quit_ = True
         elif command != "":
-            match = re.match(
-                r"@?(?P<subunit>.+?):(?P<function>.+?)=(?P<value>.+)", command
-            )
-            if match is not None:
+            parsed = parse_line(command if command.startswith("@") else f"@{command}")
+            if parsed is not None and parsed[2]:
                 # Because the connection receives on another thread, there is no use in catching YNCA exceptions here
                 # However exceptions will cause the connection to break, re-connect if needed
                 if not connection.connected:
                     connection.connect(disconnected_callback)
-                connection.put(
-                    match.group("subunit"),
-                    match.group("function"),
-                    match.group("value"),
-                )
+                connection.put(*parsed)
             else:
                 print("Invalid command format")
 
@@ -0,0 +1,146 @@
+"""Limit how often updates are delivered to the update callbacks."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import math
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable
+
+    from .connection import TimerHandle
+
+
+@dataclass(frozen=True)
+class UpdatePolicy:
+    """Limits how often updates of a function are delivered to the update callbacks.
+
+    Updates that are held back are coalesced, only the latest value gets delivered.
+    Delayed updates are delivered from a timer, so on another thread for `YncaApi`
+    and on the event loop for `AsyncYncaApi`.
+
+    min_interval:
+        Minimum seconds in between delivered updates, e.g. 5 for ELAPSEDTIME.
+        An update is delivered right away when the interval has passed,
+        otherwise the latest value is delivered at the end of the interval.
+
+    debounce:
+        Seconds without updates before the latest value is delivered, e.g. 0.05 to coalesce bursts.
+    """
+
+    min_interval: float = 0.0
+    debounce: float = 0.0
+
+
+class _UpdateLimiter:
+    """Applies an UpdatePolicy to the updates of one function."""
+
+    def __init__(
+        self,
+        policy: UpdatePolicy,
+        deliver: Callable[[], None],
+        call_later: Callable[[float, Callable[[], None]], TimerHandle],
+    ) -> None:
+        self._policy = policy
+        self._deliver = deliver
+        self._call_later = call_later
+
+        self._lock = threading.Lock()
+        self._last_delivery = -math.inf
+        self._timer: TimerHandle | None = None
+        self._due = 0.0
+
+    def update(self) -> None:
+        """Handle a new value, it gets delivered now or later."""
+        now = time.monotonic()
+        with self._lock:
+            self._due = max(
+                now + self._policy.debounce,
+                self._last_delivery + self._policy.min_interval,
+            )
+            # Timer is not restarted on every update, that would be a new thread per line for YncaApi
+            if self._timer is not None:
+                return
+            if self._due > now:
+                self._timer = self._call_later(self._due - now, self._timer_expired)
+                return
+            self._last_delivery = now
+        self._deliver()
+
+    def _timer_expired(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            # Updates in the meantime moved the due time
+            if self._due > now:
+                self._timer = self._call_later(self._due - now, self._timer_expired)
+                return
+            self._timer = None
+            self._last_delivery = now
+        self._deliver()
+
+    def cancel(self) -> None:
+        """Drop a pending update."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+class _UpdateBatcher:
+    """Collects the updates of a burst into one batch.
+
+    A burst ends when there were no updates for `gap` seconds or when `flush()` is called.
+    """
+
+    def __init__(
+        self,
+        gap: float,
+        deliver: Callable[[dict[str, Any]], None],
+        call_later: Callable[[float, Callable[[], None]], TimerHandle],
+    ) -> None:
+        self._gap = gap
+        self._deliver = deliver
+        self._call_later = call_later
+
+        self._lock = threading.Lock()
+        self._batch: dict[str, Any] = {}
+        self._last_update = 0.0
+        self._timer: TimerHandle | None = None
+
+    def add(self, function_name: str, value: Any) -> None:
+        with self._lock:
+            self._batch[function_name] = value
+            self._last_update = time.monotonic()
+            # Timer is not restarted on every update, that would be a new thread per line for YncaApi
+            if self._timer is None:
+                self._timer = self._call_later(self._gap, self._timer_expired)
+
+    def _timer_expired(self) -> None:
+        with self._lock:
+            remaining = self._last_update + self._gap - time.monotonic()
+            if remaining > 0:
+                self._timer = self._call_later(remaining, self._timer_expired)
+                return
+            self._timer = None
+        self.flush()
+
+    def flush(self) -> None:
+        """End the burst and deliver the collected updates."""
+        with self._lock:
+            batch, self._batch = self._batch, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if batch:
+            self._deliver(batch)
+
+    def cancel(self) -> None:
+        """Drop the collected updates."""
+        with self._lock:
+            self._batch = {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
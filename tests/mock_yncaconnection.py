@@ -13,6 +13,8 @@ class YncaConnectionMock(mock.MagicMock):
         self.get_response_list: list[
             tuple[tuple[str, str], list[tuple[str, str, str]]]
         ] = []
+        self._message_callbacks: list = []
+        self._sync_callback: Any = None
 
     @property
     def num_commands_sent(self) -> int:
@@ -22,10 +24,39 @@ class YncaConnectionMock(mock.MagicMock):
         # Need to separate from __init__ otherwise it would run into infinite
         # recursion when executing `self.get.side_effect = xyz`
         self.get.side_effect = self._get_response
+        self.sync.side_effect = self._sync_response
         self._get_response_list_offset = 0
 
+        # Keep track of registered callbacks so messages get delivered to all of them
+        self.register_message_callback.side_effect = self._register_message_callback
+        self.unregister_message_callback.side_effect = self._unregister_message_callback
+
+    def _register_message_callback(
+        self, callback: Any, subunit: str | None = None
+    ) -> None:
+        if (callback, subunit) not in self._message_callbacks:
+            self._message_callbacks.append((callback, subunit))
+
+    def _unregister_message_callback(
+        self, callback: Any, subunit: str | None = None
+    ) -> None:
+        if (callback, subunit) in self._message_callbacks:
+            self._message_callbacks.remove((callback, subunit))
+
+    def _call_message_callbacks(
+        self,
+        status: YncaProtocolStatus,
+        subunit: str | None,
+        function: str | None,
+        value: str | None,
+    ) -> None:
+        # Like the real connection, wildcard callbacks get all messages
+        for callback, callback_subunit in list(self._message_callbacks):
+            if callback_subunit is None or callback_subunit == subunit:
+                callback(status, subunit, function, value)
+
     # ruff: noqa: T201
-    def _get_response(self, subunit: str, function: str) -> None:
+    def _get_response(self, subunit: str, function: str, _priority: Any = None) -> None:
         self._num_commands_sent += 1
 
         print(f"mock: get_response({subunit}, {function})")
@@ -36,25 +67,38 @@ class YncaConnectionMock(mock.MagicMock):
             print(f"mock:   next_request={next_request}, responses={responses}")
             if not (next_request[0] == subunit and next_request[1] == function):
                 print("mock:   no match return @UNDEFINED")
-                self.send_protocol_error("@UNDEFINED")
+                self.send_protocol_error("@UNDEFINED", subunit, function)
                 return
 
             self._get_response_list_offset += 1
             for response in responses:
                 if response[0].startswith("@"):
-                    self.send_protocol_error(response[0])
+                    self.send_protocol_error(response[0], subunit, function)
                 else:
                     self.send_protocol_message(response[0], response[1], response[2])
 
         except Exception as e:  # noqa: BLE001
             print(f"Skipping: {subunit}, {function} because of {e}")
 
+    def _sync_response(self, callback: Any, priority: Any = None) -> None:
+        # Like the real connection, only the response to this request calls the callback
+        self._sync_callback = callback
+        self.get("SYS", "VERSION", priority)
+        self._sync_callback = None
+
     def send_protocol_message(
         self, subunit: str, function: str, value: str | None = None
     ) -> None:
-        for callback in self.register_message_callback.call_args.args:
-            callback(YncaProtocolStatus.OK, subunit, function, value)
+        self._call_message_callbacks(YncaProtocolStatus.OK, subunit, function, value)
 
-    def send_protocol_error(self, error: str) -> None:
-        for callback in self.register_message_callback.call_args.args:
-            callback(YncaProtocolStatus[error[1:]], None, None, None)
+        if subunit == "SYS" and function == "VERSION" and self._sync_callback:
+            callback, self._sync_callback = self._sync_callback, None
+            callback()
+
+    def send_protocol_error(
+        self, error: str, subunit: str | None = None, function: str | None = None
+    ) -> None:
+        # Like the real connection, errors are attributed to the command that caused them
+        self._call_message_callbacks(
+            YncaProtocolStatus[error[1:]], subunit, function, None
+        )
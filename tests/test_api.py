@@ -1,14 +1,23 @@
+from collections.abc import Generator
+from pathlib import Path
+import socket
+import threading
+import time
 from unittest import mock
 
 import pytest
 
 from tests.mock_yncaconnection import YncaConnectionMock
 import ynca
+from ynca import YncaCapabilityCache
+from ynca.debug_server import YncaServer
 from ynca.errors import (
     YncaConnectionError,
     YncaException,
     YncaInitializationFailedException,
 )
+from ynca.protocol import YncaProtocol
+from ynca.state import YncaState
 
 SYS = "SYS"
 MAIN = "MAIN"
@@ -145,13 +154,6 @@ INITIALIZE_FULL_RESPONSES = [
             (SYS, "PWR", "Standby"),
         ],
     ),
-    # SYS Subunit initialize sync
-    (
-        (SYS, "VERSION"),
-        [
-            (SYS, "VERSION", "Version"),
-        ],
-    ),
     # BT Subunit init start
     (
         (BT, "AVAIL"),
@@ -159,13 +161,6 @@ INITIALIZE_FULL_RESPONSES = [
             (BT, "AVAIL", "Not Connected"),
         ],
     ),
-    # BT Subunit initialize sync
-    (
-        (SYS, "VERSION"),
-        [
-            (SYS, "VERSION", "Version"),
-        ],
-    ),
     # MAIN Subunit init start
     (
         (MAIN, "AVAIL"),
@@ -179,21 +174,21 @@ INITIALIZE_FULL_RESPONSES = [
             (MAIN, "ZONENAME", "MainZoneName"),
         ],
     ),
-    # MAIN Subunit iniatilize sync
+    # USB Subunit init start
     (
-        (SYS, "VERSION"),
+        (USB, "AVAIL"),
         [
-            (SYS, "VERSION", "Version"),
+            (USB, "AVAIL", "Not Connected"),
         ],
     ),
-    # USB Subunit init start
+    # Initialize sync for all subunits
     (
-        (USB, "AVAIL"),
+        (SYS, "VERSION"),
         [
-            (USB, "AVAIL", "Not Connected"),
+            (SYS, "VERSION", "Version"),
         ],
     ),
-    # USB Subunit iniatilize sync
+    # MAIN does not support BASIC, functions expected in BASIC get requested on their own
     (
         (SYS, "VERSION"),
         [
@@ -306,12 +301,42 @@ def test_initialize_minimal(
         assert isinstance(y.sys, ynca.System)
         assert y.sys.version == "Version"
 
+        snapshot = y.snapshot()
+        assert snapshot.values[SYS]["VERSION"] == "Version"
+        assert y.changes_since(snapshot.sequence).values == {}
+
+        connection.send_protocol_message(SYS, "MODELNAME", "ModelName")
+        changes = y.changes_since(snapshot.sequence)
+        assert changes.values == {SYS: {"MODELNAME": "ModelName"}}
+        assert changes.sequence > snapshot.sequence
+
         y.close()
 
         connection.close.assert_called_once()
         disconnect_callback.assert_not_called()
 
 
+def test_initialize_callback_dispatcher(
+    connection: YncaConnectionMock,
+) -> None:
+    with mock.patch.object(
+        ynca.api.YncaConnection, "create_from_serial_url"
+    ) as create_from_serial_url:
+        create_from_serial_url.return_value = connection
+        connection.get_response_list = INITIALIZE_MINIMAL_RESPONSES
+        dispatcher = ynca.CallbackDispatcher()
+
+        y = ynca.YncaApi("serial_url", callback_dispatcher=dispatcher)
+        y.initialize()
+
+        assert connection.callback_dispatcher is dispatcher
+        assert y.sys is not None
+        assert y.sys._callback_dispatcher is dispatcher  # noqa: SLF001
+
+        y.close()
+        dispatcher.close()
+
+
 def test_initialize_twice(
     connection: YncaConnectionMock,
 ) -> None:
@@ -405,12 +430,18 @@ def test_get_communication_log_items(
 
         y = ynca.YncaApi("serial_url")
         assert y.get_communication_log_items() == []
+        with pytest.raises(YncaException):
+            y.save_communication_log("communication_log.jsonl")
         y.initialize()
 
         connection.get_communication_log_items.return_value = [
             "communication log items"
         ]
         assert y.get_communication_log_items() == ["communication log items"]
+        y.save_communication_log("communication_log.jsonl")
+        connection.save_communication_log.assert_called_once_with(
+            "communication_log.jsonl"
+        )
 
         y.close()
 
@@ -447,10 +478,12 @@ def test_get_connection(
 
         with pytest.raises(YncaException):
             y.get_raw_connection()
+        assert y.metrics is None
 
         y.initialize()
 
         assert y.get_raw_connection() is connection
+        assert y.metrics is connection.metrics
 
         y.close()
 
@@ -501,4 +534,550 @@ def test_initialize_full(
         assert y.tun is None
         assert y.uaw is None
 
+        # No pacing profile for the model
+        connection.set_pacing.assert_not_called()
+
+        y.close()
+
+
+def test_initialize_model_pacing(
+    connection: YncaConnectionMock,
+) -> None:
+    pacing = ynca.CommandPacing(min_spacing=0.05)
+    modelinfo = ynca.modelinfo.ModelInfo(soundprg=[], pacing=pacing)
+
+    with (
+        mock.patch.object(
+            ynca.api.YncaConnection, "create_from_serial_url"
+        ) as create_from_serial_url,
+        mock.patch.dict(ynca.modelinfo.MODELINFO, {"ModelName": modelinfo}),
+    ):
+        create_from_serial_url.return_value = connection
+        connection.get_response_list = INITIALIZE_FULL_RESPONSES
+
+        y = ynca.YncaApi("serial_url")
+        y.initialize()
+
+        connection.set_pacing.assert_called_once_with(pacing)
+        y.close()
+
+
+def test_initialize_explicit_pacing(
+    connection: YncaConnectionMock,
+) -> None:
+    pacing = ynca.CommandPacing(min_spacing=0.05)
+    modelinfo = ynca.modelinfo.ModelInfo(soundprg=[], pacing=pacing)
+
+    with (
+        mock.patch.object(
+            ynca.api.YncaConnection, "create_from_serial_url"
+        ) as create_from_serial_url,
+        mock.patch.dict(ynca.modelinfo.MODELINFO, {"ModelName": modelinfo}),
+    ):
+        create_from_serial_url.return_value = connection
+        connection.get_response_list = INITIALIZE_FULL_RESPONSES
+
+        explicit_pacing = ynca.CommandPacing(min_spacing=0.03)
+        keep_alive = ynca.KeepAlive(wake_up_probes=0)
+        y = ynca.YncaApi("serial_url", pacing=explicit_pacing, keep_alive=keep_alive)
+        y.initialize()
+
+        # Explicit pacing is passed on connect and not overridden by the model
+        assert connection.connect.call_args.kwargs["pacing"] is explicit_pacing
+        assert connection.connect.call_args.kwargs["keep_alive"] is keep_alive
+        connection.set_pacing.assert_not_called()
+        y.close()
+
+
+WARM_START_RESPONSES = [
+    (
+        (SYS, "MODELNAME"),
+        [
+            (SYS, "MODELNAME", "ModelName"),
+        ],
+    ),
+    (
+        (SYS, "VERSION"),
+        [
+            (SYS, "VERSION", "Version"),
+        ],
+    ),
+    # Background refresh
+    (
+        (MAIN, "ZONENAME"),
+        [
+            (MAIN, "ZONENAME", "NewMainZoneName"),
+        ],
+    ),
+    (
+        (SYS, "VERSION"),
+        [
+            (SYS, "VERSION", "Version"),
+        ],
+    ),
+    # Functions expected in BASIC get requested on their own
+    (
+        (SYS, "VERSION"),
+        [
+            (SYS, "VERSION", "Version"),
+        ],
+    ),
+]
+
+
+def test_save_state_not_initialized(tmp_path: Path) -> None:
+    y = ynca.YncaApi("serial_url")
+    with pytest.raises(YncaException):
+        y.save_state(tmp_path / "state.json")
+
+
+def test_save_state_and_warm_start(
+    connection: YncaConnectionMock, tmp_path: Path
+) -> None:
+    state_file = tmp_path / "state.json"
+
+    with mock.patch.object(
+        ynca.api.YncaConnection, "create_from_serial_url"
+    ) as create_from_serial_url:
+        create_from_serial_url.return_value = connection
+        connection.get_response_list = INITIALIZE_FULL_RESPONSES
+
+        y = ynca.YncaApi("serial_url")
+        y.initialize()
+        y.save_state(state_file)
+        y.close()
+
+    connection = YncaConnectionMock()
+    connection.setup_responses()
+    with mock.patch.object(
+        ynca.api.YncaConnection, "create_from_serial_url"
+    ) as create_from_serial_url:
+        create_from_serial_url.return_value = connection
+        connection.get_response_list = WARM_START_RESPONSES
+
+        y = ynca.YncaApi("serial_url")
+        y.initialize(state_file, YncaCapabilityCache())
+
+        assert y._refresh_thread is not None  # noqa: SLF001
+        y._refresh_thread.join()  # noqa: SLF001
+
+        assert isinstance(y.sys, ynca.System)
+        assert y.sys.modelname == "ModelName"
+        assert y.sys.inpnameusb == "InputUsb"
+        assert isinstance(y.main, ynca.Main)
+        assert y.main.zonename == "NewMainZoneName"
+        assert isinstance(y.bt, ynca.Bt)
+        assert isinstance(y.usb, ynca.Usb)
+        assert y.zone2 is None
+
+        y.close()
+
+
+def test_warm_start_state_mismatch(
+    connection: YncaConnectionMock, tmp_path: Path
+) -> None:
+    state_file = tmp_path / "state.json"
+    YncaState("OtherModelName", "Version", {"SYS": {}, "MAIN": {}}).save(state_file)
+
+    with mock.patch.object(
+        ynca.api.YncaConnection, "create_from_serial_url"
+    ) as create_from_serial_url:
+        create_from_serial_url.return_value = connection
+        connection.get_response_list = [
+            WARM_START_RESPONSES[0],
+            WARM_START_RESPONSES[1],
+            *INITIALIZE_MINIMAL_RESPONSES,
+        ]
+
+        y = ynca.YncaApi("serial_url")
+        y.initialize(state_file)
+
+        assert y._refresh_thread is None  # noqa: SLF001
+        assert isinstance(y.sys, ynca.System)
+        assert y.main is None
+
         y.close()
+
+
+def test_warm_start_state_mismatch_with_capability_cache(
+    connection: YncaConnectionMock, tmp_path: Path
+) -> None:
+    state_file = tmp_path / "state.json"
+    YncaState("OtherModelName", "Version", {"SYS": {}, "MAIN": {}}).save(state_file)
+
+    with mock.patch.object(
+        ynca.api.YncaConnection, "create_from_serial_url"
+    ) as create_from_serial_url:
+        create_from_serial_url.return_value = connection
+        connection.get_response_list = [
+            WARM_START_RESPONSES[0],
+            WARM_START_RESPONSES[1],
+            *INITIALIZE_MINIMAL_RESPONSES,
+        ]
+
+        y = ynca.YncaApi("serial_url")
+        y.initialize(state_file, YncaCapabilityCache())
+
+        # Modelname of the state check is used for the cache as well,
+        # the other GET is for initializing the SYS subunit
+        modelname_gets = [
+            call
+            for call in connection.get.call_args_list
+            if call.args[:2] == (SYS, "MODELNAME")
+        ]
+        assert len(modelname_gets) == 2
+        assert isinstance(y.sys, ynca.System)
+
+        y.close()
+
+
+def test_warm_start_no_response(connection: YncaConnectionMock, tmp_path: Path) -> None:
+    state_file = tmp_path / "state.json"
+    YncaState("ModelName", "Version", {"SYS": {}}).save(state_file)
+
+    with mock.patch.object(
+        ynca.api.YncaConnection, "create_from_serial_url"
+    ) as create_from_serial_url:
+        create_from_serial_url.return_value = connection
+        connection.get_response_list = []
+
+        y = ynca.YncaApi("serial_url")
+        with pytest.raises(YncaInitializationFailedException):
+            y.initialize(state_file)
+
+        connection.close.assert_called_once()
+
+
+def test_warm_start_refresh_fails(
+    connection: YncaConnectionMock, tmp_path: Path
+) -> None:
+    state_file = tmp_path / "state.json"
+    YncaState("ModelName", "Version", {"SYS": {"PWR": "On"}}).save(state_file)
+
+    with (
+        mock.patch.object(
+            ynca.api.YncaConnection, "create_from_serial_url"
+        ) as create_from_serial_url,
+        mock.patch.object(ynca.initializer.YncaProtocol, "COMMAND_SPACING", 0),
+    ):
+        create_from_serial_url.return_value = connection
+        connection.get_response_list = WARM_START_RESPONSES[:2]
+
+        y = ynca.YncaApi("serial_url")
+        y.initialize(state_file)
+        assert y._refresh_thread is not None  # noqa: SLF001
+        y._refresh_thread.join()  # noqa: SLF001
+
+        # Restored values are still available
+        assert y.sys is not None
+        assert y.sys.pwr is ynca.Pwr.ON
+
+        y.close()
+
+
+def test_initialize_with_capability_cache(
+    connection: YncaConnectionMock, tmp_path: Path
+) -> None:
+    cache_file = tmp_path / "capabilities.json"
+
+    with mock.patch.object(
+        ynca.api.YncaConnection, "create_from_serial_url"
+    ) as create_from_serial_url:
+        create_from_serial_url.return_value = connection
+        # Detection already learns that SYS:AVAIL is not supported
+        # so it gets skipped when initializing the SYS subunit
+        num_detect_responses = 6
+        connection.get_response_list = [
+            WARM_START_RESPONSES[0],
+            WARM_START_RESPONSES[1],
+            *INITIALIZE_FULL_RESPONSES[:num_detect_responses],
+            *[
+                response
+                for response in INITIALIZE_FULL_RESPONSES[num_detect_responses:]
+                if response[0] != (SYS, "AVAIL")
+            ],
+        ]
+
+        y = ynca.YncaApi("serial_url")
+        y.initialize(capability_cache=YncaCapabilityCache(cache_file))
+        assert isinstance(y.main, ynca.Main)
+        y.close()
+        num_gets_first_run = connection.get.call_count
+
+    # Unsupported functions are skipped on the next initialize
+    cache = YncaCapabilityCache(cache_file)
+    connection = YncaConnectionMock()
+    connection.setup_responses()
+    with mock.patch.object(
+        ynca.api.YncaConnection, "create_from_serial_url"
+    ) as create_from_serial_url:
+        create_from_serial_url.return_value = connection
+        connection.get_response_list = [
+            WARM_START_RESPONSES[0],
+            WARM_START_RESPONSES[1],
+            *[
+                response
+                for response in INITIALIZE_FULL_RESPONSES
+                if not cache.is_unsupported("ModelName", *response[0])
+            ],
+        ]
+
+        y = ynca.YncaApi("serial_url")
+        y.initialize(capability_cache=cache)
+
+        assert (SYS, "AVAIL") not in [
+            call.args[:2] for call in connection.get.call_args_list
+        ]
+        assert connection.get.call_count < num_gets_first_run / 2
+
+        assert isinstance(y.sys, ynca.System)
+        assert y.sys.modelname == "ModelName"
+        assert y.sys.inpnameusb == "InputUsb"
+        assert isinstance(y.main, ynca.Main)
+        assert y.main.zonename == "MainZoneName"
+        assert isinstance(y.bt, ynca.Bt)
+        assert isinstance(y.usb, ynca.Usb)
+
+        y.close()
+
+
+def test_reconnect_delays() -> None:
+    reconnect = ynca.Reconnect(
+        initial_delay=1, max_delay=5, backoff_factor=2, max_attempts=5
+    )
+    assert list(reconnect.delays()) == [1, 2, 4, 5, 5]
+    assert list(ynca.Reconnect(max_attempts=0).delays()) == []
+
+
+@pytest.fixture
+def server() -> Generator[YncaServer, None, None]:
+    server = YncaServer(("127.0.0.1", 0), "logs/RX-V475.txt")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with mock.patch.object(YncaProtocol, "COMMAND_SPACING", 0.01):
+        yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_reconnect_and_resync(server: YncaServer) -> None:
+    disconnect_callback = mock.MagicMock()
+    y = ynca.YncaApi(
+        f"socket://127.0.0.1:{server.server_address[1]}",
+        disconnect_callback,
+        reconnect=ynca.Reconnect(initial_delay=0.01),
+    )
+    y.initialize()
+    main = y.main
+    assert main is not None
+    num_gets_initialize = y.get_raw_connection().num_commands_sent
+
+    update_callback = mock.MagicMock()
+    main.register_update_callback(update_callback)
+
+    # Volume changes while the connection is down
+    server.store.add_data(MAIN, "VOL", "-40.0")
+    y.get_raw_connection()._serial._socket.shutdown(socket.SHUT_RDWR)  # type: ignore[union-attr]  # noqa: SLF001
+
+    # Reconnect is started by the reader thread when it notices the disconnect
+    for _ in range(100):
+        if y._reconnect_thread is not None:  # noqa: SLF001
+            break
+        time.sleep(0.01)
+    assert y._reconnect_thread is not None  # noqa: SLF001
+    y._reconnect_thread.join()  # noqa: SLF001
+
+    # Same subunits, only the changed value is reported
+    assert y.main is main
+    assert main.vol == -40
+    update_callback.assert_called_once_with("VOL", -40)
+    assert y.metrics is not None
+    assert y.metrics.num_reconnects == 1
+    # Only functions that have a value get resynced
+    assert y.get_raw_connection().num_commands_sent < num_gets_initialize
+    disconnect_callback.assert_not_called()
+
+    y.close()
+
+
+def test_reconnect_gives_up(
+    connection: YncaConnectionMock,
+) -> None:
+    with (
+        mock.patch.object(
+            ynca.api.YncaConnection, "create_from_serial_url"
+        ) as create_from_serial_url,
+        mock.patch.object(ynca.initializer.YncaProtocol, "COMMAND_SPACING", 0),
+    ):
+        create_from_serial_url.return_value = connection
+        connection.get_response_list = INITIALIZE_MINIMAL_RESPONSES
+
+        disconnect_callback = mock.MagicMock()
+
+        y = ynca.YncaApi(
+            "serial_url",
+            disconnect_callback,
+            reconnect=ynca.Reconnect(initial_delay=0, max_attempts=2),
+        )
+        y.initialize()
+
+        # Connecting fails on the first attempt, resync does not get responses on the second attempt
+        connection.connect.side_effect = [YncaConnectionError, None]
+        on_disconnect = connection.connect.call_args.args[0]
+        on_disconnect()
+        # Ignored while reconnecting
+        on_disconnect()
+
+        assert y._reconnect_thread is not None  # noqa: SLF001
+        y._reconnect_thread.join()  # noqa: SLF001
+
+        assert connection.connect.call_count == 3
+        connection.close.assert_called_once()
+        disconnect_callback.assert_called_once()
+
+        y.close()
+
+
+def test_reconnect_closed(
+    connection: YncaConnectionMock,
+) -> None:
+    with mock.patch.object(
+        ynca.api.YncaConnection, "create_from_serial_url"
+    ) as create_from_serial_url:
+        create_from_serial_url.return_value = connection
+        connection.get_response_list = INITIALIZE_MINIMAL_RESPONSES
+
+        disconnect_callback = mock.MagicMock()
+
+        y = ynca.YncaApi(
+            "serial_url",
+            disconnect_callback,
+            reconnect=ynca.Reconnect(initial_delay=10),
+        )
+        y.initialize()
+
+        connection.connect.call_args.args[0]()
+        y.close()
+
+        assert y._reconnect_thread is not None  # noqa: SLF001
+        y._reconnect_thread.join()  # noqa: SLF001
+
+        connection.connect.assert_called_once()
+        disconnect_callback.assert_not_called()
+
+
+def test_reconnect_lazy(server: YncaServer) -> None:
+    y = ynca.YncaApi(
+        f"socket://127.0.0.1:{server.server_address[1]}",
+        reconnect=ynca.Reconnect(initial_delay=0.01),
+    )
+    y.initialize(lazy=True)
+    assert y.spotify is not None
+
+    y.get_raw_connection()._serial._socket.shutdown(socket.SHUT_RDWR)  # type: ignore[union-attr]  # noqa: SLF001
+    for _ in range(100):
+        if y._reconnect_thread is not None:  # noqa: SLF001
+            break
+        time.sleep(0.01)
+    assert y._reconnect_thread is not None  # noqa: SLF001
+    y._reconnect_thread.join()  # noqa: SLF001
+
+    # Unused lazy subunits are not resynced, they still get initialized when used
+    assert y.spotify._initialized is False  # noqa: SLF001
+    spotify_initialized = threading.Event()
+    y.spotify.register_update_callback(lambda *_: spotify_initialized.set())
+    assert y.spotify.playbackinfo is None
+    assert spotify_initialized.wait(5)
+    y.close()
+
+
+def test_initialize_lazy(server: YncaServer) -> None:
+    server.store.add_data(MAIN, "INP", "USB")
+
+    y = ynca.YncaApi(f"socket://127.0.0.1:{server.server_address[1]}")
+    y.initialize(lazy=True)
+    assert y.main is not None
+    assert y.main.inp is ynca.Input.USB
+    assert y.spotify is not None
+    assert y.usb is not None
+    assert y.tun is not None
+
+    # Subunit of the selected input gets initialized in the background
+    for _ in range(500):
+        if y.usb._initialized:  # noqa: SLF001
+            break
+        time.sleep(0.01)
+    assert y.usb._initialized  # noqa: SLF001
+    assert y.spotify._initialized is False  # noqa: SLF001
+
+    # Other subunits when used
+    spotify_initialized = threading.Event()
+    y.spotify.register_update_callback(lambda *_: spotify_initialized.set())
+    assert y.spotify.playbackinfo is None
+    assert spotify_initialized.wait(5)
+    assert y.spotify.playbackinfo is not None
+
+    # Or when their input gets selected
+    tun_initialized = threading.Event()
+    y.tun.register_update_callback(lambda *_: tun_initialized.set())
+    y.main.inp = ynca.Input.TUNER
+    assert tun_initialized.wait(5)
+
+    # Closing stops the lazy initialization thread
+    thread = y._lazy_initialization_thread  # noqa: SLF001
+    assert thread is not None
+    y.close()
+    assert not thread.is_alive()
+
+
+def test_close_from_lazy_initialization(server: YncaServer) -> None:
+    y = ynca.YncaApi(f"socket://127.0.0.1:{server.server_address[1]}")
+    y.initialize(lazy=True)
+    assert y.spotify is not None
+
+    # Update callbacks of lazy subunits are called on the lazy initialization thread
+    closed = threading.Event()
+
+    def close(*_: object) -> None:
+        y.close()
+        closed.set()
+
+    y.spotify.register_update_callback(close)
+    assert y.spotify.playbackinfo is None
+    assert closed.wait(5)
+
+
+def test_initialize_include_exclude(server: YncaServer) -> None:
+    y = ynca.YncaApi(f"socket://127.0.0.1:{server.server_address[1]}")
+    y.initialize(include=[MAIN, USB], exclude=["ZONENAME"])
+
+    assert y.sys is not None
+    assert y.sys.modelname == "RX-V475"
+    assert y.usb is not None
+    assert y.spotify is None
+    assert y.main is not None
+    assert y.main.vol is not None
+    assert y.main.zonename is None
+
+    # Excluded functions can be requested when needed
+    zonename_received = threading.Event()
+    y.main.register_update_callback(lambda *_: zonename_received.set())
+    y.main.refresh("ZONENAME")
+    assert zonename_received.wait(5)
+    assert y.main.zonename is not None
+
+    y.close()
+
+    # Function names for all subunits do not apply to SYS
+    y = ynca.YncaApi(f"socket://127.0.0.1:{server.server_address[1]}")
+    y.initialize(include=["VOL"])
+    assert y.sys is not None
+    assert y.sys.modelname == "RX-V475"
+    assert y.main is not None
+    assert y.main.vol is not None
+    assert y.main.zonename is None
+    y.close()
+
+    # Typos would otherwise exclude everything
+    y = ynca.YncaApi(f"socket://127.0.0.1:{server.server_address[1]}")
+    with pytest.raises(ValueError, match="Spotify"):
+        y.initialize(include=["Spotify"])
@@ -0,0 +1,259 @@
+import asyncio
+from collections.abc import Generator
+from pathlib import Path
+import threading
+from typing import Any
+from unittest import mock
+
+from mock_serial import MockSerial  # type: ignore[import]
+import pytest
+
+from ynca import (
+    AsyncYncaApi,
+    CommandPacing,
+    Input,
+    KeepAlive,
+    Main,
+    Reconnect,
+    System,
+)
+from ynca.debug_server import YncaServer
+from ynca.errors import (
+    YncaConnectionError,
+    YncaException,
+    YncaInitializationFailedException,
+)
+from ynca.initializer import InitializationPlan
+from ynca.modelinfo import MODELINFO, ModelInfo
+from ynca.protocol import YncaProtocol
+
+
+@pytest.fixture
+def server() -> Generator[YncaServer, None, None]:
+    server = YncaServer(("127.0.0.1", 0), "logs/RX-V475.txt")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    with mock.patch.object(YncaProtocol, "COMMAND_SPACING", 0.01):
+        yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def serial_url(server: YncaServer) -> str:
+    return f"socket://127.0.0.1:{server.server_address[1]}"
+
+
+def test_initialize(serial_url: str, tmp_path: Path) -> None:
+    filename = tmp_path / "communication_log.jsonl"
+
+    async def run() -> None:
+        api = AsyncYncaApi(serial_url, communication_log_size=10)
+        with pytest.raises(YncaException):
+            api.get_raw_connection()
+        assert api.metrics is None
+
+        await api.initialize()
+        assert api.metrics is not None
+        assert api.metrics.num_connects == 1
+        with pytest.raises(YncaInitializationFailedException):
+            await api.initialize()
+
+        assert isinstance(api.sys, System)
+        assert isinstance(api.main, Main)
+        assert api.main.vol == -60
+
+        # Subunits use the same descriptors, changes are queued without blocking
+        update_callback = mock.MagicMock()
+        api.main.register_update_callback(update_callback)
+        api.main.vol = -30
+        connection = api.get_raw_connection()
+        assert await connection.get_value("MAIN", "VOL") == "-30.0"
+        update_callback.assert_called_with("VOL", -30)
+
+        api.send_raw("@MAIN:VOL=?")
+        assert len(api.get_communication_log_items()) == 10
+        api.save_communication_log(filename)
+        assert len(filename.read_text().splitlines()) == 10
+
+        api.close()
+        assert api.main is None
+        assert api.get_communication_log_items() == []
+        with pytest.raises(YncaException):
+            api.save_communication_log(filename)
+        # Safe to call when closed
+        api.close()
+        api.send_raw("@MAIN:VOL=?")
+
+    asyncio.run(run())
+
+
+def test_initialize_model_pacing(serial_url: str) -> None:
+    async def run() -> None:
+        keep_alive = KeepAlive(wake_up_probes=0)
+        api = AsyncYncaApi(serial_url, keep_alive=keep_alive)
+        await api.initialize()
+        assert api.get_raw_connection().get_pacing_stats().adaptive
+        keep_alive_handler = api.get_raw_connection()._keep_alive  # noqa: SLF001
+        assert keep_alive_handler.keep_alive is keep_alive
+        api.close()
+
+    modelinfo = ModelInfo(soundprg=[], pacing=CommandPacing())
+    with mock.patch.dict(MODELINFO, {"RX-V475": modelinfo}):
+        asyncio.run(run())
+
+
+def test_initialize_fails(mock_serial: MockSerial) -> None:
+    mock_serial.stub(
+        receive_bytes=b"@SYS:MODELNAME=?\r\n",
+        send_bytes=b"@SYS:MODELNAME=TESTMODEL\r\n",
+    )
+
+    async def run() -> None:
+        api = AsyncYncaApi(mock_serial.port)
+        with pytest.raises(YncaInitializationFailedException):
+            await api.initialize()
+
+    with mock.patch.object(YncaProtocol, "COMMAND_SPACING", 0.01):
+        asyncio.run(run())
+
+
+def test_reconnect_and_resync(server: YncaServer, serial_url: str) -> None:
+    async def run() -> None:
+        disconnect_callback = mock.MagicMock()
+        api = AsyncYncaApi(
+            serial_url, disconnect_callback, reconnect=Reconnect(initial_delay=0.01)
+        )
+        await api.initialize()
+        main = api.main
+        assert main is not None
+        connection = api.get_raw_connection()
+
+        update_callback = mock.MagicMock()
+        main.register_update_callback(update_callback)
+
+        # Volume changes while the connection is down
+        server.store.add_data("MAIN", "VOL", "-40.0")
+        assert connection._transport is not None  # noqa: SLF001
+        connection._transport.abort()  # noqa: SLF001
+        await asyncio.sleep(0)
+
+        assert api._reconnect_task is not None  # noqa: SLF001
+        await api._reconnect_task  # noqa: SLF001
+
+        # Same subunits, only the changed value is reported
+        assert api.main is main
+        assert main.vol == -40
+        update_callback.assert_called_once_with("VOL", -40)
+        assert api.metrics is not None
+        assert api.metrics.num_reconnects == 1
+        disconnect_callback.assert_not_called()
+
+        api.close()
+
+    asyncio.run(run())
+
+
+def test_reconnect_gives_up(serial_url: str) -> None:
+    async def run() -> None:
+        disconnect_callback = mock.MagicMock()
+        api = AsyncYncaApi(
+            serial_url,
+            disconnect_callback,
+            reconnect=Reconnect(initial_delay=0, max_attempts=2),
+        )
+        await api.initialize()
+        connection = api.get_raw_connection()
+
+        # Connecting fails on the first attempt, resync fails on the second attempt
+        connect = connection.connect
+        attempts = 0
+
+        async def connect_fails_once(*args: Any) -> None:
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                raise YncaConnectionError
+            await connect(*args)
+
+        with (
+            mock.patch.object(connection, "connect", side_effect=connect_fails_once),
+            mock.patch.object(
+                InitializationPlan,
+                "async_execute",
+                side_effect=YncaInitializationFailedException,
+            ),
+        ):
+            assert connection._transport is not None  # noqa: SLF001
+            connection._transport.abort()  # noqa: SLF001
+            await asyncio.sleep(0)
+            # Ignored while reconnecting
+            api._on_disconnect()  # noqa: SLF001
+
+            assert api._reconnect_task is not None  # noqa: SLF001
+            await api._reconnect_task  # noqa: SLF001
+
+        disconnect_callback.assert_called_once()
+        assert not connection.connected
+
+        api.close()
+        assert api._reconnect_task is None  # noqa: SLF001
+
+    asyncio.run(run())
+
+
+def test_initialize_lazy(server: YncaServer, serial_url: str) -> None:
+    server.store.add_data("MAIN", "INP", "USB")
+
+    async def run() -> None:
+        api = AsyncYncaApi(serial_url)
+        await api.initialize(lazy=True)
+        assert api.main is not None
+        assert api.spotify is not None
+        assert api.usb is not None
+
+        # Subunit of the selected input gets initialized in the background
+        assert api._lazy_initialization_task is not None  # noqa: SLF001
+        await api._lazy_initialization_task  # noqa: SLF001
+        assert api.usb._initialized  # noqa: SLF001
+        assert not api.spotify._initialized  # noqa: SLF001
+
+        # Other subunits when used
+        assert api.spotify.playbackinfo is None
+        await api._lazy_initialization_task  # noqa: SLF001
+        assert api.spotify.playbackinfo is not None
+
+        api.main.inp = Input.TUNER
+        await asyncio.sleep(0.5)
+        assert api.tun is not None
+        assert api.tun._initialized  # noqa: SLF001
+
+        # Values can also be read from other threads
+        netradio = api.netradio
+        assert netradio is not None
+        thread = threading.Thread(target=lambda: netradio.avail)
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0.5)
+        assert netradio._initialized  # noqa: SLF001
+
+        api.close()
+        assert api._lazy_initialization_task is None  # noqa: SLF001
+
+    asyncio.run(run())
+
+
+def test_initialize_include(serial_url: str) -> None:
+    async def run() -> None:
+        api = AsyncYncaApi(serial_url)
+        await api.initialize(include=["MAIN"])
+        assert api.sys is not None
+        assert api.main is not None
+        assert api.usb is None
+        api.close()
+
+        api = AsyncYncaApi(serial_url)
+        with pytest.raises(ValueError, match="Spotify"):
+            await api.initialize(include=["Spotify"])
+
+    asyncio.run(run())
@@ -0,0 +1,331 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from pathlib import Path
+import threading
+from typing import Any
+from unittest import mock
+
+from mock_serial import MockSerial  # type: ignore[import]
+import pytest
+import serial
+
+from ynca.async_connection import AsyncYncaConnection
+from ynca.connection import YncaProtocolStatus
+from ynca.errors import YncaConnectionError, YncaRequestFailed, YncaRequestTimeout
+from ynca.protocol import CommandPacing, CommandPriority, KeepAlive, YncaProtocol
+
+SHORT_DELAY = 0.5
+
+
+@asynccontextmanager
+async def active_connection(
+    serial_mock: MockSerial, **connect_kwargs: Any
+) -> AsyncGenerator[AsyncYncaConnection, None]:
+    serial_mock.stub(
+        receive_bytes=b"@SYS:MODELNAME=?\r\n",
+        send_bytes=b"@SYS:MODELNAME=TESTMODEL\r\n",
+    )  # Keep alive
+
+    connection = AsyncYncaConnection.create_from_serial_url(serial_mock.port)
+    await connection.connect(**connect_kwargs)
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
+def test_connect_serial(mock_serial: MockSerial, tmp_path: Path) -> None:
+    filename = tmp_path / "communication_log.jsonl"
+
+    keep_alive = mock_serial.stub(
+        receive_bytes=b"@SYS:MODELNAME=?\r\n",
+        send_bytes=b"@SYS:MODELNAME=TESTMODEL\r\n",
+    )
+
+    async def run() -> None:
+        num_threads = threading.active_count()
+        connection = AsyncYncaConnection(mock_serial.port)
+        assert not connection.connected
+        await connection.connect(communication_log_size=10)
+        assert connection.connected
+
+        # No extra threads needed
+        assert threading.active_count() == num_threads
+
+        await asyncio.sleep(SHORT_DELAY)
+        connection.close()
+        assert not connection.connected
+        assert connection.num_commands_sent == 0
+
+        # Receiver responded to the wake-up probe, so that is the only keep-alive
+        assert keep_alive.calls == 1
+        assert len(connection.get_communication_log_items()) == 2
+        connection.save_communication_log(filename)
+        assert len(filename.read_text().splitlines()) == 2
+
+        # Safe to close multiple times and send when closed
+        connection.close()
+        connection.put("MAIN", "VOL", "Up")
+        connection.raw("RAW")
+
+    asyncio.run(run())
+
+
+def test_call_later(mock_serial: MockSerial) -> None:
+    async def run() -> None:
+        async with active_connection(mock_serial) as connection:
+            called = asyncio.Event()
+            connection.call_later(0.01, called.set)
+            await asyncio.wait_for(called.wait(), 1)
+
+    asyncio.run(run())
+
+
+def test_connect_invalid_port() -> None:
+    async def run(serial_url: str) -> None:
+        connection = AsyncYncaConnection(serial_url)
+        await connection.connect()
+
+    with pytest.raises(YncaConnectionError):
+        asyncio.run(run("invalid"))
+
+    with pytest.raises(YncaConnectionError):
+        asyncio.run(run("socket://no_port"))
+
+    # Serial URLs without file descriptor can not be watched by the event loop
+    with pytest.raises(YncaConnectionError):
+        asyncio.run(run("loop://"))
+
+    no_fileno = mock.MagicMock(spec=["close"])
+    with (
+        mock.patch.object(serial, "serial_for_url", return_value=no_fileno),
+        pytest.raises(YncaConnectionError),
+    ):
+        asyncio.run(run("custom://"))
+    no_fileno.close.assert_called_once()
+
+
+def test_message_callbacks_and_spacing(mock_serial: MockSerial) -> None:
+    async def run() -> None:
+        async with active_connection(mock_serial) as connection:
+            mock_serial.stub(
+                receive_bytes=b"@MAIN:VOL=-20.0\r\n",
+                send_bytes=b"@MAIN:VOL=-20.0\r\n",
+            )
+            mock_serial.stub(
+                receive_bytes=b"@MAIN:MUTE=?\r\n",
+                send_bytes=b"@MAIN:MUTE=Off\r\n",
+            )
+            raw = mock_serial.stub(receive_bytes=b"RAW\r\n", send_bytes=b"")
+
+            received = asyncio.Event()
+
+            def message_received(*_args: Any) -> None:
+                if message_callback.call_count == 2:
+                    received.set()
+
+            message_callback = mock.MagicMock(side_effect=message_received)
+            connection.register_message_callback(message_callback, "MAIN")
+
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            connection.put("MAIN", "VOL", "-20.0")
+            connection.get("MAIN", "MUTE")
+            connection.raw("RAW")
+            assert connection.num_commands_sent == 3
+
+            await asyncio.wait_for(received.wait(), 1)
+
+            # Queued behind the 2 keep alives sent on connect
+            assert loop.time() - start >= 3 * YncaProtocol.COMMAND_SPACING
+            assert message_callback.call_args_list == [
+                mock.call(YncaProtocolStatus.OK, "MAIN", "VOL", "-20.0"),
+                mock.call(YncaProtocolStatus.OK, "MAIN", "MUTE", "Off"),
+            ]
+
+            await asyncio.sleep(SHORT_DELAY)
+            assert raw.calls == 1
+            assert sum(connection.get_send_queue_depths().values()) == 0
+
+    asyncio.run(run())
+
+
+def test_get_value(mock_serial: MockSerial) -> None:
+    async def run() -> None:
+        async with active_connection(mock_serial) as connection:
+            get_data = mock_serial.stub(
+                receive_bytes=b"@MAIN:VOL=?\r\n",
+                send_bytes=b"@MAIN:VOL=-20.0\r\n",
+            )
+            mock_serial.stub(
+                receive_bytes=b"@MAIN:UNKNOWN=?\r\n",
+                send_bytes=b"@UNDEFINED\r\n",
+            )
+            mock_serial.stub(receive_bytes=b"@MAIN:MUTE=?\r\n", send_bytes=b"")
+
+            # Concurrent requests share a single GET
+            results = await asyncio.gather(
+                *[connection.get_value("MAIN", "VOL") for _ in range(3)]
+            )
+            assert results == ["-20.0", "-20.0", "-20.0"]
+            assert get_data.calls == 1
+
+            with pytest.raises(YncaRequestFailed, match="UNDEFINED"):
+                await connection.get_value("MAIN", "UNKNOWN")
+
+            with pytest.raises(YncaRequestTimeout):
+                await connection.get_value(
+                    "MAIN", "MUTE", timeout=0.3, priority=CommandPriority.REFRESH
+                )
+
+            snapshot = connection.metrics.snapshot()
+            assert snapshot["connects"] == 1
+            assert snapshot["received"] == {"OK": 2, "UNDEFINED": 1}
+            assert snapshot["response_time_per_command"]["MAIN:VOL"]["count"] == 1
+            assert snapshot["queue_wait"]["count"] == snapshot["commands_written"]
+            assert "INTERACTIVE" in snapshot["queue_depth"]
+
+    asyncio.run(run())
+
+
+def test_get_value_not_resolved_by_put_error(mock_serial: MockSerial) -> None:
+    async def run() -> None:
+        async with active_connection(mock_serial) as connection:
+            mock_serial.stub(receive_bytes=b"@MAIN:VOL=?\r\n", send_bytes=b"")
+            put_data = mock_serial.stub(
+                receive_bytes=b"@MAIN:VOL=-300.0\r\n", send_bytes=b"@UNDEFINED\r\n"
+            )
+
+            get_value = asyncio.ensure_future(
+                connection.get_value("MAIN", "VOL", timeout=0.5)
+            )
+            await asyncio.sleep(0)
+            # The error response is for the PUT, the GET is still waiting for its response
+            connection.put("MAIN", "VOL", "-300.0")
+
+            with pytest.raises(YncaRequestTimeout):
+                await get_value
+            assert put_data.calls == 1
+
+    asyncio.run(run())
+
+
+def test_keep_alive_miss(mock_serial: MockSerial) -> None:
+    async def run() -> None:
+        mock_serial.stub(receive_bytes=b"@SYS:MODELNAME=?\r\n", send_bytes=b"")
+        connection = AsyncYncaConnection.create_from_serial_url(mock_serial.port)
+        await connection.connect(keep_alive=KeepAlive(probe_timeout=0.1))
+        connection.put("MAIN", "VOL", "Up")
+        await asyncio.sleep(SHORT_DELAY)
+        connection.close()
+
+        # Second probe is sent while nothing was received for the first,
+        # then the command is sent anyway
+        assert connection.metrics.num_keepalive_misses == 1
+        assert connection.metrics.num_commands_written == 3
+
+    asyncio.run(run())
+
+
+def test_pacing(mock_serial: MockSerial) -> None:
+    async def run() -> None:
+        async with active_connection(
+            mock_serial, pacing=CommandPacing(min_spacing=0.01)
+        ) as connection:
+            mock_serial.stub(
+                receive_bytes=b"@MAIN:VOL=?\r\n",
+                send_bytes=b"@MAIN:VOL=-20.0\r\n",
+            )
+            assert await connection.get_value("MAIN", "VOL") == "-20.0"
+            await asyncio.sleep(SHORT_DELAY)
+
+            stats = connection.get_pacing_stats()
+            assert stats.adaptive
+            assert stats.response_time is not None
+            assert stats.spacing < YncaProtocol.COMMAND_SPACING
+            assert stats.command_rate is not None
+            assert stats.num_missing_responses == 0
+
+            connection.set_pacing(None)
+            assert not connection.get_pacing_stats().adaptive
+
+    asyncio.run(run())
+
+
+def test_keep_alive(mock_serial: MockSerial) -> None:
+    async def run() -> None:
+        async with active_connection(
+            mock_serial, communication_log_size=100
+        ) as connection:
+            message_callback = mock.MagicMock()
+            connection.register_message_callback(message_callback)
+
+            await asyncio.sleep(0.8)
+            assert len(connection.get_communication_log_items()) == 4
+
+            # Keep alives do not generate message callbacks
+            assert message_callback.call_count == 0
+
+    with mock.patch.object(YncaProtocol, "KEEP_ALIVE_INTERVAL", 0.5):
+        asyncio.run(run())
+
+
+def test_serial_read_error(mock_serial: MockSerial) -> None:
+    disconnect_callback = mock.MagicMock()
+
+    async def run() -> None:
+        async with active_connection(
+            mock_serial, disconnect_callback=disconnect_callback
+        ) as connection:
+            with mock.patch.object(
+                connection._serial,  # noqa: SLF001
+                "read",
+                side_effect=serial.SerialException("Simulated disconnect"),
+            ):
+                connection._serial_readable()  # noqa: SLF001
+            assert not connection.connected
+
+    asyncio.run(run())
+    disconnect_callback.assert_called_once()
+
+
+def test_socket_connection() -> None:
+    disconnect_callback = mock.MagicMock()
+
+    async def handle_client(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        while line := await reader.readline():
+            if line == b"@SYS:MODELNAME=?\r\n":
+                writer.write(b"@SYS:MODELNAME=TESTMODEL\r\n")
+            elif line == b"@MAIN:VOL=?\r\n":
+                writer.write(b"@MAIN:VOL=-20.0\r\n")
+            elif line == b"QUIT\r\n":
+                break
+        writer.close()
+
+    async def run() -> None:
+        server = await asyncio.start_server(handle_client, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        connection = AsyncYncaConnection(f"socket://127.0.0.1:{port}")
+        await connection.connect(disconnect_callback)
+        assert await connection.get_value("MAIN", "VOL") == "-20.0"
+        connection.close()
+        assert not connection.connected
+
+        # Server closes the connection
+        disconnected = asyncio.Event()
+        disconnect_callback.side_effect = disconnected.set
+        connection = AsyncYncaConnection(f"socket://127.0.0.1:{port}")
+        await connection.connect(disconnect_callback)
+        connection.raw("QUIT")
+        await asyncio.wait_for(disconnected.wait(), 1)
+        assert not connection.connected
+
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(run())
+    disconnect_callback.assert_called_once()
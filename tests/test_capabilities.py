@@ -0,0 +1,107 @@
+from pathlib import Path
+from unittest import mock
+
+from tests.mock_yncaconnection import YncaConnectionMock
+from ynca.capabilities import YncaCapabilityCache, collect_errors
+from ynca.connection import YncaProtocolStatus
+
+MODELNAME = "RX-V473"
+
+
+def test_update_and_is_unsupported() -> None:
+    cache = YncaCapabilityCache()
+    assert not cache.is_unsupported(MODELNAME, "MAIN", "HDMIOUT")
+
+    cache.update(
+        MODELNAME,
+        [("MAIN", "HDMIOUT"), ("MAIN", "BASIC"), ("ZONE2", "AVAIL")],
+        {
+            ("MAIN", "HDMIOUT"): YncaProtocolStatus.UNDEFINED,
+            ("ZONE2", "AVAIL"): YncaProtocolStatus.RESTRICTED,
+        },
+    )
+    assert cache.is_unsupported(MODELNAME, "MAIN", "HDMIOUT")
+    assert not cache.is_unsupported(MODELNAME, "MAIN", "BASIC")
+    assert not cache.is_unsupported("OtherModel", "MAIN", "HDMIOUT")
+
+    # Restricted depends on the state of the device, so probed again
+    assert not cache.is_unsupported(MODELNAME, "ZONE2", "AVAIL")
+    cache.update(
+        MODELNAME,
+        [("MAIN", "HDMIOUT")],
+        {("MAIN", "HDMIOUT"): YncaProtocolStatus.RESTRICTED},
+    )
+    assert not cache.is_unsupported(MODELNAME, "MAIN", "HDMIOUT")
+    cache.update(
+        MODELNAME,
+        [("MAIN", "HDMIOUT")],
+        {("MAIN", "HDMIOUT"): YncaProtocolStatus.UNDEFINED},
+    )
+    assert not cache.is_unsupported("OtherModel", "MAIN", "HDMIOUT")
+
+    # Successful probe removes the entry
+    cache.update(MODELNAME, [("MAIN", "HDMIOUT")], {})
+    assert not cache.is_unsupported(MODELNAME, "MAIN", "HDMIOUT")
+
+
+def test_revalidate_after() -> None:
+    cache = YncaCapabilityCache(revalidate_after=60)
+    with mock.patch("ynca.capabilities.time.time", return_value=1000):
+        cache.update(
+            MODELNAME,
+            [("MAIN", "HDMIOUT")],
+            {("MAIN", "HDMIOUT"): YncaProtocolStatus.UNDEFINED},
+        )
+    with mock.patch("ynca.capabilities.time.time", return_value=1059):
+        assert cache.is_unsupported(MODELNAME, "MAIN", "HDMIOUT")
+    with mock.patch("ynca.capabilities.time.time", return_value=1060):
+        assert not cache.is_unsupported(MODELNAME, "MAIN", "HDMIOUT")
+
+
+def test_save_and_load(tmp_path: Path) -> None:
+    filename = tmp_path / "capabilities.json"
+
+    cache = YncaCapabilityCache(filename)
+    cache.update(
+        MODELNAME,
+        [("MAIN", "HDMIOUT")],
+        {("MAIN", "HDMIOUT"): YncaProtocolStatus.UNDEFINED},
+    )
+    cache.save()
+
+    cache = YncaCapabilityCache(filename)
+    assert cache.is_unsupported(MODELNAME, "MAIN", "HDMIOUT")
+
+    # Restricted entries of older caches are ignored
+    filename.write_text(
+        '{"RX-V473": {"ZONE2:AVAIL": ["RESTRICTED", 1000.0]}}', encoding="utf-8"
+    )
+    cache = YncaCapabilityCache(filename)
+    assert not cache.is_unsupported(MODELNAME, "ZONE2", "AVAIL")
+
+
+def test_save_without_filename() -> None:
+    # Should not fail
+    YncaCapabilityCache().save()
+
+
+def test_load_invalid_file(tmp_path: Path) -> None:
+    filename = tmp_path / "capabilities.json"
+    filename.write_text("not json")
+
+    cache = YncaCapabilityCache(filename)
+    assert not cache.is_unsupported(MODELNAME, "MAIN", "HDMIOUT")
+
+
+def test_collect_errors(connection: YncaConnectionMock) -> None:
+    with collect_errors(connection) as errors:
+        connection.send_protocol_message("MAIN", "VOL", "-20")
+        connection.send_protocol_error("@UNDEFINED", "MAIN", "HDMIOUT")
+        connection.send_protocol_error("@RESTRICTED", "ZONE2", "AVAIL")
+        connection.send_protocol_error("@RESTRICTED")
+
+    assert errors == {
+        ("MAIN", "HDMIOUT"): YncaProtocolStatus.UNDEFINED,
+        ("ZONE2", "AVAIL"): YncaProtocolStatus.RESTRICTED,
+    }
+    connection.unregister_message_callback.assert_called_once()
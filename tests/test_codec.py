@@ -0,0 +1,49 @@
+import sys
+
+import pytest
+
+from ynca.codec import parse_line, parse_line_bytes
+
+
+@pytest.mark.parametrize(
+    ("line", "expected"),
+    [
+        ("@MAIN:VOL=-30.5", ("MAIN", "VOL", "-30.5")),
+        ("@MAIN:VOL=?", ("MAIN", "VOL", "?")),
+        ("@MAIN:ZONENAME=", ("MAIN", "ZONENAME", "")),
+        ("@NETRADIO:SONG=Title: with=chars", ("NETRADIO", "SONG", "Title: with=chars")),
+        ("@SYS:A:B=1", ("SYS", "A:B", "1")),
+        ("@UNDEFINED", None),
+        ("@RESTRICTED", None),
+        ("MAIN:VOL=1", None),
+        ("@MAINVOL=1", None),
+        ("@:VOL=1", None),
+        ("@MAIN:=1", None),
+        ("", None),
+    ],
+)
+def test_parse_line(line: str, expected: tuple[str, str, str] | None) -> None:
+    assert parse_line(line) == expected
+    assert parse_line_bytes(line.encode()) == expected
+
+
+def test_parse_line_interns_names() -> None:
+    # Build the names at runtime, so they are not interned constants already
+    line = f"@{'main'.upper()}:{'vol'.upper()}=1"
+    parsed = parse_line(line)
+    assert parsed is not None
+    assert parsed[0] is sys.intern("MAIN")
+    assert parsed[1] is sys.intern("VOL")
+
+
+def test_parse_line_bytes_invalid_encoding() -> None:
+    assert parse_line_bytes(b"@MAIN:ZONENAME=Room \xff") == (
+        "MAIN",
+        "ZONENAME",
+        "Room �",
+    )
+    assert parse_line_bytes(b"@MAIN:ZONENAME=Room \xe9", "latin-1") == (
+        "MAIN",
+        "ZONENAME",
+        "Room \xe9",
+    )
@@ -1,15 +1,35 @@
 from collections.abc import Generator
 from contextlib import contextmanager
+import json
+from pathlib import Path
+import queue
 import threading
 import time
+from typing import Any
 from unittest import mock
 
 from mock_serial import MockSerial  # type: ignore[import]
 import pytest
 import serial
 
-from ynca.connection import YncaConnection, YncaProtocolStatus
-from ynca.errors import YncaConnectionError, YncaConnectionFailed
+from ynca.connection import RelativeCommandMode, YncaConnection, YncaProtocolStatus
+from ynca.errors import (
+    YncaConnectionError,
+    YncaConnectionFailed,
+    YncaRequestFailed,
+    YncaRequestTimeout,
+)
+from ynca.metrics import YncaMetrics
+from ynca.protocol import (
+    CommandPacing,
+    CommandPriority,
+    KeepAlive,
+    YncaProtocol,
+    _KeepAliveMonitor,
+    _Pacer,
+    _SendQueue,
+    _SyncTracker,
+)
 
 SHORT_DELAY = 0.5
 
@@ -19,6 +39,7 @@ def active_connection(
     serial_mock: MockSerial,
     delay_after_close: float = SHORT_DELAY,
     communication_log_size: int = 0,
+    **connect_kwargs: Any,
 ) -> Generator[YncaConnection, None, None]:
     serial_mock.stub(
         receive_bytes=b"@SYS:MODELNAME=?\r\n",
@@ -27,7 +48,9 @@ def active_connection(
 
     try:
         connection = YncaConnection.create_from_serial_url(serial_mock.port)
-        connection.connect(communication_log_size=communication_log_size)
+        connection.connect(
+            communication_log_size=communication_log_size, **connect_kwargs
+        )
         yield connection
     finally:
         # Need to make sure messages actually got sent by the thread
@@ -63,8 +86,79 @@ def test_connect(mock_serial: MockSerial) -> None:
     assert not connection.connected
     assert connection.num_commands_sent == 0
 
-    # Double keep alive test intended because device can eat first one
-    assert keep_alive.calls == 2
+    # Receiver responded to the wake-up probe, so that is the only keep-alive
+    assert keep_alive.calls == 1
+
+
+def test_connect_wake_up(mock_serial: MockSerial) -> None:
+    # Receiver is asleep and eats the first command
+    keep_alive = mock_serial.stub(receive_bytes=b"@SYS:MODELNAME=?\r\n", send_bytes=b"")
+
+    connection = YncaConnection(mock_serial.port)
+    connection.connect(
+        communication_log_size=10, keep_alive=KeepAlive(probe_timeout=0.2)
+    )
+    connection.get("MAIN", "VOL")
+    time.sleep(0.1)
+    keep_alive = mock_serial.stub(
+        receive_bytes=b"@SYS:MODELNAME=?\r\n",
+        send_bytes=b"@SYS:MODELNAME=TESTMODEL\r\n",
+    )
+    time.sleep(SHORT_DELAY)
+    connection.close()
+
+    # Command waits until the receiver responded to a probe
+    assert keep_alive.calls == 1
+    logitems = connection.get_communication_log_items()
+    assert [item.split(" ", 1)[1] for item in logitems] == [
+        "Send: @SYS:MODELNAME=?",
+        "Send: @SYS:MODELNAME=?",
+        "Received: @SYS:MODELNAME=TESTMODEL",
+        "Send: @MAIN:VOL=?",
+    ]
+    assert connection.metrics.num_keepalive_misses == 1
+
+
+def test_call_later() -> None:
+    called = threading.Event()
+    YncaConnection("dummy").call_later(0.01, called.set)
+    assert called.wait(1)
+
+    cancelled = mock.Mock()
+    YncaConnection("dummy").call_later(10, cancelled).cancel()
+    cancelled.assert_not_called()
+
+
+def test_dispatched_message_callbacks() -> None:
+    connection = YncaConnection("dummy")
+    inline_callback = mock.Mock()
+    dispatched_callback = mock.Mock()
+    connection.register_message_callback(inline_callback)
+    connection.register_message_callback(dispatched_callback, "MAIN", dispatch=True)
+
+    # Without dispatcher callbacks run inline
+    connection._call_registered_message_callbacks(  # noqa: SLF001
+        YncaProtocolStatus.OK, "MAIN", "PWR", "On"
+    )
+    dispatched_callback.assert_called_once_with(
+        YncaProtocolStatus.OK, "MAIN", "PWR", "On"
+    )
+
+    connection.callback_dispatcher = mock.Mock()
+    connection._call_registered_message_callbacks(  # noqa: SLF001
+        YncaProtocolStatus.OK, "MAIN", "PWR", "Standby"
+    )
+    assert inline_callback.call_count == 2
+    assert dispatched_callback.call_count == 1
+    connection.callback_dispatcher.submit.assert_called_once_with(
+        "MAIN", dispatched_callback, YncaProtocolStatus.OK, "MAIN", "PWR", "Standby"
+    )
+
+    connection.unregister_message_callback(dispatched_callback, "MAIN")
+    connection._call_registered_message_callbacks(  # noqa: SLF001
+        YncaProtocolStatus.OK, "MAIN", "PWR", "On"
+    )
+    connection.callback_dispatcher.submit.assert_called_once()
 
 
 def test_connect_invalid_port() -> None:
@@ -189,6 +283,232 @@ def test_send_get(mock_serial: MockSerial) -> None:
     assert get_data.calls == 1
 
 
+def test_coalesce_puts(mock_serial: MockSerial) -> None:
+    # Commands are queued behind the keep-alives sent on connect
+    with active_connection(
+        mock_serial, delay_after_close=1, coalesce_puts=True
+    ) as connection:
+        vol_20 = mock_serial.stub(receive_bytes=b"@MAIN:VOL=-20.0\r\n", send_bytes=b"")
+        vol_30 = mock_serial.stub(receive_bytes=b"@MAIN:VOL=-30.0\r\n", send_bytes=b"")
+        mute = mock_serial.stub(receive_bytes=b"@MAIN:MUTE=On\r\n", send_bytes=b"")
+        get = mock_serial.stub(receive_bytes=b"@MAIN:VOL=?\r\n", send_bytes=b"")
+
+        connection.put("MAIN", "VOL", "-20.0")
+        connection.put("MAIN", "MUTE", "On")
+        connection.put("MAIN", "VOL", "-30.0")
+        connection.get("MAIN", "VOL")
+        connection.get("MAIN", "VOL")
+
+        assert connection.num_commands_sent == 5
+        assert connection.num_commands_elided == 1
+
+    assert vol_20.calls == 0
+    assert vol_30.calls == 1
+    assert mute.calls == 1
+    # GETs are not coalesced
+    assert get.calls == 2
+
+
+def test_coalesce_puts_relative_preserve(mock_serial: MockSerial) -> None:
+    with active_connection(mock_serial, coalesce_puts=True) as connection:
+        up = mock_serial.stub(receive_bytes=b"@MAIN:VOL=Up\r\n", send_bytes=b"")
+        vol_20 = mock_serial.stub(receive_bytes=b"@MAIN:VOL=-20.0\r\n", send_bytes=b"")
+        vol_30 = mock_serial.stub(receive_bytes=b"@MAIN:VOL=-30.0\r\n", send_bytes=b"")
+
+        connection.put("MAIN", "VOL", "Up")
+        connection.put("MAIN", "VOL", "Up")
+        connection.put("MAIN", "VOL", "-20.0")
+        connection.put("MAIN", "VOL", "-30.0")
+
+        assert connection.num_commands_elided == 1
+
+    assert up.calls == 2
+    assert vol_20.calls == 0
+    assert vol_30.calls == 1
+
+
+def test_coalesce_puts_relative_merge(mock_serial: MockSerial) -> None:
+    with active_connection(
+        mock_serial,
+        coalesce_puts=True,
+        relative_command_mode=RelativeCommandMode.MERGE,
+    ) as connection:
+        up = mock_serial.stub(receive_bytes=b"@MAIN:VOL=Up 2 dB\r\n", send_bytes=b"")
+        down = mock_serial.stub(receive_bytes=b"@MAIN:VOL=Down\r\n", send_bytes=b"")
+        vol_30 = mock_serial.stub(receive_bytes=b"@MAIN:VOL=-30.0\r\n", send_bytes=b"")
+
+        # Opposite steps cancel out
+        connection.put("MAIN", "VOL", "Up 2 dB")
+        connection.put("MAIN", "VOL", "Down 2 dB")
+        assert connection.num_commands_elided == 2
+
+        connection.put("MAIN", "VOL", "Up 2 dB")
+        connection.put("MAIN", "VOL", "Up 2 dB")
+        assert connection.num_commands_elided == 2
+
+        # Absolute value replaces queued relative steps
+        connection.put("MAIN", "VOL", "-30.0")
+        assert connection.num_commands_elided == 4
+
+        # Relative step after absolute value can not be merged
+        connection.put("MAIN", "VOL", "Down")
+        assert connection.num_commands_elided == 4
+
+    assert up.calls == 0
+    assert vol_30.calls == 1
+    assert down.calls == 1
+
+
+def test_get_value(mock_serial: MockSerial) -> None:
+    with active_connection(mock_serial) as connection:
+        get_data = mock_serial.stub(
+            receive_bytes=b"@MAIN:VOL=?\r\n",
+            send_bytes=b"@MAIN:VOL=-20.0\r\n",
+        )
+
+        # Concurrent requests share a single GET
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(connection.get_value("MAIN", "VOL"))
+            )
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["-20.0", "-20.0", "-20.0"]
+
+    assert get_data.calls == 1
+
+
+def test_get_value_error(mock_serial: MockSerial) -> None:
+    with active_connection(mock_serial) as connection:
+        mock_serial.stub(
+            receive_bytes=b"@MAIN:UNKNOWN=?\r\n",
+            send_bytes=b"@UNDEFINED\r\n",
+        )
+
+        with pytest.raises(YncaRequestFailed, match="UNDEFINED"):
+            connection.get_value("MAIN", "UNKNOWN")
+
+
+def test_get_value_timeout(mock_serial: MockSerial) -> None:
+    with active_connection(mock_serial) as connection:
+        mock_serial.stub(receive_bytes=b"@MAIN:VOL=?\r\n", send_bytes=b"")
+
+        with pytest.raises(YncaRequestTimeout):
+            connection.get_value("MAIN", "VOL", timeout=0.3)
+
+        # A new request sends a new GET
+        with pytest.raises(YncaRequestTimeout):
+            connection.get_value("MAIN", "VOL", timeout=0.3)
+        assert connection.num_commands_sent == 2
+
+
+def test_get_value_not_resolved_by_put_error(mock_serial: MockSerial) -> None:
+    with active_connection(mock_serial) as connection:
+        get_data = mock_serial.stub(receive_bytes=b"@MAIN:VOL=?\r\n", send_bytes=b"")
+        put_data = mock_serial.stub(
+            receive_bytes=b"@MAIN:VOL=-300.0\r\n", send_bytes=b"@UNDEFINED\r\n"
+        )
+
+        errors: queue.Queue[Exception] = queue.Queue()
+
+        def get_value() -> None:
+            try:
+                connection.get_value("MAIN", "VOL", timeout=0.5)
+            except Exception as e:  # noqa: BLE001
+                errors.put(e)
+
+        thread = threading.Thread(target=get_value)
+        thread.start()
+        for _ in range(100):
+            if get_data.calls:
+                break
+            time.sleep(0.01)
+
+        # The error response is for the PUT, the GET is still waiting for its response
+        connection.put("MAIN", "VOL", "-300.0")
+        thread.join()
+
+        assert put_data.calls == 1
+        assert isinstance(errors.get_nowait(), YncaRequestTimeout)
+
+
+def test_get_value_on_reader_thread(mock_serial: MockSerial) -> None:
+    with active_connection(mock_serial) as connection:
+        mock_serial.stub(
+            receive_bytes=b"@MAIN:PWR=?\r\n", send_bytes=b"@MAIN:PWR=On\r\n"
+        )
+
+        errors: queue.Queue[Exception] = queue.Queue()
+
+        def message_callback(*_: Any) -> None:
+            try:
+                connection.get_value("MAIN", "VOL")
+            except RuntimeError as e:
+                errors.put(e)
+
+        connection.register_message_callback(message_callback, "MAIN")
+        connection.get("MAIN", "PWR")
+
+        assert "reader thread" in str(errors.get(timeout=2))
+
+
+def test_sync(mock_serial: MockSerial) -> None:
+    with active_connection(mock_serial) as connection:
+        version = mock_serial.stub(
+            receive_bytes=b"@SYS:VERSION=?\r\n",
+            send_bytes=b"@SYS:VERSION=Version\r\n",
+        )
+        message_callback = mock.MagicMock()
+        connection.register_message_callback(message_callback, "SYS")
+
+        synced = threading.Event()
+        num_responses = []
+
+        def sync_callback() -> None:
+            num_responses.append(
+                sum(
+                    1
+                    for call in message_callback.call_args_list
+                    if call.args[2] == "VERSION"
+                )
+            )
+            synced.set()
+
+        # The response to the plain GET before the sync does not call the callback
+        connection.get("SYS", "VERSION")
+        connection.sync(sync_callback)
+        assert synced.wait(2)
+        assert num_responses == [2]
+
+    assert version.calls == 2
+
+
+def test_sync_tracker() -> None:
+    tracker = _SyncTracker()
+    callback = mock.MagicMock()
+
+    tracker.written(0, None)
+    tracker.written(1, callback)
+    assert tracker.received(1.5) is None
+    assert tracker.received(2) is callback
+    assert tracker.received(3) is None
+
+    # Requests without a response are dropped after the timeout
+    tracker.written(10, None)
+    tracker.written(20, callback)
+    assert tracker.received(20.5) is callback
+
+    tracker.written(30, callback)
+    tracker.clear()
+    assert tracker.received(30.5) is None
+
+
 def test_message_callbacks(mock_serial: MockSerial) -> None:
     with active_connection(mock_serial) as connection:
         mock_serial.stub(
@@ -240,6 +560,42 @@ def test_message_callbacks(mock_serial: MockSerial) -> None:
         connection.unregister_message_callback(message_callback_1)
 
 
+def test_subunit_message_callbacks(mock_serial: MockSerial) -> None:
+    with active_connection(mock_serial) as connection:
+        mock_serial.stub(
+            receive_bytes=b"@Subunit1:Function=?\r\n",
+            send_bytes=b"@Subunit1:Function=Value1\r\n",
+        )
+        mock_serial.stub(
+            receive_bytes=b"@Subunit2:Function=?\r\n",
+            send_bytes=b"@Subunit2:Function=Value2\r\n",
+        )
+
+        subunit_callback = mock.MagicMock()
+        wildcard_callback = mock.MagicMock()
+        connection.register_message_callback(subunit_callback, "Subunit1")
+        connection.register_message_callback(wildcard_callback)
+
+        connection.get("Subunit1", "Function")
+        connection.get("Subunit2", "Function")
+        time.sleep(SHORT_DELAY)
+
+        # Subunit callbacks only get messages of their subunit
+        subunit_callback.assert_called_once_with(
+            YncaProtocolStatus.OK, "Subunit1", "Function", "Value1"
+        )
+        assert wildcard_callback.call_count == 2, wildcard_callback.call_args_list
+
+        connection.unregister_message_callback(subunit_callback, "Subunit1")
+        connection.get("Subunit1", "Function")
+        time.sleep(SHORT_DELAY)
+        assert subunit_callback.call_count == 1
+        assert wildcard_callback.call_count == 3
+
+        # Unregister for unknown subunit
+        connection.unregister_message_callback(subunit_callback, "Subunit3")
+
+
 def test_protocol_status(mock_serial: MockSerial) -> None:
     with active_connection(mock_serial) as connection:
         # Undefined response
@@ -257,29 +613,70 @@ def test_protocol_status(mock_serial: MockSerial) -> None:
         message_callback = mock.MagicMock()
         connection.register_message_callback(message_callback)
 
+        # Errors are attributed to the command that caused them
         connection.put("Subunit", "Function", "Undefined")
         time.sleep(SHORT_DELAY)
         assert message_callback.call_args == mock.call(
-            YncaProtocolStatus.UNDEFINED, mock.ANY, mock.ANY, mock.ANY
+            YncaProtocolStatus.UNDEFINED, "Subunit", "Function", None
         )
 
         connection.put("Subunit", "Function", "Restricted")
         time.sleep(SHORT_DELAY)
         assert message_callback.call_args == mock.call(
-            YncaProtocolStatus.RESTRICTED, mock.ANY, mock.ANY, mock.ANY
+            YncaProtocolStatus.RESTRICTED, "Subunit", "Function", None
+        )
+
+        # Unknown lines are passed on without any info
+        mock_serial.stub(
+            receive_bytes=b"@Subunit:Function=Garbage\r\n",
+            send_bytes=b"Garbage\r\n",
+        )
+        connection.put("Subunit", "Function", "Garbage")
+        time.sleep(SHORT_DELAY)
+        assert message_callback.call_args == mock.call(
+            YncaProtocolStatus.OK, None, None, None
         )
 
 
 def test_get_communication_log_items(mock_serial: MockSerial) -> None:
-    with active_connection(mock_serial, communication_log_size=5) as connection:
+    with active_connection(mock_serial, communication_log_size=3) as connection:
         time.sleep(SHORT_DELAY)
         logitems = connection.get_communication_log_items()
-        assert len(logitems) == 4  # Send en received keep-alive
+        assert len(logitems) == 2  # Send en received keep-alive
 
-        connection.get("Subunit", "Function")
+        connection.get("Subunit", "Function1")
+        connection.get("Subunit", "Function2")
         time.sleep(SHORT_DELAY)
         logitems = connection.get_communication_log_items()
-        assert len(logitems) == 5  # 1 dropped out due to size limit
+        assert len(logitems) == 3  # 1 dropped out due to size limit
+        assert logitems[0].endswith(" Received: @SYS:MODELNAME=TESTMODEL")
+        assert logitems[2].endswith(" Send: @Subunit:Function2=?")
+
+
+def test_save_communication_log(mock_serial: MockSerial, tmp_path: Path) -> None:
+    filename = tmp_path / "communication_log.jsonl"
+
+    connection = YncaConnection.create_from_serial_url(mock_serial.port)
+    connection.save_communication_log(filename)
+    assert filename.read_text() == ""
+
+    with active_connection(mock_serial, communication_log_size=10) as connection:
+        time.sleep(SHORT_DELAY)
+        connection.save_communication_log(filename)
+
+    items = [json.loads(line) for line in filename.read_text().splitlines()]
+    assert len(items) == 2
+    assert items[0]["direction"] == "send"
+    assert items[0]["line"] == "@SYS:MODELNAME=?"
+    assert items[1]["direction"] == "received"
+    assert items[1]["line"] == "@SYS:MODELNAME=TESTMODEL"
+    assert abs(items[0]["time"] - time.time()) < 5
+
+
+def test_communication_log_disabled(mock_serial: MockSerial) -> None:
+    with active_connection(mock_serial) as connection:
+        time.sleep(SHORT_DELAY)
+        assert connection.get_communication_log_items() == []
 
 
 def test_keep_alive(mock_serial: MockSerial) -> None:
@@ -294,11 +691,11 @@ def test_keep_alive(mock_serial: MockSerial) -> None:
 
         time.sleep(SHORT_DELAY)
         logitems = connection.get_communication_log_items()
-        assert len(logitems) == 4  # Send en received keep-alive are logged
+        assert len(logitems) == 2  # Send en received keep-alive are logged
 
         time.sleep(2)
         logitems = connection.get_communication_log_items()
-        assert len(logitems) == 6  # 1 additional keep alive pair
+        assert len(logitems) == 4  # 1 additional keep alive pair
 
         # Keep alives do not generate message callbacks
         assert message_callback.call_count == 0
@@ -310,3 +707,228 @@ def test_keep_alive(mock_serial: MockSerial) -> None:
         assert message_callback.call_args == mock.call(
             YncaProtocolStatus.OK, "SYS", "MODELNAME", "TESTMODEL"
         )
+
+
+def test_keep_alive_monitor() -> None:
+    metrics = YncaMetrics()
+    monitor = _KeepAliveMonitor(
+        KeepAlive(interval=30, wake_up_after=40, wake_up_probes=2), metrics
+    )
+    monitor.connected(100)
+    assert monitor.time_until_keep_alive(110) == 20
+
+    # Nothing received yet after connecting, so the receiver might be asleep
+    assert monitor.needs_probe(100)
+    monitor.probe_sent(100)
+    assert monitor.needs_probe(101)
+    monitor.probe_sent(101)
+    assert metrics.num_keepalive_misses == 1
+
+    # Gives up after the maximum amount of probes
+    assert not monitor.needs_probe(102)
+    monitor.line_received(102)
+    assert not monitor.pending
+    assert not monitor.needs_probe(102)
+
+    # Received messages postpone the keep-alive
+    monitor.line_received(125)
+    assert monitor.time_until_keep_alive(130) == 25
+    assert monitor.time_until_keep_alive(160) == 0
+
+    # Might be asleep after a while without receiving anything
+    assert not monitor.needs_probe(165)
+    assert monitor.needs_probe(166)
+
+    # Or when a keep-alive was not answered
+    monitor.line_received(170)
+    monitor.keep_alive_sent(171)
+    assert monitor.needs_probe(172)
+
+
+def test_send_queue_priorities() -> None:
+    send_queue = _SendQueue()
+    send_queue.put("keepalive", CommandPriority.KEEPALIVE)
+    send_queue.put("initialization", CommandPriority.INITIALIZATION)
+    send_queue.put("interactive", CommandPriority.INTERACTIVE)
+
+    assert send_queue.depths() == {
+        CommandPriority.INTERACTIVE: 1,
+        CommandPriority.REFRESH: 0,
+        CommandPriority.INITIALIZATION: 1,
+        CommandPriority.KEEPALIVE: 1,
+    }
+
+    assert send_queue.get(0) == "interactive"
+    assert send_queue.get(0) == "initialization"
+    assert send_queue.get(0) == "keepalive"
+    with pytest.raises(queue.Empty):
+        send_queue.get(0)
+
+    assert send_queue.max_depths[CommandPriority.INTERACTIVE] == 1
+
+
+def test_send_queue_no_starvation() -> None:
+    send_queue = _SendQueue()
+    send_queue.put("initialization", CommandPriority.INITIALIZATION)
+    for i in range(20):
+        send_queue.put(f"interactive{i}", CommandPriority.INTERACTIVE)
+
+    items = [send_queue.get(0) for _ in range(21)]
+    assert items.index("initialization") == _SendQueue.STARVATION_LIMIT
+
+    # Clearing drops all lanes
+    send_queue.put("interactive", CommandPriority.INTERACTIVE)
+    send_queue.clear()
+    assert sum(send_queue.depths().values()) == 0
+    assert send_queue.max_depths[CommandPriority.INTERACTIVE] == 20
+
+
+def test_send_queue_depths(mock_serial: MockSerial) -> None:
+    connection = YncaConnection(mock_serial.port)
+    assert connection.get_send_queue_depths() == {}
+    assert connection.get_send_queue_max_depths() == {}
+
+    with active_connection(mock_serial, delay_after_close=1) as connection:
+        interactive = mock_serial.stub(
+            receive_bytes=b"@MAIN:PWR=On\r\n", send_bytes=b""
+        )
+        for _ in range(3):
+            connection.get("MAIN", "VOL", CommandPriority.INITIALIZATION)
+        connection.put("MAIN", "PWR", "On")
+
+        depths = connection.get_send_queue_depths()
+        assert depths[CommandPriority.INITIALIZATION] == 3
+        assert depths[CommandPriority.INTERACTIVE] >= 1
+        assert (
+            connection.get_send_queue_max_depths()[CommandPriority.INITIALIZATION] == 3
+        )
+
+    assert interactive.calls == 1
+
+
+def test_pacer_adaptive() -> None:
+    pacer = _Pacer(CommandPacing(min_spacing=0.01, max_spacing=0.1))
+    assert pacer.spacing == 0.1
+
+    # Responses in time narrow the spacing towards the minimum
+    for i in range(50):
+        pacer.command_sent(("MAIN", "VOL"), i, is_get=True)
+        pacer.response_received(YncaProtocolStatus.OK, "MAIN", i + 0.001)
+        pacer.command_done(pacer.spacing)
+    assert pacer.spacing == pytest.approx(0.01)
+
+    # But not below the response time
+    for i in range(50):
+        pacer.command_sent(("MAIN", "VOL"), i, is_get=True)
+        pacer.response_received(YncaProtocolStatus.OK, "MAIN", i + 0.02)
+        pacer.command_done(pacer.spacing)
+    assert pacer.spacing == pytest.approx(0.02 * 1.5, abs=0.001)
+
+    # Other subunits are not the response, so missing response backs off
+    pacer.command_sent(("MAIN", "VOL"), 100, is_get=True)
+    pacer.response_received(YncaProtocolStatus.OK, "ZONE2", 100.001)
+    pacer.command_done(pacer.spacing)
+    assert pacer.spacing == pytest.approx(0.02 * 1.5 * 2, abs=0.002)
+
+    # Burst of restricted responses backs off, limited to max spacing
+    for i in range(6):
+        pacer.command_sent(("MAIN", "VOL"), 200 + i, is_get=True)
+        pacer.response_received(YncaProtocolStatus.RESTRICTED, "MAIN", 200 + i)
+        pacer.command_done(pacer.spacing)
+    assert pacer.spacing == 0.1
+
+    # PUTs do not get a response
+    pacer.command_sent(("MAIN", "VOL"), 300, is_get=False)
+    pacer.command_done(pacer.spacing)
+
+    stats = pacer.stats()
+    assert stats.adaptive
+    assert stats.spacing == 0.1
+    assert stats.num_missing_responses == 1
+    assert stats.num_backoffs == 3
+    assert stats.response_time is not None
+    assert stats.command_rate is not None
+
+
+def test_pacer_fixed() -> None:
+    pacer = _Pacer()
+    stats = pacer.stats()
+    assert not stats.adaptive
+    assert stats.response_time is None
+    assert stats.command_rate is None
+
+    pacer.command_sent(("MAIN", "VOL"), 0, is_get=True)
+    pacer.command_done(0.1)
+    with mock.patch.object(YncaProtocol, "COMMAND_SPACING", 0.2):
+        assert pacer.spacing == 0.2
+
+    stats = pacer.stats()
+    assert stats.num_missing_responses == 1
+    assert stats.num_backoffs == 0
+    assert stats.command_rate == pytest.approx(10)
+
+
+def test_pacing(mock_serial: MockSerial) -> None:
+    connection = YncaConnection(mock_serial.port)
+    assert connection.get_pacing_stats() is None
+    connection.set_pacing(CommandPacing())
+
+    with active_connection(
+        mock_serial, pacing=CommandPacing(min_spacing=0.01)
+    ) as connection:
+        mock_serial.stub(
+            receive_bytes=b"@MAIN:VOL=?\r\n",
+            send_bytes=b"@MAIN:VOL=-20.0\r\n",
+        )
+        assert connection.get_value("MAIN", "VOL") == "-20.0"
+
+        stats = connection.get_pacing_stats()
+        assert stats is not None
+        assert stats.adaptive
+        assert stats.response_time is not None
+        assert stats.spacing < YncaProtocol.COMMAND_SPACING
+
+        connection.set_pacing(None)
+        stats = connection.get_pacing_stats()
+        assert stats is not None
+        assert not stats.adaptive
+        assert stats.spacing == YncaProtocol.COMMAND_SPACING
+
+
+def test_metrics(mock_serial: MockSerial) -> None:
+    with active_connection(mock_serial) as connection:
+        mock_serial.stub(
+            receive_bytes=b"@MAIN:VOL=?\r\n",
+            send_bytes=b"@MAIN:VOL=-20.0\r\n",
+        )
+        mock_serial.stub(
+            receive_bytes=b"@MAIN:UNKNOWN=?\r\n",
+            send_bytes=b"@UNDEFINED\r\n",
+        )
+        assert connection.get_value("MAIN", "VOL") == "-20.0"
+        with pytest.raises(YncaRequestFailed):
+            connection.get_value("MAIN", "UNKNOWN")
+
+        snapshot = connection.metrics.snapshot()
+        assert snapshot["connects"] == 1
+        # Amount of keep-alives sent on connect depends on timing
+        assert snapshot["commands_written"] >= 3
+        assert snapshot["lines_received"] == snapshot["commands_written"]
+        assert snapshot["received"]["UNDEFINED"] == 1
+        assert snapshot["keepalive_misses"] == 0
+        assert snapshot["queue_wait"]["count"] == snapshot["commands_written"]
+        assert snapshot["response_time"]["count"] >= 2
+        assert snapshot["response_time_per_command"]["MAIN:VOL"]["count"] == 1
+        assert snapshot["queue_depth"]["INTERACTIVE"] == 0
+
+
+def test_metrics_keepalive_miss(mock_serial: MockSerial) -> None:
+    mock_serial.stub(receive_bytes=b"@SYS:MODELNAME=?\r\n", send_bytes=b"")
+
+    connection = YncaConnection.create_from_serial_url(mock_serial.port)
+    connection.connect(keep_alive=KeepAlive(probe_timeout=0.1))
+    time.sleep(SHORT_DELAY)
+    connection.close()
+
+    # Second probe is sent while nothing was received for the first
+    assert connection.metrics.num_keepalive_misses == 1
@@ -0,0 +1,77 @@
+import logging
+import threading
+from unittest import mock
+
+import pytest
+
+from ynca.dispatcher import CallbackDispatcher
+
+
+def test_callbacks_in_order_per_key() -> None:
+    dispatcher = CallbackDispatcher(workers=2)
+    calls: list[tuple[str, int]] = []
+    thread_ids: set[int] = set()
+
+    def callback(key: str, index: int) -> None:
+        thread_ids.add(threading.get_ident())
+        calls.append((key, index))
+
+    for index in range(100):
+        dispatcher.submit("MAIN", callback, "MAIN", index)
+        dispatcher.submit("ZONE2", callback, "ZONE2", index)
+    dispatcher.close()
+
+    for key in ("MAIN", "ZONE2"):
+        assert [index for k, index in calls if k == key] == list(range(100))
+    assert threading.get_ident() not in thread_ids
+    assert dispatcher.callback_time.count == 200
+    assert dispatcher.queue_depth == 0
+
+
+def test_slow_and_failing_callbacks(caplog: pytest.LogCaptureFixture) -> None:
+    dispatcher = CallbackDispatcher(budget=0)
+    callback = mock.Mock(side_effect=[ValueError("Oops"), None])
+
+    with caplog.at_level(logging.WARNING):
+        dispatcher.submit(None, callback, 1)
+        dispatcher.submit(None, callback, 2)
+        dispatcher.close()
+
+    assert callback.call_args_list == [mock.call(1), mock.call(2)]
+    assert "failed" in caplog.text
+    assert "budget" in caplog.text
+
+
+def test_queue_full(caplog: pytest.LogCaptureFixture) -> None:
+    dispatcher = CallbackDispatcher(max_queue_size=1, budget=None)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocking() -> None:
+        started.set()
+        release.wait()
+
+    dispatcher.submit(None, blocking)
+    assert started.wait(1)
+    callback = mock.Mock()
+    dispatcher.submit(None, callback, 1)
+    # Queue is full now
+    dispatcher.submit(None, callback, 2)
+    assert dispatcher.num_dropped == 1
+    assert "dropped" in caplog.text
+
+    release.set()
+    dispatcher.close()
+    callback.assert_called_once_with(1)
+
+
+def test_close_from_callback() -> None:
+    dispatcher = CallbackDispatcher()
+    closed = threading.Event()
+
+    def close() -> None:
+        dispatcher.close()
+        closed.set()
+
+    dispatcher.submit(None, close)
+    assert closed.wait(1)
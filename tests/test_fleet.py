@@ -0,0 +1,92 @@
+from collections.abc import Generator
+import threading
+from unittest import mock
+
+import pytest
+
+from ynca import Main, YncaFleet
+from ynca.debug_server import YncaServer
+from ynca.protocol import YncaProtocol
+
+LOGFILES = ["logs/RX-V475.txt", "logs/RX-V473.txt", "logs/R-N500.txt"]
+
+
+@pytest.fixture
+def serial_urls() -> Generator[list[str], None, None]:
+    servers = [YncaServer(("127.0.0.1", 0), logfile) for logfile in LOGFILES]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with mock.patch.object(YncaProtocol, "COMMAND_SPACING", 0.01):
+        yield [f"socket://127.0.0.1:{server.server_address[1]}" for server in servers]
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _num_client_threads() -> int:
+    # The debug server starts a thread per connection, those do not count
+    return sum(
+        "_elapsedtime_worker" not in thread.name for thread in threading.enumerate()
+    )
+
+
+def test_fleet(serial_urls: list[str]) -> None:
+    num_threads = _num_client_threads()
+    fleet = YncaFleet([*serial_urls, "socket://127.0.0.1:1"])
+
+    try:
+        _check_fleet(fleet, serial_urls, num_threads)
+    finally:
+        fleet.close()
+
+    assert fleet.stats().num_connected == 0
+    assert _num_client_threads() == num_threads
+
+    # Safe to close multiple times
+    fleet.close()
+
+
+def _check_fleet(fleet: YncaFleet, serial_urls: list[str], num_threads: int) -> None:
+    errors = fleet.initialize()
+    assert list(errors) == ["socket://127.0.0.1:1"]
+
+    # Only a single I/O thread for all receivers
+    assert _num_client_threads() == num_threads + 1
+
+    main = fleet[serial_urls[0]].main
+    assert isinstance(main, Main)
+
+    # Change from another thread than the I/O thread
+    main.vol = -30
+    connection = fleet.receivers[serial_urls[0]].get_raw_connection()
+    assert fleet.run(connection.get_value("MAIN", "VOL")) == "-30.0"
+    assert main.vol == -30
+
+    stats = fleet.stats()
+    assert stats.num_connected == 3
+    assert stats.num_initialized == 3
+    assert stats.response_time_mean is not None
+    assert stats.response_time_max is not None
+    assert stats.response_time_max >= stats.response_time_mean
+
+    failed = stats.receivers[3]
+    assert not failed.connected
+    assert failed.error is not None
+    assert failed.response_time_mean is None
+
+    # Only receivers that are not initialized are retried
+    num_commands_sent = stats.receivers[0].num_commands_sent
+    errors = fleet.initialize()
+    assert list(errors) == ["socket://127.0.0.1:1"]
+    assert fleet.stats().receivers[0].num_commands_sent == num_commands_sent
+
+
+def test_fleet_no_responses() -> None:
+    fleet = YncaFleet([])
+    assert fleet.initialize() == {}
+    stats = fleet.stats()
+    assert stats.response_time_mean is None
+    assert stats.response_time_max is None
+    fleet.close()
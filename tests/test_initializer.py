@@ -0,0 +1,429 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from tests.mock_yncaconnection import YncaConnectionMock
+from ynca import Bt, CommandPriority, Main, NetRadio, System, Tun, Uaw
+from ynca.capabilities import YncaCapabilityCache
+from ynca.errors import YncaInitializationFailedException
+import ynca.initializer
+from ynca.initializer import (
+    InitializationPlan,
+    LazyInitialization,
+    SubunitSelection,
+)
+from ynca.protocol import YncaProtocol, YncaProtocolStatus
+
+SYS = "SYS"
+MAIN = "MAIN"
+BT = "BT"
+NETRADIO = "NETRADIO"
+TUN = "TUN"
+UAW = "UAW"
+
+INITIALIZE_RESPONSES = [
+    (
+        (BT, "AVAIL"),
+        [
+            (BT, "AVAIL", "Ready"),
+        ],
+    ),
+    (
+        (UAW, "AVAIL"),
+        [
+            (UAW, "AVAIL", "Not Ready"),
+        ],
+    ),
+    # Only one sync for all subunits
+    (
+        (SYS, "VERSION"),
+        [
+            (SYS, "VERSION", "Version"),
+        ],
+    ),
+]
+
+
+def test_plan_commands(connection: YncaConnectionMock) -> None:
+    plan = InitializationPlan(connection, [Bt(connection), Uaw(connection)])
+    assert plan.commands == [(BT, "AVAIL"), (UAW, "AVAIL")]
+
+
+def test_execute_multiple_subunits(connection: YncaConnectionMock) -> None:
+    connection.get_response_list = INITIALIZE_RESPONSES
+
+    bt = Bt(connection)
+    uaw = Uaw(connection)
+    InitializationPlan(connection, [bt, uaw]).execute()
+
+    assert connection.get.call_args_list == [
+        mock.call(BT, "AVAIL", CommandPriority.INITIALIZATION),
+        mock.call(UAW, "AVAIL", CommandPriority.INITIALIZATION),
+        mock.call(SYS, "VERSION", CommandPriority.INITIALIZATION),
+    ]
+    assert bt.avail == "Ready"
+    assert uaw.avail == "Not Ready"
+
+    # Updates are reported after initialization
+    update_callback = mock.MagicMock()
+    uaw.register_update_callback(update_callback)
+    connection.send_protocol_message(UAW, "AVAIL", "Ready")
+    update_callback.assert_called_once_with("AVAIL", "Ready")
+
+
+def test_plan_multi_response_commands(connection: YncaConnectionMock) -> None:
+    plan = InitializationPlan(connection, [Main(connection)])
+    main_commands = [command for _, command in plan.commands]
+    assert "BASIC" in main_commands
+    assert "ENHANCER" not in main_commands
+    assert "SLEEP" not in main_commands
+    assert "PUREDIRMODE" in main_commands
+
+    plan = InitializationPlan(connection, [Main(connection)], protocol_version="4.41")
+    main_commands = [command for _, command in plan.commands]
+    for function_name in ("3DCINEMA", "ADAPTIVEDRC", "EXBASS", "PUREDIRMODE"):
+        assert function_name not in main_commands
+
+
+def test_plan_multi_response_command_only_when_smaller(
+    connection: YncaConnectionMock,
+) -> None:
+    # Only STATION is needed, its own GET is preferred over METAINFO
+    netradio = NetRadio(connection)
+    netradio._excluded_functions = frozenset(  # noqa: SLF001
+        netradio.function_handlers.keys() - {"STATION"}
+    )
+    assert InitializationPlan(connection, [netradio]).commands == [
+        (NETRADIO, "STATION")
+    ]
+
+
+def test_plan_multi_response_command_unsupported(
+    connection: YncaConnectionMock,
+) -> None:
+    cache = YncaCapabilityCache()
+    cache.update(
+        "ModelName",
+        [(NETRADIO, "METAINFO")],
+        {(NETRADIO, "METAINFO"): YncaProtocolStatus.UNDEFINED},
+    )
+
+    plan = InitializationPlan(connection, [NetRadio(connection)], cache, "ModelName")
+    assert (NETRADIO, "STATION") in plan.commands
+    assert plan.skipped_commands == [(NETRADIO, "METAINFO")]
+
+
+def test_execute_multi_response_missing_function(
+    connection: YncaConnectionMock,
+) -> None:
+    netradio = NetRadio(connection)
+    netradio._excluded_functions = frozenset(  # noqa: SLF001
+        netradio.function_handlers.keys() - {"ALBUM", "SONG", "STATION"}
+    )
+    connection.get_response_list = [
+        ((NETRADIO, "METAINFO"), [(NETRADIO, "SONG", "Song")]),
+        ((SYS, "VERSION"), [(SYS, "VERSION", "Version")]),
+        ((NETRADIO, "STATION"), [(NETRADIO, "STATION", "Station")]),
+        ((SYS, "VERSION"), [(SYS, "VERSION", "Version")]),
+    ]
+
+    InitializationPlan(connection, [netradio]).execute()
+
+    # Expected functions that were not reported are requested on their own, only once
+    assert connection.get.call_args_list == [
+        mock.call(NETRADIO, "METAINFO", CommandPriority.INITIALIZATION),
+        mock.call(SYS, "VERSION", CommandPriority.INITIALIZATION),
+        mock.call(NETRADIO, "STATION", CommandPriority.INITIALIZATION),
+        mock.call(SYS, "VERSION", CommandPriority.INITIALIZATION),
+    ]
+    assert netradio.song == "Song"
+    assert netradio.station == "Station"
+    assert netradio.album is None
+
+
+@mock.patch.object(ynca.initializer, "SYNC_TIMEOUT", 0.01)
+def test_execute_fail_reports_unfinished_subunits(
+    connection: YncaConnectionMock,
+) -> None:
+    plan = InitializationPlan(connection, [Bt(connection), Uaw(connection)])
+
+    # No replies at all
+    with (
+        mock.patch.object(YncaProtocol, "COMMAND_SPACING", 0),
+        pytest.raises(YncaInitializationFailedException, match="Subunit BT, UAW "),
+    ):
+        plan.execute()
+
+    # Reply for BT, but not for UAW
+    connection.get_response_list = [INITIALIZE_RESPONSES[0]]
+    connection.setup_responses()
+    with (
+        mock.patch.object(YncaProtocol, "COMMAND_SPACING", 0),
+        pytest.raises(YncaInitializationFailedException, match="Subunit UAW "),
+    ):
+        plan.execute()
+
+    # Errors without subunit can not be attributed to a command
+    connection.get_response_list = []
+    connection.setup_responses()
+    connection.get.side_effect = lambda *_: connection.send_protocol_error("@UNDEFINED")
+    with (
+        mock.patch.object(YncaProtocol, "COMMAND_SPACING", 0),
+        pytest.raises(YncaInitializationFailedException, match="Subunit BT, UAW "),
+    ):
+        plan.execute()
+
+    # Replies for all commands, but no sync
+    connection.get_response_list = INITIALIZE_RESPONSES[:2]
+    connection.setup_responses()
+    with (
+        mock.patch.object(YncaProtocol, "COMMAND_SPACING", 0),
+        pytest.raises(YncaInitializationFailedException, match="Subunit BT, UAW "),
+    ):
+        plan.execute()
+
+
+def test_execute_reconcile_only_reports_changes(
+    connection: YncaConnectionMock,
+) -> None:
+    connection.get_response_list = INITIALIZE_RESPONSES
+    bt = Bt(connection)
+    uaw = Uaw(connection)
+    InitializationPlan(connection, [bt, uaw]).execute()
+
+    update_callback = mock.MagicMock()
+    bt.register_update_callback(update_callback)
+    uaw.register_update_callback(update_callback)
+
+    connection.get_response_list = [
+        ((BT, "AVAIL"), [(BT, "AVAIL", "Ready")]),
+        ((UAW, "AVAIL"), [(UAW, "AVAIL", "Ready")]),
+        ((SYS, "VERSION"), [(SYS, "VERSION", "Version")]),
+    ]
+    connection.setup_responses()
+    InitializationPlan(connection, [bt, uaw]).execute(reconcile=True)
+
+    update_callback.assert_called_once_with("AVAIL", "Ready")
+    assert uaw.avail == "Ready"
+
+
+def test_execute_reconcile_fail(connection: YncaConnectionMock) -> None:
+    connection.get_response_list = [INITIALIZE_RESPONSES[0], INITIALIZE_RESPONSES[2]]
+    bt = Bt(connection)
+    InitializationPlan(connection, [bt]).execute()
+
+    connection.get_response_list = []
+    with pytest.raises(YncaInitializationFailedException):
+        InitializationPlan(connection, [bt]).execute(reconcile=True)
+
+
+def test_async_execute(connection: YncaConnectionMock) -> None:
+    connection.get_response_list = INITIALIZE_RESPONSES
+    bt = Bt(connection)
+    uaw = Uaw(connection)
+
+    asyncio.run(InitializationPlan(connection, [bt, uaw]).async_execute())
+    assert bt.avail == "Ready"
+    assert uaw.avail == "Not Ready"
+
+
+def test_async_execute_fail(connection: YncaConnectionMock) -> None:
+    plan = InitializationPlan(connection, [Bt(connection)])
+
+    with (
+        mock.patch.object(YncaProtocol, "COMMAND_SPACING", 0.01),
+        pytest.raises(YncaInitializationFailedException, match="BT"),
+    ):
+        asyncio.run(plan.async_execute())
+
+
+def test_lazy_initialization_on_access(connection: YncaConnectionMock) -> None:
+    connection.get_response_list = [INITIALIZE_RESPONSES[0], INITIALIZE_RESPONSES[2]]
+    bt = Bt(connection)
+    uaw = Uaw(connection)
+    update_callback = mock.MagicMock()
+    bt.register_update_callback(update_callback)
+
+    lazy = LazyInitialization(connection, [bt, uaw], lambda lazy: lazy.run())
+    assert lazy.pending == [bt, uaw]
+    connection.get.assert_not_called()
+
+    # Initialized on first access, values are reported once initialized
+    assert bt.avail == "Ready"
+    update_callback.assert_called_once_with("AVAIL", "Ready")
+    assert lazy.pending == [uaw]
+
+    assert bt.avail == "Ready"
+    assert connection.get.call_count == 2
+
+    lazy.close()
+    assert lazy.pending == []
+    assert uaw.avail is None
+    connection.get.assert_called_with(SYS, "VERSION", CommandPriority.INITIALIZATION)
+
+
+def test_lazy_initialization_on_input(connection: YncaConnectionMock) -> None:
+    bt = Bt(connection)
+    uaw = Uaw(connection)
+    start = mock.MagicMock()
+    cache = YncaCapabilityCache()
+    lazy = LazyInitialization(connection, [bt, uaw], start, cache, "ModelName")
+
+    connection.send_protocol_message(MAIN, "INP", "Bluetooth")
+    connection.send_protocol_message(MAIN, "INP", "HDMI1")
+    # Already requested
+    connection.send_protocol_message(MAIN, "INP", "Bluetooth")
+    lazy.request(uaw)
+    start.assert_called_once_with(lazy)
+    assert lazy.pending == []
+
+    connection.get_response_list = INITIALIZE_RESPONSES
+    lazy.run()
+    assert bt.avail == "Ready"
+    assert uaw.avail == "Not Ready"
+
+    lazy.close()
+    connection.send_protocol_message(MAIN, "INP", "UAW")
+    start.assert_called_once()
+
+
+def test_lazy_initialization_fail(connection: YncaConnectionMock) -> None:
+    bt = Bt(connection)
+    lazy = LazyInitialization(connection, [bt], mock.MagicMock())
+    lazy.request(bt)
+
+    with mock.patch.object(YncaProtocol, "COMMAND_SPACING", 0):
+        lazy.run()
+    assert bt.avail is None
+
+    # Not running anymore, so a new request starts again
+    lazy.request(bt)
+    assert lazy._start.call_count == 2  # type: ignore[attr-defined]  # noqa: SLF001
+
+
+def test_lazy_initialization_start_fails(connection: YncaConnectionMock) -> None:
+    bt = Bt(connection)
+    uaw = Uaw(connection)
+    start = mock.MagicMock(side_effect=RuntimeError)
+    lazy = LazyInitialization(connection, [bt, uaw], start)
+
+    with pytest.raises(RuntimeError):
+        lazy.request(bt)
+
+    # Next request starts again, including the earlier request
+    start.side_effect = None
+    lazy.request(uaw)
+    assert start.call_count == 2
+    assert lazy._requested == [bt, uaw]  # noqa: SLF001
+
+
+def test_lazy_initialization_close_stops_run(
+    connection: YncaConnectionMock,
+) -> None:
+    bt = Bt(connection)
+    uaw = Uaw(connection)
+    lazy = LazyInitialization(connection, [bt, uaw], mock.MagicMock())
+    lazy.request(bt)
+
+    # No responses, so the plan waits for its sync until cancelled
+    thread = threading.Thread(target=lazy.run)
+    thread.start()
+    for _ in range(100):
+        if connection.sync.called:
+            break
+        time.sleep(0.01)
+    lazy.request(uaw)
+    lazy.close()
+    thread.join(1)
+
+    assert not thread.is_alive()
+    assert bt.avail is None
+    assert uaw.avail is None
+
+
+def test_initialization_plan_cancelled(connection: YncaConnectionMock) -> None:
+    connection.get_response_list = INITIALIZE_RESPONSES
+    bt = Bt(connection)
+    plan = InitializationPlan(connection, [bt])
+    plan.cancel()
+
+    with pytest.raises(YncaInitializationFailedException):
+        plan.execute()
+    connection.get.assert_not_called()
+
+
+def test_lazy_initialization_async(connection: YncaConnectionMock) -> None:
+    connection.get_response_list = [INITIALIZE_RESPONSES[0], INITIALIZE_RESPONSES[2]]
+    bt = Bt(connection)
+    uaw = Uaw(connection)
+    lazy = LazyInitialization(connection, [bt, uaw], mock.MagicMock())
+    lazy.request(bt)
+    asyncio.run(lazy.async_run())
+    assert bt.avail == "Ready"
+
+    lazy.request(uaw)
+    with mock.patch.object(YncaProtocol, "COMMAND_SPACING", 0):
+        asyncio.run(lazy.async_run())
+    assert uaw.avail is None
+
+
+def test_subunit_selection(connection: YncaConnectionMock) -> None:
+    tun = Tun(connection)
+    all_functions = frozenset(tun.function_handlers)
+
+    selection = SubunitSelection()
+    assert selection.includes_subunit(TUN)
+    assert selection.excluded_functions(tun) == frozenset()
+
+    selection = SubunitSelection(include=[TUN, "MAIN:VOL"], exclude=[UAW])
+    assert selection.includes_subunit(TUN)
+    assert selection.includes_subunit(MAIN)
+    assert not selection.includes_subunit(UAW)
+    assert selection.excluded_functions(tun) == frozenset()
+
+    # Function names apply to all subunits, SYS can not be excluded
+    selection = SubunitSelection(include=["AVAIL", "BAND"], exclude=[SYS, "BAND"])
+    assert selection.includes_subunit(SYS)
+    assert selection.includes_subunit(TUN)
+    assert selection.excluded_functions(tun) == all_functions - {"AVAIL"}
+
+    # Functions of one subunit
+    selection = SubunitSelection(include=["TUN:FMFREQ"], exclude=["TUN:RDSTXTA"])
+    assert selection.includes_subunit(TUN)
+    assert not selection.includes_subunit(UAW)
+    assert selection.excluded_functions(tun) == all_functions - {"FMFREQ"}
+    selection = SubunitSelection(exclude=["TUN:RDSTXTA", "UNKNOWN"])
+    assert selection.includes_subunit(TUN)
+    assert selection.excluded_functions(tun) == frozenset(["RDSTXTA"])
+
+
+def test_subunit_selection_sys(connection: YncaConnectionMock) -> None:
+    system = System(connection)
+
+    # Function names for all subunits do not apply to SYS
+    selection = SubunitSelection(include=["VOL"], exclude=["PARTY"])
+    assert selection.excluded_functions(system) == frozenset()
+
+    # MODELNAME and VERSION are always initialized
+    selection = SubunitSelection(include=["SYS:PWR"], exclude=["SYS:MODELNAME"])
+    assert selection.excluded_functions(system) == frozenset(
+        system.function_handlers.keys() - {"PWR", "MODELNAME", "VERSION"}
+    )
+
+
+def test_subunit_selection_unknown_entries() -> None:
+    known_functions = {TUN: frozenset(("AVAIL", "BAND")), UAW: frozenset(("AVAIL",))}
+    SubunitSelection(
+        include=[TUN, "BAND", "UAW:AVAIL"],
+        exclude=["AVAIL"],
+        known_functions=known_functions,
+    )
+
+    for entry in ("Tun", "UNKNOWN", "UAW:BAND", "UNKNOWN:AVAIL"):
+        with pytest.raises(ValueError, match=entry):
+            SubunitSelection(include=[entry], known_functions=known_functions)
+        with pytest.raises(ValueError, match=entry):
+            SubunitSelection(exclude=[entry], known_functions=known_functions)
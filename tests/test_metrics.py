@@ -0,0 +1,59 @@
+from unittest import mock
+
+from ynca.metrics import Histogram, YncaMetrics
+from ynca.protocol import CommandPriority, YncaProtocolStatus
+
+
+def test_histogram() -> None:
+    histogram = Histogram((0.1, 1.0))
+    assert histogram.mean is None
+
+    histogram.record(0.05)
+    histogram.record(0.1)
+    histogram.record(0.5)
+    histogram.record(5)
+
+    assert histogram.count == 4
+    assert histogram.sum == 5.65
+    assert histogram.max == 5
+    assert histogram.mean == 5.65 / 4
+    assert histogram.snapshot() == {
+        "count": 4,
+        "sum": 5.65,
+        "max": 5,
+        "buckets": {"0.1": 2, "1.0": 3, "+Inf": 4},
+    }
+
+
+def test_metrics_snapshot() -> None:
+    with mock.patch("time.monotonic", return_value=100):
+        metrics = YncaMetrics()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["connects"] == 0
+    assert snapshot["reconnects"] == 0
+    assert snapshot["queue_depth"] == {}
+    assert snapshot["received"] == {}
+
+    metrics.num_connects = 2
+    metrics.num_lines_received = 20
+    metrics.num_received[YncaProtocolStatus.OK] += 19
+    metrics.num_received[YncaProtocolStatus.RESTRICTED] += 1
+    metrics.queue_depths = lambda: {CommandPriority.INTERACTIVE: 3}
+    metrics.record_response_time(("MAIN", "VOL"), 0.003)
+    metrics.record_response_time(("MAIN", "VOL"), 0.007)
+    metrics.record_response_time(("SYS", "VERSION"), 0.2)
+
+    with mock.patch("time.monotonic", return_value=110):
+        snapshot = metrics.snapshot()
+
+    assert snapshot["connects"] == 2
+    assert snapshot["reconnects"] == 1
+    assert snapshot["lines_received"] == 20
+    assert snapshot["received_line_rate"] == 2
+    assert snapshot["received"] == {"OK": 19, "RESTRICTED": 1}
+    assert snapshot["queue_depth"] == {"INTERACTIVE": 3}
+    assert snapshot["response_time"]["count"] == 3
+    assert snapshot["response_time_per_command"]["MAIN:VOL"]["count"] == 2
+    assert snapshot["response_time_per_command"]["MAIN:VOL"]["buckets"]["0.005"] == 1
+    assert snapshot["response_time_per_command"]["SYS:VERSION"]["max"] == 0.2
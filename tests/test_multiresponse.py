@@ -0,0 +1,36 @@
+from ynca.multiresponse import (
+    MultiResponseCommand,
+    multi_response_commands,
+    protocol_version,
+)
+
+
+def test_protocol_version() -> None:
+    assert protocol_version("1.80/2.01") == "2.01"
+    assert protocol_version("Version") == ""
+
+
+def test_multi_response_commands() -> None:
+    assert multi_response_commands("MAIN") == {
+        "BASIC": frozenset(("ENHANCER", "SLEEP"))
+    }
+    assert multi_response_commands("ZONE2", "3.12")["BASIC"] == frozenset(
+        ("ENHANCER", "EXBASS", "SLEEP")
+    )
+    assert "3DCINEMA" in multi_response_commands("MAIN", "4.41")["BASIC"]
+    assert "3DCINEMA" not in multi_response_commands("MAIN", "3.12")["BASIC"]
+    assert multi_response_commands("NETRADIO") == {"METAINFO": frozenset(("STATION",))}
+    assert multi_response_commands("TUN") == {}
+
+
+def test_multi_response_commands_custom_table() -> None:
+    commands = (
+        MultiResponseCommand("ALL", frozenset(("TUN",)), frozenset(("A", "B"))),
+        MultiResponseCommand("ALL", frozenset(("TUN",)), frozenset(("C",)), ("2.",)),
+    )
+    assert multi_response_commands("TUN", "1.00", commands) == {
+        "ALL": frozenset(("A", "B"))
+    }
+    assert multi_response_commands("TUN", "2.01", commands) == {
+        "ALL": frozenset(("A", "B", "C"))
+    }
@@ -9,21 +9,23 @@ SUBUNIT = "NETRADIO"
 
 INITIALIZE_FULL_RESPONSES = [
     (
-        (SUBUNIT, "AVAIL"),
+        (SUBUNIT, "METAINFO"),
         [
-            (SUBUNIT, "AVAIL", "Ready"),
+            (SUBUNIT, "ALBUM", "Album"),
+            (SUBUNIT, "SONG", "Song"),
+            (SUBUNIT, "STATION", "Station"),
         ],
     ),
     (
-        (SUBUNIT, "PLAYBACKINFO"),
+        (SUBUNIT, "AVAIL"),
         [
-            (SUBUNIT, "PLAYBACKINFO", "Play"),
+            (SUBUNIT, "AVAIL", "Ready"),
         ],
     ),
     (
-        (SUBUNIT, "STATION"),
+        (SUBUNIT, "PLAYBACKINFO"),
         [
-            (SUBUNIT, "STATION", "Station"),
+            (SUBUNIT, "PLAYBACKINFO", "Play"),
         ],
     ),
     (
@@ -45,6 +47,8 @@ def test_initialize(
 
     netradio.initialize()
 
+    assert netradio.album == "Album"
+    assert netradio.song == "Song"
     assert netradio.station == "Station"
     assert netradio.playbackinfo is PlaybackInfo.PLAY
 
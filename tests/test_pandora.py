@@ -15,6 +15,7 @@ INITIALIZE_FULL_RESPONSES = [
             (SUBUNIT, "ARTIST", "Artist"),
             (SUBUNIT, "SONG", "Song"),
             (SUBUNIT, "TRACK", "Track"),
+            (SUBUNIT, "STATION", "Station"),
         ],
     ),
     (
@@ -29,12 +30,6 @@ INITIALIZE_FULL_RESPONSES = [
             (SUBUNIT, "PLAYBACKINFO", "Pause"),
         ],
     ),
-    (
-        (SUBUNIT, "STATION"),
-        [
-            (SUBUNIT, "STATION", "Station"),
-        ],
-    ),
     (
         (SYS, "VERSION"),
         [
@@ -0,0 +1,258 @@
+from collections.abc import Generator
+import socket
+import struct
+import threading
+from unittest import mock
+
+import pytest
+
+import ynca
+from ynca.debug_server import YncaServer
+from ynca.protocol import YncaProtocol, YncaProtocolStatus, _KeepAliveMonitor
+import ynca.proxy
+from ynca.proxy import YncaProxyServer, _ProxyClient
+
+
+class Client:
+    def __init__(self, proxy: YncaProxyServer) -> None:
+        self.socket = socket.create_connection(proxy.server_address, timeout=2)
+        self.rfile = self.socket.makefile("rb")
+
+    def send(self, line: str) -> None:
+        self.socket.sendall(f"{line}\r\n".encode())
+
+    def receive(self) -> str:
+        return self.rfile.readline().decode().strip()
+
+    def close(self) -> None:
+        self.rfile.close()
+        self.socket.close()
+
+
+def start_server(server: YncaServer | YncaProxyServer) -> None:
+    # Short poll interval, shutdown waits for it
+    threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    ).start()
+
+
+def stop_server(server: YncaServer | YncaProxyServer) -> None:
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def upstream_server() -> Generator[YncaServer, None, None]:
+    server = YncaServer(("127.0.0.1", 0), "logs/RX-V475.txt")
+    start_server(server)
+    with mock.patch.object(YncaProtocol, "COMMAND_SPACING", 0.01):
+        yield server
+    stop_server(server)
+
+
+@pytest.fixture
+def proxy(upstream_server: YncaServer) -> Generator[YncaProxyServer, None, None]:
+    proxy = YncaProxyServer(
+        ("127.0.0.1", 0), f"socket://127.0.0.1:{upstream_server.server_address[1]}"
+    )
+    start_server(proxy)
+    yield proxy
+    stop_server(proxy)
+
+
+def test_proxy(proxy: YncaProxyServer) -> None:
+    client_a = Client(proxy)
+    client_a.send("garbage")
+    client_a.send("@MAIN:VOL=?")
+    assert client_a.receive() == "@MAIN:VOL=-60.0"
+    assert proxy.connection is not None
+    assert proxy.connection.num_commands_sent == 1
+
+    # Second client gets the value from the cache
+    client_b = Client(proxy)
+    client_b.send("@MAIN:VOL=?")
+    assert client_b.receive() == "@MAIN:VOL=-60.0"
+    assert proxy.num_cache_hits == 1
+    assert proxy.connection.num_commands_sent == 1
+
+    # Changes are broadcast to all clients
+    client_a.send("@MAIN:VOL=-30.0")
+    assert client_a.receive() == "@MAIN:VOL=-30.0"
+    assert client_b.receive() == "@MAIN:VOL=-30.0"
+    assert proxy.connection.num_commands_sent == 2
+
+    # Concurrent GETs result in a single GET to the receiver
+    client_a.send("@MAIN:INP=?")
+    client_b.send("@MAIN:INP=?")
+    assert client_a.receive() == "@MAIN:INP=NET RADIO"
+    assert client_b.receive() == "@MAIN:INP=NET RADIO"
+    assert proxy.connection.num_commands_sent == 3
+
+    # Errors only go to the client that sent the command
+    client_a.send("@MAIN:UNKNOWN=?")
+    assert client_a.receive() == "@UNDEFINED"
+    client_b.send("@MAIN:VOL=?")
+    assert client_b.receive() == "@MAIN:VOL=-30.0"
+
+    client_b.close()
+    client_a.send("@MAIN:VOL=-40.0")
+    assert client_a.receive() == "@MAIN:VOL=-40.0"
+    client_a.close()
+
+
+def test_proxy_pending_get_timeout(proxy: YncaProxyServer) -> None:
+    client = Client(proxy)
+
+    # Multiresponse functions never respond with the function itself, so send again
+    with mock.patch.object(ynca.proxy, "PENDING_GET_TIMEOUT", -1):
+        client.send("@USB:METAINFO=?")
+        assert client.receive() == "@USB:ARTIST="
+        client.send("@USB:METAINFO=?")
+        assert client.receive() == "@USB:ALBUM="
+
+    assert proxy.connection is not None
+    assert proxy.connection.num_commands_sent == 2
+    client.close()
+
+
+def test_proxy_replies_in_order(proxy: YncaProxyServer) -> None:
+    client_a = Client(proxy)
+    client_a.send("@MAIN:VOL=?")
+    assert client_a.receive() == "@MAIN:VOL=-60.0"
+
+    # Cached value is not answered before the reply of an earlier GET
+    client_b = Client(proxy)
+    client_b.send("@MAIN:INP=?")
+    client_b.send("@MAIN:VOL=?")
+    assert client_b.receive() == "@MAIN:INP=NET RADIO"
+    assert client_b.receive() == "@MAIN:VOL=-60.0"
+    assert proxy.num_cache_hits == 0
+
+    # Lines of multiresponse GETs go to the client that asked, also when unchanged
+    client_a.send("@USB:METAINFO=?")
+    assert client_a.receive() == "@USB:ARTIST="
+    client_b.send("@USB:METAINFO=?")
+    client_b.send("@SYS:VERSION=?")
+    assert client_b.receive() == "@USB:ARTIST="
+
+    client_a.close()
+    client_b.close()
+
+
+def test_proxy_keep_alive_pending(proxy: YncaProxyServer) -> None:
+    client = Client(proxy)
+    client.send("@MAIN:VOL=?")
+    assert client.receive() == "@MAIN:VOL=-60.0"
+
+    # Receiver did not answer the keep-alive, the next MODELNAME reply is for the client
+    assert proxy.connection is not None
+    protocol = proxy.connection._protocol  # noqa: SLF001
+    assert protocol is not None
+    protocol._keep_alive.pending = True  # noqa: SLF001
+    with mock.patch.object(_KeepAliveMonitor, "needs_probe", return_value=False):
+        client.send("@SYS:MODELNAME=?")
+        assert client.receive() == "@SYS:MODELNAME=RX-V475"
+    client.close()
+
+
+def test_proxy_multiple_apis() -> None:
+    server = YncaServer(("127.0.0.1", 0), "logs/RX-A810.txt")
+    start_server(server)
+    proxy = YncaProxyServer(
+        ("127.0.0.1", 0), f"socket://127.0.0.1:{server.server_address[1]}"
+    )
+    start_server(proxy)
+
+    with mock.patch.object(YncaProtocol, "COMMAND_SPACING", 0.01):
+        api_a = ynca.YncaApi(f"socket://127.0.0.1:{proxy.server_address[1]}")
+        api_a.initialize()
+
+        # Second client initializes with values from the cache and multiresponse GETs
+        api_b = ynca.YncaApi(f"socket://127.0.0.1:{proxy.server_address[1]}")
+        api_b.initialize()
+
+        for api in (api_a, api_b):
+            assert api.sys is not None
+            assert api.sys.modelname == "RX-A810"
+            assert api.main is not None
+            assert api.main.pwr is ynca.Pwr.STANDBY
+            assert api.main.vol == -33.0
+            assert api.main.inp is ynca.Input.NETRADIO
+        assert proxy.num_cache_hits > 0
+
+        api_a.close()
+        api_b.close()
+
+    stop_server(proxy)
+    stop_server(server)
+
+
+def test_proxy_upstream_disconnect() -> None:
+    server = YncaServer(
+        ("127.0.0.1", 0),
+        "logs/RX-V475.txt",
+        disconnect_after_receiving_num_commands=2,
+    )
+    start_server(server)
+    proxy = YncaProxyServer(
+        ("127.0.0.1", 0), f"socket://127.0.0.1:{server.server_address[1]}"
+    )
+    start_server(proxy)
+
+    with mock.patch.object(YncaProtocol, "COMMAND_SPACING", 0.01):
+        client = Client(proxy)
+        client.send("@MAIN:VOL=?")
+        assert client.receive() == "@MAIN:VOL=-60.0"
+
+        # Clients get disconnected like the receiver went away
+        client.send("@MAIN:VOL=-30")
+        assert client.receive() == ""
+        client.close()
+
+        # Next client connects to the receiver again
+        client = Client(proxy)
+        client.send("@MAIN:VOL=?")
+        assert client.receive() == "@MAIN:VOL=-60.0"
+
+        # Clients get disconnected when the proxy stops
+        stop_server(proxy)
+        assert client.receive() == ""
+        client.close()
+
+    stop_server(server)
+
+
+def test_proxy_upstream_connect_fails() -> None:
+    proxy = YncaProxyServer(("127.0.0.1", 0), "socket://127.0.0.1:1")
+    start_server(proxy)
+
+    client = Client(proxy)
+    assert client.receive() == ""
+    client.close()
+
+    stop_server(proxy)
+
+
+def test_proxy_client_connection_errors(proxy: YncaProxyServer) -> None:
+    # Client resetting the connection
+    client = Client(proxy)
+    client.send("@MAIN:VOL=?")
+    assert client.receive() == "@MAIN:VOL=-60.0"
+    client.socket.setsockopt(
+        socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+    )
+    client.close()
+
+    # Messages without subunit can not be handled by clients
+    proxy._upstream_message_received(  # noqa: SLF001
+        YncaProtocolStatus.UNDEFINED, None, None, None
+    )
+
+    request = mock.MagicMock()
+    request.shutdown.side_effect = OSError
+    wfile = mock.MagicMock()
+    wfile.write.side_effect = OSError
+
+    client = _ProxyClient(request, wfile)
+    client.send("@MAIN:VOL=-30.0")
+    client.disconnect()
@@ -0,0 +1,61 @@
+import pytest  # type: ignore[import]
+
+from ynca import YncaChangeTracker
+
+
+def test_record() -> None:
+    tracker = YncaChangeTracker()
+    assert tracker.sequence == 0
+    assert tracker.snapshot().values == {}
+
+    assert tracker.record("MAIN", "PWR", "On") == 1
+    assert tracker.record("MAIN", "VOL", -20.5) == 2
+    assert tracker.record("SYS", "PWR", "On") == 3
+    assert tracker.sequence == 3
+
+    snapshot = tracker.snapshot()
+    assert snapshot.sequence == 3
+    assert snapshot.values == {
+        "MAIN": {"PWR": "On", "VOL": -20.5},
+        "SYS": {"PWR": "On"},
+    }
+
+
+def test_snapshot_immutable() -> None:
+    tracker = YncaChangeTracker()
+    tracker.record("MAIN", "PWR", "On")
+    snapshot = tracker.snapshot()
+
+    with pytest.raises(TypeError):
+        snapshot.values["MAIN"]["PWR"] = "Standby"  # type: ignore[index]
+    with pytest.raises(TypeError):
+        snapshot.values["ZONE2"] = {}  # type: ignore[index]
+
+    # Later changes do not show up in earlier snapshots
+    tracker.record("MAIN", "PWR", "Standby")
+    assert snapshot.values["MAIN"]["PWR"] == "On"
+    assert tracker.snapshot().values["MAIN"]["PWR"] == "Standby"
+
+
+def test_changes_since() -> None:
+    tracker = YncaChangeTracker()
+    tracker.record("MAIN", "PWR", "On")
+    tracker.record("MAIN", "VOL", -20.5)
+    sequence = tracker.snapshot().sequence
+
+    changes = tracker.changes_since(sequence)
+    assert changes.sequence == sequence
+    assert changes.values == {}
+
+    tracker.record("MAIN", "PWR", "Standby")
+    tracker.record("ZONE2", "VOL", -30.0)
+    tracker.record("MAIN", "PWR", "On")
+
+    # Only the latest value of a function that changed multiple times
+    changes = tracker.changes_since(sequence)
+    assert changes.sequence == 5
+    assert changes.values == {"ZONE2": {"VOL": -30.0}, "MAIN": {"PWR": "On"}}
+    assert list(changes.values) == ["ZONE2", "MAIN"]
+
+    assert tracker.changes_since(changes.sequence).values == {}
+    assert tracker.changes_since(0).values == tracker.snapshot().values
@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from ynca.state import YncaState
+
+
+def test_save_and_load(tmp_path: Path) -> None:
+    filename = tmp_path / "state.json"
+    state = YncaState("ModelName", "1.23/4.56", {"MAIN": {"VOL": "-30.5"}})
+    state.save(filename)
+
+    loaded_state = YncaState.load(filename)
+    assert loaded_state == state
+    assert loaded_state.matches("ModelName", "1.23/4.56")
+    assert not loaded_state.matches("ModelName", "1.23/4.57")
+    assert not loaded_state.matches("OtherModelName", "1.23/4.56")
+
+
+def test_load_missing_file(tmp_path: Path) -> None:
+    assert YncaState.load(tmp_path / "does_not_exist.json") is None
+
+
+def test_load_invalid_file(tmp_path: Path) -> None:
+    filename = tmp_path / "state.json"
+    filename.write_text("not json")
+    assert YncaState.load(filename) is None
+
+    filename.write_text('{"format": 1}')
+    assert YncaState.load(filename) is None
+
+
+def test_load_unsupported_format(tmp_path: Path) -> None:
+    filename = tmp_path / "state.json"
+    filename.write_text('{"format": 0, "modelname": "", "version": "", "subunits": {}}')
+    assert YncaState.load(filename) is None
@@ -5,7 +5,7 @@ from unittest import mock
 import pytest  # type: ignore[import]
 
 from tests.mock_yncaconnection import YncaConnectionMock
-from ynca import Avail
+from ynca import Avail, UpdatePolicy, YncaChangeTracker
 from ynca.constants import Subunit
 from ynca.errors import YncaInitializationFailedException
 from ynca.function import IntFunctionMixin
@@ -120,11 +120,168 @@ def test_registration(
     assert update_callback_2.call_count == 2
 
 
+def test_update_callback_only_on_change(
+    connection: YncaConnectionMock,
+    initialized_dummysubunit: SubunitBase,
+    update_callback: mock.Mock,
+) -> None:
+    initialized_dummysubunit.register_update_callback(update_callback)
+
+    connection.send_protocol_message(SUBUNIT, "DUMMY_FUNCTION", "1")
+    update_callback.assert_not_called()
+
+    connection.send_protocol_message(SUBUNIT, "DUMMY_FUNCTION", "2")
+    connection.send_protocol_message(SUBUNIT, "DUMMY_FUNCTION", "2")
+    update_callback.assert_called_once_with("DUMMY_FUNCTION", 2)
+
+
+def test_update_callback_for_functions(
+    connection: YncaConnectionMock,
+    initialized_dummysubunit: SubunitBase,
+    update_callback: mock.Mock,
+) -> None:
+    initialized_dummysubunit.register_update_callback(
+        update_callback, functions={"AVAIL"}
+    )
+
+    connection.send_protocol_message(SUBUNIT, "DUMMY_FUNCTION", "2")
+    update_callback.assert_not_called()
+
+    connection.send_protocol_message(SUBUNIT, "AVAIL", "Not Ready")
+    update_callback.assert_called_once_with("AVAIL", Avail.NOT_READY)
+
+    # Registering again replaces the functions
+    initialized_dummysubunit.register_update_callback(update_callback)
+    connection.send_protocol_message(SUBUNIT, "DUMMY_FUNCTION", "3")
+    update_callback.assert_called_with("DUMMY_FUNCTION", 3)
+
+
+def test_update_policy(
+    connection: YncaConnectionMock,
+    initialized_dummysubunit: SubunitBase,
+    update_callback: mock.Mock,
+) -> None:
+    initialized_dummysubunit.register_update_callback(update_callback)
+    initialized_dummysubunit.set_update_policy(
+        "DUMMY_FUNCTION", UpdatePolicy(debounce=1)
+    )
+
+    with mock.patch("time.monotonic", return_value=100.0):
+        connection.send_protocol_message(SUBUNIT, "DUMMY_FUNCTION", "2")
+        connection.send_protocol_message(SUBUNIT, "DUMMY_FUNCTION", "3")
+    update_callback.assert_not_called()
+
+    # Latest value gets delivered when the timer expires
+    delay, deliver = connection.call_later.call_args.args
+    assert delay == pytest.approx(1)
+    with mock.patch("time.monotonic", return_value=101.0):
+        deliver()
+    update_callback.assert_called_once_with("DUMMY_FUNCTION", 3)
+
+    # Other functions are not limited
+    connection.send_protocol_message(SUBUNIT, "AVAIL", "Not Ready")
+    update_callback.assert_called_with("AVAIL", Avail.NOT_READY)
+
+    # Pending update is dropped when removing the policy
+    connection.send_protocol_message(SUBUNIT, "DUMMY_FUNCTION", "4")
+    initialized_dummysubunit.set_update_policy("DUMMY_FUNCTION", None)
+    connection.call_later.return_value.cancel.assert_called()
+    connection.send_protocol_message(SUBUNIT, "DUMMY_FUNCTION", "5")
+    update_callback.assert_called_with("DUMMY_FUNCTION", 5)
+
+    initialized_dummysubunit.set_update_policy(
+        "DUMMY_FUNCTION", UpdatePolicy(min_interval=5)
+    )
+    initialized_dummysubunit.close()
+
+
+def test_update_callbacks_dispatched(
+    connection: YncaConnectionMock,
+    initialized_dummysubunit: SubunitBase,
+    update_callback: mock.Mock,
+) -> None:
+    dispatcher = mock.Mock()
+    initialized_dummysubunit._callback_dispatcher = dispatcher  # noqa: SLF001
+    initialized_dummysubunit.register_update_callback(update_callback)
+
+    connection.send_protocol_message(SUBUNIT, "DUMMY_FUNCTION", "2")
+    update_callback.assert_not_called()
+    dispatcher.submit.assert_called_once_with(
+        SUBUNIT, update_callback, "DUMMY_FUNCTION", 2
+    )
+
+
+def test_batch_update_callback(
+    connection: YncaConnectionMock,
+    initialized_dummysubunit: SubunitBase,
+    update_callback: mock.Mock,
+) -> None:
+    batch_callback = mock.Mock()
+    # Only subunits with batch update callbacks need timers
+    assert initialized_dummysubunit._batcher is None  # noqa: SLF001
+    initialized_dummysubunit.register_update_callback(update_callback)
+    initialized_dummysubunit.register_batch_update_callback(batch_callback)
+
+    connection.send_protocol_message(SUBUNIT, "AVAIL", "Not Ready")
+    connection.send_protocol_message(SUBUNIT, "DUMMY_FUNCTION", "2")
+    batch_callback.assert_not_called()
+    # Update callbacks still get called for each value
+    assert update_callback.call_count == 2
+
+    # Sync marker ends the burst
+    connection.send_protocol_message(SYS, "VERSION", "Version")
+    batch_callback.assert_called_once_with(
+        SUBUNIT, {"AVAIL": Avail.NOT_READY, "DUMMY_FUNCTION": 2}
+    )
+
+    # Gap ends the burst
+    with mock.patch("time.monotonic", return_value=100.0):
+        connection.send_protocol_message(SUBUNIT, "DUMMY_FUNCTION", "3")
+    _, timer_expired = connection.call_later.call_args.args
+    with mock.patch("time.monotonic", return_value=101.0):
+        timer_expired()
+    batch_callback.assert_called_with(SUBUNIT, {"DUMMY_FUNCTION": 3})
+
+    dispatcher = mock.Mock()
+    initialized_dummysubunit._callback_dispatcher = dispatcher  # noqa: SLF001
+    connection.send_protocol_message(SUBUNIT, "DUMMY_FUNCTION", "4")
+    connection.send_protocol_message(SYS, "VERSION", "Version")
+    dispatcher.submit.assert_called_with(
+        SUBUNIT, batch_callback, SUBUNIT, {"DUMMY_FUNCTION": 4}
+    )
+
+    initialized_dummysubunit.unregister_batch_update_callback(batch_callback)
+    connection.unregister_message_callback.assert_called_with(
+        initialized_dummysubunit._sync_received, SYS  # noqa: SLF001
+    )
+    initialized_dummysubunit.register_batch_update_callback(batch_callback)
+    initialized_dummysubunit.close()
+    connection.unregister_message_callback.assert_called_with(
+        initialized_dummysubunit._sync_received, SYS  # noqa: SLF001
+    )
+
+
+def test_change_tracker(
+    connection: YncaConnectionMock,
+    initialized_dummysubunit: SubunitBase,
+) -> None:
+    tracker = YncaChangeTracker()
+    initialized_dummysubunit._change_tracker = tracker  # noqa: SLF001
+
+    connection.send_protocol_message(SUBUNIT, "DUMMY_FUNCTION", "2")
+    # Unchanged values are not recorded
+    connection.send_protocol_message(SUBUNIT, "DUMMY_FUNCTION", "2")
+    assert tracker.sequence == 1
+    assert tracker.snapshot().values == {SUBUNIT: {"DUMMY_FUNCTION": 2}}
+
+
 def test_close(
     connection: YncaConnectionMock, initialized_dummysubunit: SubunitBase
 ) -> None:
     initialized_dummysubunit.close()
-    connection.unregister_message_callback.assert_called_once()
+    connection.unregister_message_callback.assert_called_with(
+        initialized_dummysubunit._protocol_message_received, SUBUNIT  # noqa: SLF001
+    )
 
     # Should be safe to call multiple times
     initialized_dummysubunit.close()
@@ -160,7 +317,7 @@ def test_write_function_calls_connection_put(
     connection.put.assert_called_with("UAW", "DUMMY_FUNCTION", "123")
 
 
-def test_unreadable_attributes_ignored(connection: YncaConnectionMock) -> None:
+def test_unreadable_attributes_ignored() -> None:
     """Ensure handling of unreadable attributes as found with issue https://github.com/mvdwetering/yamaha_ynca/issues/315."""
 
     class Descriptor:
@@ -168,5 +325,78 @@ def test_unreadable_attributes_ignored(connection: YncaConnectionMock) -> None:
             msg = "unreadable attribute"
             raise AttributeError(msg)
 
-    DummySubunit.__provides__ = Descriptor()  # type: ignore  # noqa: PGH003
-    DummySubunit(connection)
+    # Attributes are scanned when the class is created
+    # No id, so the API does not pick up this subunit class
+    class UnreadableSubunit(SubunitBase):
+        __provides__ = Descriptor()
+
+    function_table = UnreadableSubunit._function_table  # noqa: SLF001
+    assert list(function_table) == ["AVAIL"]
+
+
+def test_function_table_shared_by_instances(connection: YncaConnectionMock) -> None:
+    dsu1 = DummySubunit(connection)
+    dsu2 = DummySubunit(connection)
+
+    function_table = DummySubunit._function_table  # noqa: SLF001
+    assert list(function_table) == ["AVAIL", "DUMMY_FUNCTION"]
+
+    # Handlers (with the values) are per instance
+    assert dsu1.function_handlers["AVAIL"] is not dsu2.function_handlers["AVAIL"]
+    assert (
+        dsu1.function_handlers["AVAIL"].function
+        is dsu2.function_handlers["AVAIL"].function
+    )
+
+
+def test_initializers_shared_by_instances(connection: YncaConnectionMock) -> None:
+    dsu = DummySubunit(connection)
+
+    initializer_names = DummySubunit._initializer_names  # noqa: SLF001
+    assert dict(initializer_names) == {
+        "AVAIL": "AVAIL",
+        "DUMMY_FUNCTION": "DUMMY_FUNCTION",
+    }
+    assert dsu._initializers() is initializer_names  # noqa: SLF001
+
+
+def test_deleted_function_not_initialized(connection: YncaConnectionMock) -> None:
+    dsu = DummySubunit(connection)
+    del dsu.dummy_function
+
+    assert list(dsu._initializers()) == ["AVAIL"]  # noqa: SLF001
+    function_table = DummySubunit._function_table  # noqa: SLF001
+    assert list(function_table) == ["AVAIL", "DUMMY_FUNCTION"]
+
+
+def test_excluded_function_refresh(connection: YncaConnectionMock) -> None:
+    connection.get_response_list = [
+        INITIALIZE_FULL_RESPONSES[0],
+        INITIALIZE_FULL_RESPONSES[2],
+        INITIALIZE_FULL_RESPONSES[1],
+    ]
+    dsu = DummySubunit(connection)
+    dsu._excluded_functions = frozenset(["DUMMY_FUNCTION"])  # noqa: SLF001
+    assert list(dsu._initializers()) == ["AVAIL"]  # noqa: SLF001
+
+    dsu.initialize()
+    assert dsu.dummy_function is None
+
+    update_callback = mock.MagicMock()
+    dsu.register_update_callback(update_callback)
+    dsu.refresh("DUMMY_FUNCTION")
+
+    connection.get.assert_called_with(SUBUNIT, "DUMMY_FUNCTION")
+    assert dsu.dummy_function == 1
+    update_callback.assert_called_once_with("DUMMY_FUNCTION", 1)
+
+
+def test_excluded_function_not_restored(connection: YncaConnectionMock) -> None:
+    dsu = DummySubunit(connection)
+    dsu._excluded_functions = frozenset(["DUMMY_FUNCTION"])  # noqa: SLF001
+
+    dsu._restore_values({"AVAIL": "Ready", "DUMMY_FUNCTION": "1"})  # noqa: SLF001
+
+    assert dsu.avail is Avail.READY
+    assert dsu.dummy_function is None
+    assert dsu._initialized is True  # noqa: SLF001
@@ -0,0 +1,134 @@
+from collections.abc import Callable
+from unittest import mock
+
+import pytest
+
+from ynca.update_policy import UpdatePolicy, _UpdateBatcher, _UpdateLimiter
+
+
+class FakeTimers:
+    """Collects scheduled calls so tests can run them at will."""
+
+    def __init__(self) -> None:
+        self.scheduled: list[tuple[float, Callable[[], None], mock.Mock]] = []
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> mock.Mock:
+        handle = mock.Mock()
+        self.scheduled.append((delay, callback, handle))
+        return handle
+
+    def run_last(self) -> None:
+        _, callback, _ = self.scheduled[-1]
+        callback()
+
+
+def test_min_interval() -> None:
+    timers = FakeTimers()
+    deliver = mock.Mock()
+    limiter = _UpdateLimiter(UpdatePolicy(min_interval=5), deliver, timers.call_later)
+
+    with mock.patch("time.monotonic", return_value=100.0):
+        limiter.update()
+    deliver.assert_called_once()
+    assert timers.scheduled == []
+
+    # Updates within the interval are coalesced in one delayed delivery
+    with mock.patch("time.monotonic", return_value=101.0):
+        limiter.update()
+        limiter.update()
+    assert deliver.call_count == 1
+    assert len(timers.scheduled) == 1
+    assert timers.scheduled[0][0] == 4.0
+
+    with mock.patch("time.monotonic", return_value=105.0):
+        timers.run_last()
+    assert deliver.call_count == 2
+
+    # Interval passed, delivered right away
+    with mock.patch("time.monotonic", return_value=111.0):
+        limiter.update()
+    assert deliver.call_count == 3
+
+
+def test_debounce() -> None:
+    timers = FakeTimers()
+    deliver = mock.Mock()
+    limiter = _UpdateLimiter(UpdatePolicy(debounce=0.05), deliver, timers.call_later)
+
+    with mock.patch("time.monotonic", return_value=100.0):
+        limiter.update()
+    with mock.patch("time.monotonic", return_value=100.01):
+        limiter.update()
+    deliver.assert_not_called()
+
+    # Only one timer, it waits for the rest of the debounce time when it expires
+    assert len(timers.scheduled) == 1
+    with mock.patch("time.monotonic", return_value=100.05):
+        timers.run_last()
+    deliver.assert_not_called()
+    assert len(timers.scheduled) == 2
+    assert timers.scheduled[-1][0] == pytest.approx(0.01)
+    timers.scheduled[0][2].cancel.assert_not_called()
+
+    with mock.patch("time.monotonic", return_value=100.06):
+        timers.run_last()
+    deliver.assert_called_once()
+
+
+def test_cancel() -> None:
+    timers = FakeTimers()
+    deliver = mock.Mock()
+    limiter = _UpdateLimiter(UpdatePolicy(debounce=1), deliver, timers.call_later)
+
+    limiter.update()
+    limiter.cancel()
+    timers.scheduled[0][2].cancel.assert_called_once()
+
+    # Nothing pending
+    limiter.cancel()
+    deliver.assert_not_called()
+
+
+def test_batcher_gap() -> None:
+    timers = FakeTimers()
+    deliver = mock.Mock()
+    batcher = _UpdateBatcher(0.05, deliver, timers.call_later)
+
+    with mock.patch("time.monotonic", return_value=100.0):
+        batcher.add("PWR", "On")
+    with mock.patch("time.monotonic", return_value=100.04):
+        batcher.add("VOL", -20.0)
+        batcher.add("PWR", "Standby")
+    # Only one timer for the burst
+    assert len(timers.scheduled) == 1
+
+    # Burst still going, wait for the rest of the gap
+    with mock.patch("time.monotonic", return_value=100.05):
+        timers.run_last()
+    deliver.assert_not_called()
+    assert timers.scheduled[-1][0] == pytest.approx(0.04)
+
+    with mock.patch("time.monotonic", return_value=100.09):
+        timers.run_last()
+    deliver.assert_called_once_with({"PWR": "Standby", "VOL": -20.0})
+
+
+def test_batcher_flush_and_cancel() -> None:
+    timers = FakeTimers()
+    deliver = mock.Mock()
+    batcher = _UpdateBatcher(0.05, deliver, timers.call_later)
+
+    batcher.add("PWR", "On")
+    batcher.flush()
+    deliver.assert_called_once_with({"PWR": "On"})
+    timers.scheduled[0][2].cancel.assert_called_once()
+
+    # Nothing collected, nothing delivered
+    batcher.flush()
+    assert deliver.call_count == 1
+
+    batcher.add("PWR", "Standby")
+    batcher.cancel()
+    batcher.cancel()
+    batcher.flush()
+    assert deliver.call_count == 1
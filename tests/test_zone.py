@@ -149,6 +149,21 @@ def test_initialize_minimal(
                 (SYS, "VERSION", "Version"),
             ],
         ),
+        # Functions expected in BASIC get requested on their own
+        (
+            (SUBUNIT, "ENHANCER"),
+            [],
+        ),
+        (
+            (SUBUNIT, "SLEEP"),
+            [],
+        ),
+        (
+            (SYS, "VERSION"),
+            [
+                (SYS, "VERSION", "Version"),
+            ],
+        ),
     ]
 
     z = Main(connection)